@@ -27,6 +27,8 @@ WorkflowMain.initialise(workflow, params, log)
 
 if (params.generate_references) {
     include { GENERATE_REFERENCES } from './workflows/generate_references'
+} else if (params.recompute_clusters) {
+    include { RECOMPUTE_CLUSTERS  } from './workflows/recompute_clusters'
 } else {
     include { LEGIOCLUSTER as LC  } from './workflows/legiocluster'
 }
@@ -51,6 +53,8 @@ workflow NFCORE_LEGIOCLUSTER {
 workflow {
     if (params.generate_references) {
         GENERATE_REFERENCES ()
+    } else if (params.recompute_clusters) {
+        RECOMPUTE_CLUSTERS ()
     } else {
         LC ()
     }
@@ -12,9 +12,10 @@ process CALCULATE_COVERAGE {
     val med_genome_len
 
     output:
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -22,9 +23,10 @@ process CALCULATE_COVERAGE {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level = "INFO"
-    report    = "${prefix}.coverage_report.txt"
-    log_file  = "${prefix}.log"
+    log_level   = "INFO"
+    report      = "${prefix}.coverage_report.txt"
+    report_json = "${prefix}.coverage_report.json"
+    log_file    = "${prefix}.log"
 
     template 'calculate_coverage.py'
 }
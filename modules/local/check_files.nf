@@ -0,0 +1,28 @@
+process CHECK_FILES {
+    label 'process_low'
+
+    conda (params.enable_conda ? 'bioconda::python=3.10' : null)
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'python-legiocluster:latest' :
+        'python-legiocluster:latest' }"
+
+    input:
+    path files, stageAs: 'input*/*'
+
+    output:
+    path stats         , emit: csv
+    path log_file      , emit: log
+    path "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    prefix = task.ext.prefix ?: "files"
+
+    log_level = "INFO"
+    stats     = "${prefix}.stats.csv"
+    log_file  = "${prefix}.log"
+
+    template 'check_files.py'
+}
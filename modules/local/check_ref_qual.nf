@@ -8,14 +8,15 @@ process CHECK_REF_QUAL {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(contigs)
+    tuple val(meta), path(contigs_index)
     val med_genome_len
 
     output:
-    tuple val(meta), path(output)  , emit: csv
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path(output)     , emit: csv
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -23,10 +24,11 @@ process CHECK_REF_QUAL {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level = "INFO"
-    output    = "${prefix}.csv"
-    report    = "${prefix}.ref_qual_report.txt"
-    log_file  = "${prefix}.log"
+    log_level   = "INFO"
+    output      = "${prefix}.csv"
+    report      = "${prefix}.ref_qual_report.txt"
+    report_json = "${prefix}.ref_qual_report.json"
+    log_file    = "${prefix}.log"
 
     template 'check_ref_qual.py'
 }
@@ -1,5 +1,5 @@
 process COMPARE_SNPS {
-    tag "$meta.id"
+    tag "$meta.ref"
     label 'process_medium'
 
     conda (params.enable_conda ? 'bioconda::python=3.10' : null)
@@ -11,19 +11,18 @@ process COMPARE_SNPS {
     tuple val(meta), path(snp_cons), path(cluster_snp_cons)
 
     output:
-    tuple val(meta), path(pairwise_diffs), emit: pairwise_diffs
-    tuple val(meta), path(log_file)      , emit: log
-    path  "versions.yml"                 , emit: versions
+    tuple val(meta), path("*.pairwise_diffs.csv"), emit: pairwise_diffs
+    tuple val(meta), path(log_file)              , emit: log
+    path  "versions.yml"                         , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
-    prefix = task.ext.prefix ?: "${meta.id}"
+    prefix = task.ext.prefix ?: "${meta.ref}"
 
-    log_level      = "INFO"
-    pairwise_diffs = "${prefix}.pairwise_diffs.csv"
-    log_file       = "${prefix}.log"
+    log_level = "INFO"
+    log_file  = "${prefix}.log"
 
     template 'compare_snps.py'
 }
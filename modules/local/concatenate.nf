@@ -1,29 +0,0 @@
-process CONCATENATE {
-    tag "$meta.id"
-    label 'process_low'
-
-    conda (params.enable_conda ? "conda-forge::sed=4.7" : null)
-    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
-        'https://depot.galaxyproject.org/singularity/ubuntu:20.04' :
-        'ubuntu:20.04' }"
-
-    input:
-    tuple val(meta), path(reads)
-
-    output:
-    tuple val(meta), path(output), emit: cat
-
-    when:
-    task.ext.when == null || task.ext.when
-
-    script:
-    args = task.ext.args ?: ''
-    prefix = task.ext.prefix ?: "${meta.id}"
-    output = "${prefix}.cat.fastq"
-    """
-    cat \\
-        $args \\
-        $reads \\
-        > $output
-    """
-}
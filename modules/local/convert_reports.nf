@@ -8,10 +8,12 @@ process CONVERT_REPORTS {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(reports)
+    tuple val(meta), path(reports), val(samples), path(cache, stageAs: 'cache/*')
+    val batch
 
     output:
-    tuple val(meta), path("${prefix}.*.yml") , emit: yml_reports
+    tuple val(meta), path("*_mqc.yml")       , emit: yml_reports
+    path  "report_cache/*.json"              , emit: cache, optional: true
     tuple val(meta), path(log_file)          , emit: log
     path  "versions.yml"                     , emit: versions
 
@@ -21,8 +23,9 @@ process CONVERT_REPORTS {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level = "INFO"
-    log_file  = "${prefix}.log"
+    log_level    = "INFO"
+    log_file     = "${prefix}.log"
+    sample_names = samples.join(' ')
 
     template 'convert_reports.py'
 }
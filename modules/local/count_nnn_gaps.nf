@@ -8,18 +8,19 @@ process COUNT_NNN_GAPS {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(depth), val(percent_mapped), val(max_no_ns), val(max_no_gaps), val(mapped_threshold)
+    tuple val(meta), path(coverage), val(percent_mapped), val(max_no_ns), val(max_no_gaps), val(mapped_threshold)
     val min_depth
     val gap_length
     val interval
 
     output:
-    tuple val(meta), path(histo_depths), emit: histo_depths
-    tuple val(meta), path(plot_depths) , emit: plot_depths
-    tuple val(meta), path(output)      , emit: csv
-    tuple val(meta), path(report)      , emit: report
-    tuple val(meta), path(log_file)    , emit: log
-    path  "versions.yml"               , emit: versions
+    tuple val(meta), path(plot_data)  , emit: plot_data
+    tuple val(meta), path(output)     , emit: csv
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(bed)        , emit: bed
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -27,12 +28,13 @@ process COUNT_NNN_GAPS {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level    = "INFO"
-    histo_depths = "${prefix}.histo_depths.png"
-    plot_depths  = "${prefix}.plot_depths.png"
-    output       = "${prefix}.csv"
-    report       = "${prefix}.nnn_gaps_report.txt"
-    log_file     = "${prefix}.log"
+    log_level   = "INFO"
+    plot_data   = "${prefix}.nnn_gaps_plot_data.npz"
+    output      = "${prefix}.csv"
+    report      = "${prefix}.nnn_gaps_report.txt"
+    report_json = "${prefix}.nnn_gaps_report.json"
+    bed         = "${prefix}.gaps.bed"
+    log_file    = "${prefix}.log"
 
     template 'count_nnn_gaps.py'
 }
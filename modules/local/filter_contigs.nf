@@ -8,7 +8,7 @@ process FILTER_CONTIGS {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(contigs)
+    tuple val(meta), path(contigs), path(contigs_index)
     val min_contig_len
     val min_contig_cov
 
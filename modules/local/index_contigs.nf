@@ -0,0 +1,29 @@
+process INDEX_CONTIGS {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda (params.enable_conda ? 'bioconda::python=3.10' : null)
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'python-legiocluster:latest' :
+        'python-legiocluster:latest' }"
+
+    input:
+    tuple val(meta), path(contigs)
+
+    output:
+    tuple val(meta), path(contigs_index), emit: contigs_index
+    tuple val(meta), path(log_file)     , emit: log
+    path  "versions.yml"                , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    prefix = task.ext.prefix ?: "${meta.id}"
+
+    log_level     = "INFO"
+    contigs_index = "${prefix}.contigs_index.tsv"
+    log_file      = "${prefix}.log"
+
+    template 'index_contigs.py'
+}
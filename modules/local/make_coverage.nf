@@ -0,0 +1,30 @@
+process MAKE_COVERAGE {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda (params.enable_conda ? 'bioconda::python=3.10 bioconda::samtools=1.9' : null)
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'python-legiocluster:latest' :
+        'python-legiocluster:latest' }"
+
+    input:
+    tuple val(meta), path(bam)
+
+    output:
+    tuple val(meta), path(coverage), emit: coverage
+    tuple val(meta), path(log_file), emit: log
+    path  "versions.yml"           , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    args = task.ext.args ?: ''
+    prefix = task.ext.prefix ?: "${meta.id}.${meta.ref}"
+
+    log_level = "INFO"
+    coverage  = "${prefix}.coverage.npz"
+    log_file  = "${prefix}.log"
+
+    template 'make_coverage.py'
+}
@@ -8,26 +8,31 @@ process MAKE_MST {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(concat_pairwise_diffs)
+    tuple val(meta), path(concat_pairwise_mes), path(concat_pairwise_snps)
     val genome
+    val skip_plots
+    val layout_threshold
+    val render_timeout
 
     output:
-    tuple val(meta), path(mst)     , emit: png
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path("${prefix}.MST_*.png")        , optional: true, emit: png
+    tuple val(meta), path("${prefix}.MST_*.svg")        , optional: true, emit: svg
+    tuple val(meta), path("${prefix}.MST_{ME,SNP}.json"), emit: json
+    tuple val(meta), path(report)                       , emit: report
+    tuple val(meta), path(report_json)                  , emit: report_json
+    tuple val(meta), path(log_file)                     , emit: log
+    path  "versions.yml"                                , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
     prefix = task.ext.prefix ?: "${meta.ref}"
-    suffix = task.ext.suffix ?: 'ME'
 
-    log_level = "INFO"
-    mst       = "${prefix}.MST_${suffix}.png"
-    report    = "${prefix}.MST_${suffix}_report.txt"
-    log_file  = "${prefix}.MST_${suffix}.log"
+    log_level   = "INFO"
+    report      = "${prefix}.MST_report.txt"
+    report_json = "${prefix}.MST_report.json"
+    log_file    = "${prefix}.MST.log"
 
     template 'make_mst.py'
 }
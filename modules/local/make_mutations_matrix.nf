@@ -8,10 +8,11 @@ process MAKE_MUTATIONS_MATRIX {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(cluster_pairwise_diffs), path(mutations_matrix)
+    tuple val(meta), path(cluster_pairwise_diffs), path(mutations_matrix), path(stored_npz)
 
     output:
     tuple val(meta), path(mutations_matrix, includeInputs: true), emit: mutations_matrix
+    tuple val(meta), path(mutations_npz)                        , emit: mutations_npz
     tuple val(meta), path(snp_matrix)                           , emit: snp_matrix
     tuple val(meta), path(me_matrix)                            , emit: me_matrix
     tuple val(meta), path(concat_pairwise_snps)                 , emit: concat_pairwise_snps
@@ -26,11 +27,13 @@ process MAKE_MUTATIONS_MATRIX {
     prefix = task.ext.prefix ?: "${meta.ref}"
 
     log_level            = "INFO"
+    mutations_npz        = "${prefix}.mutations_matrix.npz"
     snp_matrix           = "${prefix}.SNP_matrix.csv"
     me_matrix            = "${prefix}.ME_matrix.csv"
     concat_pairwise_snps = "${prefix}.concat_pairwise_snps.csv"
     concat_pairwise_mes  = "${prefix}.concat_pairwise_mes.csv"
     log_file             = "${prefix}.log"
+    rebuild              = task.ext.rebuild ?: false
 
     template 'make_mutations_matrix.py'
 }
@@ -0,0 +1,32 @@
+process MAKE_QC_DB {
+    label 'process_low'
+
+    conda (params.enable_conda ? 'bioconda::python=3.10' : null)
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'python-legiocluster:latest' :
+        'python-legiocluster:latest' }"
+
+    input:
+    path reports
+    path manifest
+    path stored_db, stageAs: 'stored/*'
+    val qc_db
+    val run_name
+
+    output:
+    path run_db        , emit: run_db
+    path summary_db    , emit: db
+    path log_file      , emit: log
+    path "versions.yml", emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    log_level  = "INFO"
+    run_db     = "${run_name}.qc.db"
+    summary_db = qc_db.name
+    log_file   = "qc_db.log"
+
+    template 'make_qc_db.py'
+}
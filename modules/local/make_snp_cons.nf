@@ -8,7 +8,7 @@ process MAKE_SNP_CONS {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(fasta), path(mpileup), path(freebayes)
+    tuple val(meta), path(fasta), path(mpileup), path(freebayes), path(coverage)
 
     output:
     tuple val(meta), path(output)  , emit: csv
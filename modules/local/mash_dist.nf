@@ -8,27 +8,63 @@ process MASH_DIST {
         'staphb/mash:2.1' }"
 
     input:
-    tuple val(meta), path(query), path(reference)
+    tuple val(meta), val(ids), path(queries), path(reference)
+    path cache, stageAs: 'cache/*'
 
     output:
-    tuple val(meta), path(output), emit: dist
-    path  "versions.yml"         , emit: versions
+    tuple val(meta), path("*.${suffix}.tab"), emit: dist
+    path  "mash_cache/*/*.tab"              , emit: cache, optional: true
+    path  "versions.yml"                    , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
     args = task.ext.args ?: ''
-    prefix = task.ext.prefix ?: "${meta.id}"
     suffix = task.ext.suffix ?: 'mash_dist'
-    output = "${prefix}.${suffix}.tab"
     """
-    mash dist \\
-        -p $task.cpus \\
-        $args \\
-        $reference \\
-        $query \\
-        > $output
+    # distances are cached by the content of both sketches (and the args),
+    # so only queries that were not seen before against this reference
+    # sketch are bundled and passed to mash dist; the cache is sharded by
+    # the md5 of the reference sketch, and only the shard of this reference
+    # sketch is staged
+    reference_hash=\$(md5sum $reference | cut -c 1-32)
+    ids=(${ids.join(' ')})
+    queries=($queries)
+    misses=()
+    for i in \${!queries[@]}; do
+        query_hash=\$(echo "$args" | cat \${queries[i]} - | md5sum | cut -c 1-32)
+        cached=cache/\$query_hash.tab
+        if [ -s \$cached ]; then
+            cp \$cached \${ids[i]}.${suffix}.tab
+        else
+            misses+=(\$i)
+        fi
+    done
+
+    # new distances are published to the cache, which is read back as an
+    # input by the next run
+    mkdir -p mash_cache/\$reference_hash
+    if [ \${#misses[@]} -gt 0 ]; then
+        mash paste batch \$(for i in \${misses[@]}; do echo \${queries[i]}; done)
+
+        mash dist \\
+            -p $task.cpus \\
+            $args \\
+            $reference \\
+            batch.msh \\
+            > batch.tab
+
+        # one table per query, named after the sample, with the rows of
+        # the sketch ID of the query
+        for i in \${misses[@]}; do
+            query_id=\$(mash info -t \${queries[i]} | awk -F '\\t' 'NR == 2 { print \$3 }')
+            awk -F '\\t' -v id="\$query_id" '\$2 == id' batch.tab > \${ids[i]}.${suffix}.tab
+
+            query_hash=\$(echo "$args" | cat \${queries[i]} - | md5sum | cut -c 1-32)
+            cp \${ids[i]}.${suffix}.tab mash_cache/\$reference_hash/\$query_hash.tab
+        done
+    fi
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -11,10 +11,11 @@ process PARSE_BWA_OUTPUT {
     tuple val(meta), path(fasta), path(sam), path(flagstat), path(idxstats), val(mapped_threshold)
 
     output:
-    tuple val(meta), path(output)  , emit: csv
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path(output)     , emit: csv
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -22,10 +23,11 @@ process PARSE_BWA_OUTPUT {
     script:
     prefix = task.ext.prefix ?: "${meta.id}.${meta.ref}"
 
-    log_level = "INFO"
-    output    = "${prefix}.csv"
-    report    = "${prefix}.bwa_report.txt"
-    log_file  = "${prefix}.log"
+    log_level   = "INFO"
+    output      = "${prefix}.csv"
+    report      = "${prefix}.bwa_report.txt"
+    report_json = "${prefix}.bwa_report.json"
+    log_file    = "${prefix}.log"
 
     template 'parse_bwa_output.py'
 }
@@ -8,13 +8,14 @@ process PARSE_KRAKEN_OUTPUT {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(kraken), path(contigs)
+    tuple val(meta), path(kraken), path(contigs), path(contigs_index)
     val genus
 
     output:
     tuple val(meta), path(good_contigs), emit: good_contigs
     tuple val(meta), path(bad_contigs) , emit: bad_contigs
     tuple val(meta), path(report)      , emit: report
+    tuple val(meta), path(report_json) , emit: report_json
     tuple val(meta), path(log_file)    , emit: log
     path  "versions.yml"               , emit: versions
 
@@ -28,6 +29,7 @@ process PARSE_KRAKEN_OUTPUT {
     good_contigs = "${prefix}_cc.fasta"
     bad_contigs  = "${prefix}.wrong_genus_contigs.fasta"
     report       = "${prefix}.kraken_report.txt"
+    report_json  = "${prefix}.kraken_report.json"
     log_file     = "${prefix}.log"
 
     template 'parse_kraken_output.py'
@@ -13,10 +13,11 @@ process PARSE_MASH_OUTPUT {
     val genome
 
     output:
-    tuple val(meta), path(fastas)  , emit: fastas
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path(fastas)     , emit: fastas
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -25,10 +26,11 @@ process PARSE_MASH_OUTPUT {
     prefix = task.ext.prefix ?: "${meta.id}"
     suffix = task.ext.suffix ?: 'mash'
 
-    log_level = "INFO"
-    fastas    = "${prefix}.${suffix}_fastas.csv"
-    report    = "${prefix}.${suffix}_report.txt"
-    log_file  = "${prefix}.${suffix}.log"
+    log_level   = "INFO"
+    fastas      = "${prefix}.${suffix}_fastas.csv"
+    report      = "${prefix}.${suffix}_report.txt"
+    report_json = "${prefix}.${suffix}_report.json"
+    log_file    = "${prefix}.${suffix}.log"
 
     template 'parse_mash_output.py'
 }
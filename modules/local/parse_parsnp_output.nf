@@ -11,9 +11,10 @@ process PARSE_PARSNP_OUTPUT {
     tuple val(meta), path(parsnp)
 
     output:
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -21,9 +22,10 @@ process PARSE_PARSNP_OUTPUT {
     script:
     prefix = task.ext.prefix ?: "${meta.ref}"
 
-    log_level = "INFO"
-    report    = "${prefix}.parsnp_report.txt"
-    log_file  = "${prefix}.log"
+    log_level   = "INFO"
+    report      = "${prefix}.parsnp_report.txt"
+    report_json = "${prefix}.parsnp_report.json"
+    log_file    = "${prefix}.log"
 
     template 'parse_parsnp_output.py'
 }
@@ -12,9 +12,10 @@ process PARSE_QUAST_OUTPUT {
     val contig_threshold
 
     output:
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -22,9 +23,10 @@ process PARSE_QUAST_OUTPUT {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level = "INFO"
-    report    = "${prefix}.quast_report.txt"
-    log_file  = "${prefix}.log"
+    log_level   = "INFO"
+    report      = "${prefix}.quast_report.txt"
+    report_json = "${prefix}.quast_report.json"
+    log_file    = "${prefix}.log"
 
     template 'parse_quast_output.py'
 }
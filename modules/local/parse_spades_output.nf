@@ -8,20 +8,17 @@ process PARSE_SPADES_OUTPUT {
         'python-legiocluster:latest' }"
 
     input:
-    tuple val(meta), path(contigs)
+    tuple val(meta), path(contigs_index)
     val min_contig_len
     val min_contig_cov
     val max_no_contigs
 
     output:
-    tuple val(meta), path(contig_len_dist)      , emit: contig_len_dist
-    tuple val(meta), path(contig_cov_dist)      , emit: contig_cov_dist
-    tuple val(meta), path(contig_len_x_cov_dist), emit: contig_len_x_cov_dist
-    tuple val(meta), path(contig_ind_len)       , emit: contig_ind_len
-    tuple val(meta), path(contig_ind_cov)       , emit: contig_ind_cov
-    tuple val(meta), path(report)               , emit: report
-    tuple val(meta), path(log_file)             , emit: log
-    path  "versions.yml"                        , emit: versions
+    tuple val(meta), path(plot_data)  , emit: plot_data
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -29,14 +26,11 @@ process PARSE_SPADES_OUTPUT {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level             = "INFO"
-    contig_len_dist       = "${prefix}.contig_len_dist.png"
-    contig_cov_dist       = "${prefix}.contig_cov_dist.png"
-    contig_len_x_cov_dist = "${prefix}.Ampel_dist.png"
-    contig_ind_len        = "${prefix}.plot_contig_len.png"
-    contig_ind_cov        = "${prefix}.plot_contig_cov.png"
-    report                = "${prefix}.spades_report.txt"
-    log_file              = "${prefix}.log"
+    log_level   = "INFO"
+    plot_data   = "${prefix}.spades_plot_data.npz"
+    report      = "${prefix}.spades_report.txt"
+    report_json = "${prefix}.spades_report.json"
+    log_file    = "${prefix}.log"
 
     template 'parse_spades_output.py'
 }
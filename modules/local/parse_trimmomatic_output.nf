@@ -12,10 +12,11 @@ process PARSE_TRIMMOMATIC_OUTPUT {
     val min_reads
 
     output:
-    tuple val(meta), path(output)  , emit: csv
-    tuple val(meta), path(report)  , emit: report
-    tuple val(meta), path(log_file), emit: log
-    path  "versions.yml"           , emit: versions
+    tuple val(meta), path(output)     , emit: csv
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -23,10 +24,11 @@ process PARSE_TRIMMOMATIC_OUTPUT {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level = "INFO"
-    output    = "${prefix}.csv"
-    report    = "${prefix}.trimmomatic_report.txt"
-    log_file  = "${prefix}.log"
+    log_level   = "INFO"
+    output      = "${prefix}.csv"
+    report      = "${prefix}.trimmomatic_report.txt"
+    report_json = "${prefix}.trimmomatic_report.json"
+    log_file    = "${prefix}.log"
 
     template 'parse_trimmomatic_output.py'
 }
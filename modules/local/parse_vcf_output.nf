@@ -11,11 +11,12 @@ process PARSE_VCF_OUTPUT {
     tuple val(meta), path(vcf), path(fasta), val(snp_threshold)
 
     output:
-    tuple val(meta), path(mutation_dist), emit: mutation_dist
-    tuple val(meta), path(output)       , emit: csv
-    tuple val(meta), path(report)       , emit: report
-    tuple val(meta), path(log_file)     , emit: log
-    path  "versions.yml"                , emit: versions
+    tuple val(meta), path(plot_data)  , emit: plot_data
+    tuple val(meta), path(output)     , emit: csv
+    tuple val(meta), path(report)     , emit: report
+    tuple val(meta), path(report_json), emit: report_json
+    tuple val(meta), path(log_file)   , emit: log
+    path  "versions.yml"              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -23,11 +24,12 @@ process PARSE_VCF_OUTPUT {
     script:
     prefix = task.ext.prefix ?: "${meta.id}"
 
-    log_level     = "INFO"
-    mutation_dist = "${prefix}.mutation_dist.png"
-    output        = "${prefix}.csv"
-    report        = "${prefix}.vcf_report.txt"
-    log_file      = "${prefix}.log"
+    log_level   = "INFO"
+    plot_data   = "${prefix}.vcf_plot_data.npz"
+    output      = "${prefix}.csv"
+    report      = "${prefix}.vcf_report.txt"
+    report_json = "${prefix}.vcf_report.json"
+    log_file    = "${prefix}.log"
 
     template 'parse_vcf_output.py'
 }
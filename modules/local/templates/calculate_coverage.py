@@ -4,6 +4,7 @@
 """Calculate coverage."""
 
 
+import json
 import logging
 import platform
 import sys
@@ -14,13 +15,104 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
-def calculate_perc_ge_q30(reads_file, fastqc_results, report_file):
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text. QC metrics are not part of the
+      text, they are added after the lines as ['metric', name, value,
+      reference] records, which MAKE_QC_DB stores in the QC database.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.lo_metrics = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def metric(self, name, value, reference=''):
+        """
+        Adds a QC metric of the task, e.g.: metric('percent_mapped', 98.7).
+        param: str name = name of the metric
+        param: float value = value of the metric
+        param: str reference = reference the metric refers to, if it is not
+               the reference of the task, e.g. for Mash distances
+        """
+
+        self.lo_metrics.append(['metric', name, float(value), reference])
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records + self.lo_metrics, outfile)
+
+
+def calculate_perc_ge_q30(reads_file, fastqc_results, report):
     """
     Calculates the percent of bases with a quality score greater than Q30
     param: str reads_file = name of file with forward or reverse reads
            processed by Trimmomatic
     param: str fastqc_results = name of directory with fastqc results
-    param: str report_file = output report file
+    param: Report report = report of the task
     """
 
     n_ge_Q30 = 0  # number of bases with quality score >= Q30
@@ -52,10 +144,10 @@ def calculate_perc_ge_q30(reads_file, fastqc_results, report_file):
         perc_ge_Q30 = -1
 
     # write to report
-    with open(report_file, 'a') as report:
-        print('\\nPercentage of bases with quality score >= Q30:\t('\
-              + str(n_ge_Q30) + ' * 100) / ' + str(n_all) + ' = '\
-              + str(perc_ge_Q30) + '\\n', file=report)
+    report.print('\\nPercentage of bases with quality score >= Q30:\t('\
+                 + str(n_ge_Q30) + ' * 100) / ' + str(n_all) + ' = '\
+                 + str(perc_ge_Q30) + '\\n')
+    report.metric('percent_ge_q30', perc_ge_Q30)
 
 
 def calculate_coverage(reads_file, fastqc_results, report_file, med_genome_len):
@@ -84,13 +176,16 @@ def calculate_coverage(reads_file, fastqc_results, report_file, med_genome_len):
     # calculation based on PulseNet SOP
     coverage = round((total_seqs * max_seq_len * 2) / med_genome_len, 3)
 
-    with open(report_file, 'a') as report:
-        print('\\nCoverage (FastQC results):', file=report)
-        print('\\nCoverage:\t(' + str(total_seqs) + ' * ' + str(max_seq_len)\
-              + ' * 2) / ' + str(med_genome_len) + ' = ' + str(coverage),
-              file=report)
+    report = Report(report_file)
+    report.print('\\nCoverage (FastQC results):')
+    report.print('\\nCoverage:\t(' + str(total_seqs) + ' * ' + str(max_seq_len)\
+                 + ' * 2) / ' + str(med_genome_len) + ' = ' + str(coverage))
+
+    calculate_perc_ge_q30(reads_file, fastqc_results, report)
+
+    report.metric('coverage', coverage)
 
-    calculate_perc_ge_q30(reads_file, fastqc_results, report_file)
+    report.flush()
 
 
 if __name__ == "__main__":
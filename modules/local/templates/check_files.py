@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+
+
+"""Check files."""
+
+
+import csv
+import logging
+import platform
+import sys
+import yaml
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+logger = logging.getLogger()
+
+
+GZIP_MAGIC     = bytes([0x1f, 0x8b, 0x08])  # start of a gzip member
+BLOCK_SIZE     = 1024 * 1024                # bytes read at a time
+SAMPLE_RECORDS = 1000                       # FASTQ records checked per file
+FASTQ_BASES    = set('ACGTN')
+FASTA_BASES    = set('ACGTUNRYSWKMBDHV-')
+
+
+def decompress_members(data):
+    """
+    Decompresses the gzip members in data, which can be cut off at the end.
+    param: bytes data = gzipped data, starting with a gzip member
+    return: bytes text = decompressed data
+    return: bool complete = True if data ends with the end of a gzip member
+    raises: zlib.error if the data is not valid gzip
+    """
+
+    lo_text = []
+    while data:
+        decompressor = zlib.decompressobj(wbits=31)
+        lo_text.append(decompressor.decompress(data))
+        if not decompressor.eof:
+            return b''.join(lo_text), False
+        data = decompressor.unused_data
+    return b''.join(lo_text), True
+
+
+def check_gzip_tail(gz_file, size):
+    """
+    Checks that a gzipped file is not truncated. A deflate stream can only be
+      read from the start of its gzip member, so only a file made of many
+      members (e.g. by bgzip) can be checked from its last block. A file
+      with a single member, the usual output of gzip, is decompressed in
+      full, which streams the whole file through zlib.
+    param: str gz_file = gzipped file
+    param: int size = file size in bytes
+    return: bool = True if the file ends with a complete gzip member
+    raises: zlib.error if the whole file is decompressed and is not valid gzip
+    """
+
+    with open(gz_file, 'rb') as infile:
+        infile.seek(max(size - BLOCK_SIZE, 0))
+        data = infile.read()
+
+    # the magic bytes can also occur inside compressed data, so the last
+    #  candidate that decompresses to the end of the file wins
+    start = data.rfind(GZIP_MAGIC)
+    while start != -1:
+        try:
+            if decompress_members(data[start:])[1]:
+                return True
+        except zlib.error:
+            pass
+        start = data.rfind(GZIP_MAGIC, 0, start)
+
+    decompressor = zlib.decompressobj(wbits=31)
+    with open(gz_file, 'rb') as infile:
+        for data in iter(lambda: infile.read(BLOCK_SIZE), b''):
+            while data:
+                if decompressor.eof:
+                    decompressor = zlib.decompressobj(wbits=31)
+                decompressor.decompress(data)
+                data = decompressor.unused_data if decompressor.eof else b''
+    return decompressor.eof
+
+
+def check_fastq_records(lo_lines):
+    """
+    Checks the first FASTQ records, e.g.: '@read1', 'ACGT', '+', 'IIII'.
+    param: list lo_lines = complete lines at the start of the FASTQ file
+    return: list lo_read_lens = length of each checked read
+    raises: AssertionError if a record is not valid
+    """
+
+    lo_read_lens = []
+    for i in range(0, min(len(lo_lines) // 4, SAMPLE_RECORDS) * 4, 4):
+        header, seq, plus, qual = lo_lines[i:i + 4]
+        record = 'FASTQ record ' + str(i // 4 + 1)
+        assert header.startswith('@'), record + " does not start with '@'."
+        assert plus.startswith('+'), record + " has no '+' line."
+        assert len(seq) == len(qual), record + ' has a sequence and quality of different lengths.'
+        assert set(seq.upper()) <= FASTQ_BASES, record + ' has an invalid sequence.'
+        lo_read_lens.append(len(seq))
+    assert lo_read_lens, 'No complete FASTQ record in the first block.'
+    return lo_read_lens
+
+
+def check_fastq(fastq_file, size):
+    """
+    Checks that a gzipped FASTQ file is complete (see check_gzip_tail()) and
+      that its first FASTQ records are valid, and estimates the number of
+      records from the compression ratio of the first block.
+    param: str fastq_file = gzipped FASTQ file
+    param: int size = file size in bytes
+    return: int records = number of records (estimated if the file is larger
+            than one block)
+    return: int bases = number of bases (estimated)
+    return: int max_length = maximum read length of the checked records
+    raises: AssertionError or zlib.error if the file is not valid
+    """
+
+    with open(fastq_file, 'rb') as infile:
+        head = infile.read(BLOCK_SIZE)
+    text, complete = decompress_members(head)
+
+    if size > BLOCK_SIZE:
+        assert check_gzip_tail(fastq_file, size), 'The gzip file is truncated.'
+    else:
+        assert complete, 'The gzip file is truncated.'
+
+    # only complete lines, the last one can be cut off
+    lo_lines = text.decode('latin-1').split('\\n')
+    if size > BLOCK_SIZE:
+        lo_lines = lo_lines[:-1]
+    lo_read_lens = check_fastq_records(lo_lines)
+
+    head_records = len(lo_lines) // 4
+    if size > BLOCK_SIZE:
+        record_bytes = sum(len(line) + 1 for line in lo_lines[:head_records * 4]) / head_records
+        records = round(size * len(text) / len(head) / record_bytes)
+    else:
+        records = head_records
+    bases = round(records * sum(lo_read_lens) / len(lo_read_lens))
+
+    return records, bases, max(lo_read_lens)
+
+
+def check_fasta(fasta_file, size):
+    """
+    Checks the first and last blocks of a FASTA file, and estimates the
+      number of records and bases from the first block.
+    param: str fasta_file = FASTA file
+    param: int size = file size in bytes
+    return: int records = number of records (estimated if the file is larger
+            than one block)
+    return: int bases = number of bases (estimated if the file is larger
+            than one block)
+    return: int max_length = maximum record length in the first block
+    raises: AssertionError if the file is not valid
+    """
+
+    with open(fasta_file, 'rb') as infile:
+        head = infile.read(BLOCK_SIZE).decode('latin-1')
+        infile.seek(max(size - BLOCK_SIZE, 0))
+        tail = infile.read().decode('latin-1')
+
+    assert head.startswith('>'), "The FASTA file does not start with '>'."
+
+    # only complete lines, the last one can be cut off
+    lo_lines = head.split('\\n')
+    if size > BLOCK_SIZE:
+        lo_lines = lo_lines[:-1]
+
+    lo_lengths = []
+    for line in lo_lines:
+        if line.startswith('>'):
+            lo_lengths.append(0)
+        else:
+            assert set(line.strip().upper()) <= FASTA_BASES, 'The FASTA file has an invalid sequence.'
+            lo_lengths[-1] += len(line.strip())
+
+    lo_tail_lines = tail.split()
+    assert lo_tail_lines and not lo_tail_lines[-1].startswith('>') \
+        and set(lo_tail_lines[-1].upper()) <= FASTA_BASES, \
+        'The FASTA file does not end with a sequence.'
+
+    if size > BLOCK_SIZE:
+        records = max(1, round(len(lo_lengths) * size / len(head)))
+        bases = round(sum(lo_lengths) * size / len(head))
+    else:
+        records = len(lo_lengths)
+        bases = sum(lo_lengths)
+
+    return records, bases, max(lo_lengths)
+
+
+def check_file(input_file):
+    """
+    Checks that a FASTQ or FASTA file exists, is not empty, and is valid.
+    param: str input_file = gzipped FASTQ or FASTA file
+    return: dict row = file name, format, size in bytes, estimated numbers of
+            records and bases, maximum read length, and error ('' if valid)
+    """
+
+    file_format = 'fastq' if input_file.endswith('.gz') else 'fasta'
+    row = {'file': input_file, 'format': file_format, 'size': 0, 'records': '',
+           'bases': '', 'max_length': '', 'error': ''}
+
+    try:
+        assert Path(input_file).exists(), 'The file does not exist.'
+        row['size'] = Path(input_file).stat().st_size
+        assert row['size'] > 0, 'The file is empty.'
+        if file_format == 'fastq':
+            records, bases, max_length = check_fastq(input_file, row['size'])
+        else:
+            records, bases, max_length = check_fasta(input_file, row['size'])
+        row.update(records=records, bases=bases, max_length=max_length)
+    except (AssertionError, OSError) as error:
+        row['error'] = str(error)
+    except zlib.error as error:
+        row['error'] = 'The gzip file is corrupt (' + str(error) + ').'
+
+    return row
+
+
+def check_files(lo_files, stats_file, cpus):
+    """
+    Main function: checks all the FASTQ and FASTA files of the samplesheets at
+      once, so that bad files fail before any sample is processed.
+    param: list lo_files = gzipped FASTQ and FASTA files
+    param: str stats_file = output file
+    param: int cpus = number of cpus
+    output: csv file with one row per file, see check_file()
+    """
+
+    # zlib releases the GIL, so the decompressions run in parallel, and the
+    #  other checks mostly wait for the file system, so more threads than cpus
+    with ThreadPoolExecutor(max_workers=cpus * 4) as executor:
+        lo_rows = list(executor.map(check_file, lo_files))
+
+    with open(stats_file, mode='w', newline='') as outfile:
+        writer = csv.DictWriter(outfile, list(lo_rows[0]))
+        writer.writeheader()
+        writer.writerows(lo_rows)
+
+    lo_errors = [row for row in lo_rows if row['error']]
+    for row in lo_errors:
+        logger.critical(f"{row['file']}: {row['error']}")
+    logger.info(f"Checked {len(lo_rows)} files, {len(lo_errors)} failed.")
+
+    if lo_errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
+
+    versions = {}
+    versions["${task.process}"] = {
+        "python": platform.python_version(),
+        "yaml": yaml.__version__,
+    }
+    with open("versions.yml", "w") as f:
+        yaml.dump(versions, f, default_flow_style=False)
+
+    sys.exit(check_files("$files".split(), "$stats", int("$task.cpus")))
@@ -5,6 +5,7 @@
 
 
 import csv
+import json
 import logging
 import platform
 import sys
@@ -15,11 +16,109 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
-def check_ref_qual(contigs_file, output_file, report_file, MED_GENOME_LEN):
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records, outfile)
+
+
+def read_contigs_index(contigs_index_file):
+    """
+    Reads the contig index written by INDEX_CONTIGS.
+    param: str contigs_index_file = contig index file
+    return: list lo_records = [[header, contig number, length, coverage,
+            byte offset, record size in bytes], ...] as strings, e.g.:
+            [['NODE_1_length_238256_cov_41.824755', '1', '238256',
+              '41.824755', '0', '242262'], ...]
+    """
+
+    lo_records = []
+    with open(contigs_index_file, 'r', newline='') as infile:
+        reader = csv.reader(infile, dialect='excel-tab')
+        for row in reader:
+            # ignore the header
+            if row[0].startswith('#'):
+                continue
+            lo_records.append(row)
+    return lo_records
+
+
+def check_ref_qual(contigs_index_file, output_file, report_file, MED_GENOME_LEN):
     """
     Checks if the genome in a SPAdes_contigs.fa file is of sufficient
         quality to serve as new reference genome.
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
+    param: str contigs_index_file = contig index file for SPAdes_contigs.fa
     param: int MED_GENOME_LEN = median genome length for that species
     return: bool passed_qc = if True, then the genome assembled by SPAdes is
             of sufficient quality to serve as candidate reference genome
@@ -40,15 +139,10 @@ def check_ref_qual(contigs_file, output_file, report_file, MED_GENOME_LEN):
     msg = ''
 
     # extracting the data
-    with open(contigs_file, 'r') as infile:
-        for line in infile:
-            if line.startswith('>'):
-                line = line.rstrip('\\n')
-                # >NODE_1_length_238256_cov_41.824755
-                data = line.split('_')
-                # contig number, length, coverage; e.g.:
-                lo_contig_data.append((int(data[1]), int(data[3]),
-                                       float(data[5])))
+    # contig number, length, coverage; e.g.: (1, 238256, 41.824755)
+    for header, node, length, cov, offset, size \
+    in read_contigs_index(contigs_index_file):
+        lo_contig_data.append((int(node), int(length), float(cov)))
 
     # make list of contig lengths and coverages
     for contig in lo_contig_data:
@@ -108,8 +202,9 @@ def check_ref_qual(contigs_file, output_file, report_file, MED_GENOME_LEN):
         + ' manually to a folder with similar genomes.'
 
     # write to report
-    with open(report_file, 'a') as report:
-        print(text, file=report)
+    report = Report(report_file)
+    report.print(text)
+    report.flush()
 
     with open(output_file, 'a', newline='') as output:
         output_writer = csv.writer(output)
@@ -127,4 +222,4 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(check_ref_qual("$contigs", "$output", "$report", int("$med_genome_len")))
+    sys.exit(check_ref_qual("$contigs_index", "$output", "$report", int("$med_genome_len")))
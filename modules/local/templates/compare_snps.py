@@ -6,8 +6,10 @@
 
 import csv
 import logging
+import multiprocessing
 import platform
 import sys
+import numpy as np
 import yaml
 from pathlib import Path
 
@@ -15,6 +17,10 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
+# number of set bits for each byte value, used by popcount() on older numpy
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
 def get_seq_data(snp_cons_file):
     """
     Returns a list where each genome position is a list item; compared to the
@@ -79,26 +85,97 @@ def get_pairwise_count(str1, str2):
     return count
 
 
-def compare_two_genomes(lo_fst, lo_snd):
+def pack_genome(lo_bases):
+    """
+    Packs a list of bases into 4 bits per genome position, where A, C, G and
+      T are one-hot (1, 2, 4, 8) and anything else is 0, plus a bitmap of
+      the positions that hold a single A, C, G or T. Positions that hold
+      anything but a single base or 'n' or 'N' (INS, DEL, residual white
+      space) are listed separately, since they need a closer look.
+    param: list lo_bases = list of bases, as returned by get_seq_data()
+    return: array nibbles = the packed bases as 64-bit words
+    return: array valid = the packed bitmap of single bases as 64-bit words
+    return: array other = sorted positions (0-based) of all other items
+    return: dict do_other = position:item pairs for all other items
+    return: int = number of genome positions
+    """
+
+    do_codes = {'A': 1, 'C': 2, 'G': 4, 'T': 8, 'n': 0, 'N': 0}
+    OTHER = 16
+
+    # pad to a multiple of 128 positions, i.e. whole 64-bit words of nibbles
+    size = -(-len(lo_bases) // 128) * 128
+    codes = np.zeros(size, dtype=np.uint8)
+    codes[:len(lo_bases)] = np.fromiter((do_codes.get(base, OTHER) for base in lo_bases),
+                                        dtype=np.uint8, count=len(lo_bases))
+
+    other = np.flatnonzero(codes == OTHER)
+    codes[other] = 0
+
+    nibbles = (codes[0::2] | (codes[1::2] << 4)).view(np.uint64)
+    valid = np.packbits(codes != 0).view(np.uint64)
+
+    do_other = {posn: lo_bases[posn] for posn in other.tolist()}
+
+    return nibbles, valid, other, do_other, len(lo_bases)
+
+
+def get_item(packed, posn):
+    """
+    Returns the item at one position of a packed genome, where masked
+      positions are returned as 'n'.
+    param: tuple packed = a genome, as returned by pack_genome()
+    param: int posn = genome position (0-based)
+    return: str = base, INS, DEL, or 'n'
+    """
+
+    nibbles, valid, other, do_other, length = packed
+    if posn in do_other:
+        return do_other[posn]
+    code = (nibbles.view(np.uint8)[posn >> 1] >> (4 * (posn & 1))) & 15
+    return {1: 'A', 2: 'C', 4: 'G', 8: 'T'}.get(int(code), 'n')
+
+
+def popcount(words):
+    """
+    Counts the set bits in an array of 64-bit words.
+    param: array words = array of np.uint64
+    return: int = number of set bits
+    """
+
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum(dtype=np.int64))
+    return int(POPCOUNT_TABLE[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+def compare_two_genomes(packed_fst, packed_snd):
     """
     Compares two lists with sequence data, where each item is either a base,
       an insertion (MI+), a deletion ('-'), ambiguous ('n'), or unmapped ('N').
       The indexing is the same as that of the reference genome, an INS is
       listed as MI+ (e.g. 'ATT'), hence no disruption of the index.
-    param: list lo_fst = list of bases for the first genome
-    param: list lo_snd = list of bases for the second genome
+      SNPs between single bases are counted on the packed genomes: XOR of two
+      one-hot nibbles sets 2 bits for different bases and 1 bit where only
+      one genome has a base, the latter being counted by XOR of the bitmaps.
+      Only positions with indels in either genome are compared one by one.
+    param: tuple packed_fst = the first genome, as returned by pack_genome()
+    param: tuple packed_snd = the second genome, as returned by pack_genome()
     return: variant_count = the number of SNPs, INS, and DEL, while ignoring
             'n' or 'N'
     """
 
-    SNP_count        = 0
+    nibbles_fst, valid_fst, other_fst = packed_fst[:3]
+    nibbles_snd, valid_snd, other_snd = packed_snd[:3]
+
+    SNP_count = (popcount(nibbles_fst ^ nibbles_snd)
+                 - popcount(valid_fst ^ valid_snd)) // 2
     INDEL_base_count = 0
 
-    # one list element at a time
-    for i in range(len(lo_fst)):
+    # one indel position at a time
+    for i in np.union1d(other_fst, other_snd).tolist():
         # extract the bases, INS, or DEL after removing residual white spaces
-        fst = lo_fst[i].split()[0]
-        snd = lo_snd[i].split()[0]
+        fst = get_item(packed_fst, i).split()[0]
+        snd = get_item(packed_snd, i).split()[0]
         # no difference (same base or same INS, DEL, 'n', 'N')
         if fst == snd:
             continue
@@ -128,39 +205,47 @@ def compare_two_genomes(lo_fst, lo_snd):
     return SNP_count, INDEL_base_count
 
 
-def get_indels(lo_bases):
+def get_indels(packed):
     """
-    Converts a list of bases into two lists: one for indels, one for
-      ambiguous bases.
-    param: list lo_bases = list of single bases, multiple bases (insertions),
-           '-' (deletions), 'n' or 'N' (ambiguous); Note that the position of
-           item corresponds to it's position in the reference genome
-    return: list lo_indels = list of [position, base] for indels, where
+    Extracts the indels and the ambiguous bases of a packed genome, once per
+      isolate, as sorted arrays that can be compared to other isolates
+      without walking the genome again.
+    param: tuple packed = a genome, as returned by pack_genome(); note that
+           positions below are 1-based, i.e. relative to the reference genome
+    return: list lo_indels = list of (position, bases) for indels, where
             each item is either one or more '-' or two or more bases. e.g.:
-            [[3018, 'CGATTT'], [29548, '-'], [117852, '-------------'], ... ]
-    return: list lo_nNs = list of positions that are either 'n' or 'N', e.g.:
+            [(3018, 'CGATTT'), (29548, '-'), (117852, '-------------'), ... ]
+    return: set so_indels = the same (position, bases) items, for lookups
+    return: array starts = first position of each indel
+    return: array ends = position after the last one of each indel, where an
+            insertion takes up a single position
+    return: array nNs = sorted positions that are either 'n' or 'N', e.g.:
             [182, 248, 611, 761, 963, 1122, 1579, ...]
     helper function to indel_comp_manager()
     """
 
-    lo_indels = []  # (position, bases) of insertions (MI+) or deletions (D+)
-    lo_nNs    = []  # position of 'n' or 'N'
+    nibbles, valid, other, do_other, length = packed
 
-    posn = 0         # base count = position relative to the reference genome
-    last_posn = -1   # keeps track if deletions are consecutive
+    # ambiguous bases or gaps: everything that is neither a base nor listed
+    # as another item
+    codes = np.empty(nibbles.size * 16, dtype=np.uint8)
+    codes[0::2] = nibbles.view(np.uint8) & 15
+    codes[1::2] = nibbles.view(np.uint8) >> 4
+    masked = codes[:length] == 0
+    masked[other] = False
+    nNs = np.flatnonzero(masked) + 1
 
-    for line in lo_bases:
+    lo_indels = []   # (position, bases) of insertions (MI+) or deletions (D+)
+    last_posn = -1   # keeps track if deletions are consecutive
 
-        posn += 1  # update position
+    for posn in (other + 1).tolist():
 
-        # ambiguous bases or gaps: add posn to list
-        if line in ['n','N']:
-            lo_nNs.append(posn)
+        line = do_other[posn - 1]
 
         # insertions, which have the form MI+, where M is the same base
         # found in the reference and I+ represents >= 1 inserted bases
-        elif len(line) > 1:
-            lo_indels.append([posn, line])
+        if len(line) > 1:
+            lo_indels.append((posn, line))
 
         # deletion (single character, '-', combine to multi-deletion,
         # '------', as applicable):
@@ -168,17 +253,21 @@ def get_indels(lo_bases):
             # extend existing deletion if the posn is next to a
             # previous deletion
             if posn == last_posn + 1:
-                lo_indels[-1][1] += line
-                last_posn = posn
+                lo_indels[-1] = (lo_indels[-1][0], lo_indels[-1][1] + line)
             # a new deletion
             else:
-                lo_indels.append([posn, line])
-                last_posn = posn
+                lo_indels.append((posn, line))
+            last_posn = posn
+
+    # a deletion covers one position per '-', an insertion a single position
+    starts = np.array([posn for posn, bases in lo_indels], dtype=np.int64)
+    ends = starts + np.array([len(bases) if '-' in bases else 1
+                              for posn, bases in lo_indels], dtype=np.int64)
 
-    return lo_indels, lo_nNs
+    return lo_indels, set(lo_indels), starts, ends, nNs
 
 
-def compare_events(isolate1, isolate2, lo_indels1, lo_indels2, lo_nNs2):
+def compare_events(isolate1, isolate2, indels1, indels2):
     """
     Compares indel sequences of two isolates. Need to run this function twice:
       once for A versus B, then B versus A.
@@ -188,133 +277,175 @@ def compare_events(isolate1, isolate2, lo_indels1, lo_indels2, lo_nNs2):
       Note 2: insertions in isolate1 and isolate2 have to be identical, else,
       they will be counted as separate events, e.g.: ('1234 atttttttt') and
       ('1234 atttgtttt') will be considered as two events.
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
+      An indel of isolate1 is an event unless isolate2 has the same indel or
+      all of its positions are ambiguous in isolate2; the ambiguous positions
+      within each indel are counted with a binary search in the sorted nNs.
     param: str isolate1 = name of the first isolate (= isolate_A or isolate_B)
     param: str isolate2 = name of the second isolate (= isolate_B or isolate_A)
-    param: list lo_indels1 = [position, insertion or deletion] for isolate1
-           e.g.: [[4, 'CAGA'], [6, '---'], [10, '-'], [11, 'GA']]
-    param: list lo_indels2 = [position, insertion or deletion] for isolate2
-    param: list lo_nNs2 = ambiguous bases in isolate2
-    param: bool write_ic_file = if True, write results to file (for QC and
-           development)
+    param: tuple indels1 = indels of isolate1, as returned by get_indels()
+    param: tuple indels2 = indels of isolate2, as returned by get_indels()
+    return: int no_events = number of indel events unique to isolate1
     helper function to indel_comp_manager()
     """
 
-    # an "event" is a single insertion or deletion of one or more bases
-    lo_events = []
-
-    # event_no is the count of indels
-    for event_no, indel1 in enumerate(lo_indels1):
-        # the indel is unique to that isolate
-        if indel1 not in lo_indels2:
-            # split up the (posn, base) tuple
-            posn1, base1 = indel1
-            # if it's a deletion: e.g.: (1234, '-')
-            if '-' in base1:
-                # checks if any deleted base in isolate1 is ambiguous in
-                # isolate2 by checking if any position of the deletion in iso1
-                # is also on the list of ns or Ns from iso2
-                for i in range(posn1, posn1 + len(base1)):
-                    # check if the base at that position is ambiguous
-                    if i not in lo_nNs2:
-                        lo_events.append(event_no)
-
-            # an insertion: e.g.: '567 ACG' where 'CG' is inserted, but not 'A'
-            else:
-                # check if the base at that position is ambiguous
-                if posn1 not in lo_nNs2:
-                    lo_events.append(event_no)
+    lo_indels1, so_indels1, starts1, ends1, nNs1 = indels1
+    lo_indels2, so_indels2, starts2, ends2, nNs2 = indels2
+
+    if not lo_indels1:
+        return 0
 
-    # removing duplicates and reporting the final number
-    no_events = len(set(lo_events))
+    # the indel is unique to that isolate
+    unique = np.fromiter((indel1 not in so_indels2 for indel1 in lo_indels1),
+                         dtype=bool, count=len(lo_indels1))
 
-    return no_events
+    # number of positions of each indel that are ambiguous in isolate2
+    ambiguous = np.searchsorted(nNs2, ends1) - np.searchsorted(nNs2, starts1)
 
+    no_events = np.count_nonzero(unique & (ambiguous < ends1 - starts1))
 
-def indel_comp_manager(isolate_A, isolate_B, lo_bases_A, lo_bases_B):
+    return int(no_events)
+
+
+def indel_comp_manager(isolate_A, isolate_B, indels_A, indels_B):
     """
     Mananges the comparison of two SNP_cons.txt files with each other to
       determine the number of indel events.
     Note: indels versus 'n' or 'N' are not counted; indels that are similar,
       but of different length, are counted as separate events
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
     param: str isolate_A = name of one isolate
     param: str isolate_B = name of another isolate
-    param: list lo_bases_A = list of 'ACGT', 'ACGT'+ (insertion), '-', 'n',
-           'N' for isolate_A
-    param: list lo_bases_B = list of 'ACGT', 'ACGT'+ (insertion), '-', 'n',
-           'N' for isolate_B
+    param: tuple indels_A = indels of isolate_A, as returned by get_indels()
+    param: tuple indels_B = indels of isolate_B, as returned by get_indels()
     return: int = the sum of the number of indel events for A:B and B:A
     """
 
-    # convert list of bases into lo_indels and lo_nNs
-    lo_indels_A, lo_nNs_A = get_indels(lo_bases_A)
-    lo_indels_B, lo_nNs_B = get_indels(lo_bases_B)
-
     # compare A versus B, then B versus A
-    no_events_A = compare_events(isolate_A, isolate_B, lo_indels_A,
-                                 lo_indels_B, lo_nNs_B)
-    no_events_B = compare_events(isolate_B, isolate_A, lo_indels_B,
-                                 lo_indels_A, lo_nNs_A)
+    no_events_A = compare_events(isolate_A, isolate_B, indels_A, indels_B)
+    no_events_B = compare_events(isolate_B, isolate_A, indels_B, indels_A)
 
     # return sum of indel events
     return no_events_A + no_events_B
 
 
-def compare_snps(snp_cons_file, lo_cluster_snp_cons, pairwise_diffs_file):
+def load_genome(snp_cons_file):
     """
-    Organizes the pairwise comparison of '_SNP_cons.txt' files, one per
-      isolate in a cluster. Isolate_A, the query, will be compared to all other
-      files in lo_files.
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
-    param: str VCF_path_ref = cluster-specific folder with mutation data
-    param: str isolate_A = name of the query isolate, user supplied
-    param: list lo_files = list of the names of '_SNP_cons.txt' files for
-           a cluster of isolates
-    return: list lo_pairwise_diffs = [(G1, G2, V1, V2, V3, V4), ...], where
-            G1 and G2 are the names of the two genomes,
-            V1 = indel events + SNPs = mutation events,
-            V2 = number of indel events,
-            V3 = count of bases in indels,
-            V4 = SNPs
-            e.g.:  [('iso1', 'iso2', 19, 13, 41, 6),
-                    ('iso2', 'iso1', 19, 13, 41, 6)]
+    Reads a '_SNP_cons.txt' file and keeps only what is needed to compare it:
+      the packed genome and its indels.
+    param: str snp_cons_file = name of a '_SNP_cons.txt' file
+    return: str isolate = name of the isolate
+    return: tuple = the packed genome, as returned by pack_genome()
+    return: tuple = the indels, as returned by get_indels()
     """
 
-    lo_pairwise_diffs = []
+    isolate = snp_cons_file.split('.SNP_cons.txt')[0]
+    packed = pack_genome(get_seq_data(snp_cons_file))
+    return isolate, packed, get_indels(packed)
+
+
+# isolate:(packed genome, indels) pairs, filled in by compare_snps() before
+# the comparisons start, so that forked workers share them
+do_genomes = {}
+
 
-    isolate_A = snp_cons_file.split('.SNP_cons.txt')[0]
+def compare_row(row):
+    """
+    Compares one isolate to a list of other isolates, i.e. one row of the
+      upper triangle of the distance matrix.
+    param: tuple row = (isolate_A, lo_isolates_B)
+    return: str isolate_A = name of the isolate
+    return: list lo_pairwise_diffs = [(G1, G2, V1, V2, V3, V4), ...]
+    """
 
-    # extract the genome sequence
-    lo_bases_A = get_seq_data(snp_cons_file)
+    isolate_A, lo_isolates_B = row
+    packed_A, indels_A = do_genomes[isolate_A]
 
-    for cluster_snp_cons_file in lo_cluster_snp_cons:
+    lo_pairwise_diffs = []
 
-        # name of the comparator genome
-        isolate_B = cluster_snp_cons_file.split('.SNP_cons.txt')[0]
+    for isolate_B in lo_isolates_B:
 
         # don't compare the isolate to itself
         if isolate_B != isolate_A:
-            # extract the genome sequence
-            lo_bases_B = get_seq_data(cluster_snp_cons_file)
+            packed_B, indels_B = do_genomes[isolate_B]
             # check that both lists have same number of loci
-            if len(lo_bases_A) != len(lo_bases_B):
+            if packed_A[-1] != packed_B[-1]:
                 break
             # count of SNPs and bases in INDELs
-            cSNP, cINDEL = compare_two_genomes(lo_bases_A, lo_bases_B)
+            cSNP, cINDEL = compare_two_genomes(packed_A, packed_B)
             # get the number of indel events
             no_events = indel_comp_manager(isolate_A, isolate_B,
-                                           lo_bases_A, lo_bases_B)
+                                           indels_A, indels_B)
             # add (G1, G2, V1, V2, V3, V4) to the list
             lo_pairwise_diffs.append((isolate_A, isolate_B, no_events + cSNP,
                                      no_events, cINDEL, cSNP))
 
+    return isolate_A, lo_pairwise_diffs
+
+
+def write_pairwise_diffs(pairwise_diffs_file, lo_pairwise_diffs):
+    """
+    Writes the pairwise differences of one isolate to a CSV file.
+    param: str pairwise_diffs_file = name of the CSV file
+    param: list lo_pairwise_diffs = [(G1, G2, V1, V2, V3, V4), ...]
+    """
+
     with open(pairwise_diffs_file, 'w', newline='') as outfile:  # write to csv
         csv_writer = csv.writer(outfile)
         for row in lo_pairwise_diffs:
             csv_writer.writerow(row)
 
 
+def compare_snps(lo_snp_cons, lo_cluster_snp_cons, cpus):
+    """
+    Organizes the pairwise comparison of '_SNP_cons.txt' files for all new
+      isolates in a cluster. Each file is read once; each new isolate is then
+      compared to the new isolates after it and to all existing members of
+      the cluster, so that every pair is compared once. With no existing
+      members, this is the all-vs-all comparison of the whole cluster.
+      Rows of the comparison are spread over cpus worker processes.
+    param: list lo_snp_cons = list of the names of '_SNP_cons.txt' files for
+           the new isolates in a cluster
+    param: list lo_cluster_snp_cons = list of the names of '_SNP_cons.txt'
+           files for the existing isolates in a cluster
+    param: int cpus = number of worker processes
+    output: one '.pairwise_diffs.csv' file per new isolate, with rows
+            (G1, G2, V1, V2, V3, V4), where
+            G1 and G2 are the names of the two genomes,
+            V1 = indel events + SNPs = mutation events,
+            V2 = number of indel events,
+            V3 = count of bases in indels,
+            V4 = SNPs
+            e.g.:  iso1,iso2,19,13,41,6
+    """
+
+    lo_isolates = [snp_cons_file.split('.SNP_cons.txt')[0]
+                   for snp_cons_file in lo_snp_cons]
+    lo_cluster_isolates = [snp_cons_file.split('.SNP_cons.txt')[0]
+                           for snp_cons_file in lo_cluster_snp_cons]
+
+    # one row per new isolate: the new isolates after it, then the cluster
+    lo_rows = [(isolate_A, lo_isolates[i+1:] + lo_cluster_isolates)
+               for i, isolate_A in enumerate(lo_isolates)]
+
+    # longest rows first, so that the workers finish at about the same time
+    lo_rows.sort(key=lambda row: len(row[1]), reverse=True)
+
+    context = multiprocessing.get_context('fork')
+
+    # extract the packed genome sequences and indels, once per isolate
+    lo_files = lo_snp_cons + lo_cluster_snp_cons
+    with context.Pool(cpus) as pool:
+        for isolate, packed, indels in pool.imap_unordered(load_genome, lo_files):
+            do_genomes.setdefault(isolate, (packed, indels))
+    logger.info('Loaded %s genomes.', len(do_genomes))
+
+    with context.Pool(cpus) as pool:
+        for isolate_A, lo_pairwise_diffs in pool.imap_unordered(compare_row, lo_rows):
+            logger.info('Compared %s to %s isolates.', isolate_A, len(lo_pairwise_diffs))
+
+            pairwise_diffs_file = isolate_A + '.pairwise_diffs.csv'
+            write_pairwise_diffs(pairwise_diffs_file, lo_pairwise_diffs)
+
+
 if __name__ == "__main__":
     logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
 
@@ -326,4 +457,4 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(compare_snps("$snp_cons", "$cluster_snp_cons".split(), "$pairwise_diffs"))
+    sys.exit(compare_snps("$snp_cons".split(), "$cluster_snp_cons".split(), int("$task.cpus")))
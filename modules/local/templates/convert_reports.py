@@ -4,82 +4,135 @@
 """Convert reports."""
 
 
+import hashlib
+import json
 import logging
 import platform
 import sys
 import yaml
 from pathlib import Path
 
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
 
 logger = logging.getLogger()
 
 
-def make_report_html(report_file):
+def make_report_html(report_json):
+    """
+    Converts the JSON records of a report into html: items become a
+      description list, rows a table (the first row is the header), headings
+      h3 elements and text p elements.
+    param: str report_json = report.json file written by the Report builder
+    return: str section_name = name of the report section
+    return: str data = html of the report section
+    """
 
     use_desc = False
     use_table = False
     section_name = ''
     html = []
 
-    with open(report_file, 'r') as infile:
-        for line in infile:
-            line = line.rstrip('\\n')
-            if line == '':
-                continue
-            if section_name == '':
-                section_name = line[:-1]
-                continue
-            if line.count('\t') == 1:
-                if not use_desc:
-                    if use_table:
-                        html.append('</table>')
-                        use_table = False
-                    html.append('<dl>')
-                    use_desc = True
-                name, desc = line.split('\t')
-                if name.endswith(':'):
-                    name = name[:-1]
-                html.append('<dt>' + name + '</dt><dd>' + desc + '</dd>')
-                continue
-            if line.count('\t') > 1:
-                if not use_table:
-                    if use_desc:
-                        html.append('</dl>')
-                        use_desc = False
-                    html.append('<table class="table">')
-                    html.append('<tr>')
-                    for element in line.split('\t'):
-                        html.append('<th>' + element + '</th>')
-                    html.append('</tr>')
-                    use_table = True
-                else:
-                    html.append('<tr>')
-                    for element in line.split('\t'):
-                        html.append('<td>' + element + '</td>')
-                    html.append('</tr>')
-                continue
-            if use_table:
-                html.append('</table>')
-                use_table = False
-            elif use_desc:
-                html.append('</dl>')
-                use_desc = False
-            if line.endswith(':'):
-                html.append('<h3>' + line[:-1] + '</h3>')
+    with open(report_json, 'r') as infile:
+        lo_records = json.load(infile)
+
+    for record in lo_records:
+        kind = record[0]
+        # QC metrics are stored by MAKE_QC_DB, not shown in the report
+        if kind == 'metric':
+            continue
+        if kind == 'title':
+            section_name = record[1]
+            continue
+        if kind == 'item':
+            if not use_desc:
+                if use_table:
+                    html.append('</table>')
+                    use_table = False
+                html.append('<dl>')
+                use_desc = True
+            html.append('<dt>' + record[1] + '</dt><dd>' + record[2] + '</dd>')
+            continue
+        if kind == 'row':
+            if not use_table:
+                if use_desc:
+                    html.append('</dl>')
+                    use_desc = False
+                html.append('<table class="table">')
+                html.append('<tr>')
+                for element in record[1]:
+                    html.append('<th>' + element + '</th>')
+                html.append('</tr>')
+                use_table = True
             else:
-                html.append('<p>' + line + '</p>')
+                html.append('<tr>')
+                for element in record[1]:
+                    html.append('<td>' + element + '</td>')
+                html.append('</tr>')
+            continue
+        if use_table:
+            html.append('</table>')
+            use_table = False
+        elif use_desc:
+            html.append('</dl>')
+            use_desc = False
+        if kind == 'heading':
+            html.append('<h3>' + record[1] + '</h3>')
+        else:
+            html.append('<p>' + record[1] + '</p>')
 
     return section_name, "\\n".join(html)
 
 
-def convert_report(report_file, mqc_file, report_name):
+def get_section(report_json, cache_dir, new_cache_dir):
+    """
+    Returns the section name and html of a report, from the report cache if
+      the same report was converted before, else from its records, which are
+      then added to the new cache entries.
+    param: str report_json = report.json file of one step
+    param: str cache_dir = folder of the cached sections of the reports
+    param: str new_cache_dir = folder of the new cache entries, which are
+           published to the report cache
+    return: str section_name = name of the report section
+    return: str data = html of the report section
+    """
+
+    # sections are cached under the md5 of the report records
+    with open(report_json, 'rb') as infile:
+        digest = hashlib.md5(infile.read()).hexdigest()
+    cache_file = Path(cache_dir) / (digest + '.json')
+
+    if cache_file.exists():
+        with open(cache_file, 'r') as infile:
+            section_name, data = json.load(infile)
+        return section_name, data
+
+    section_name, data = make_report_html(report_json)
+
+    Path(new_cache_dir).mkdir(exist_ok=True)
+    with open(Path(new_cache_dir) / (digest + '.json'), 'w') as outfile:
+        json.dump([section_name, data], outfile)
+
+    return section_name, data
+
+
+def convert_report(report_json, mqc_file, report_name, cache_dir, new_cache_dir,
+                   sample=''):
     """
-    Adds a line of text from the report.txt file to the html file.
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
-    param: str line = line of text from the report.txt file
+    Converts the records of a report into a MultiQC custom content section.
+    param: str report_json = report.json file of one step
+    param: str mqc_file = output file
+    param: str report_name = id of the section, e.g.: 'bwa_report'
+    param: str cache_dir = folder of the cached sections of the reports
+    param: str new_cache_dir = folder of the new cache entries
+    param: str sample = if set, the section is listed under the sample
+    output: _mqc.yml file with the section as html
     """
 
-    section_name, data = make_report_html(report_file)
+    section_name, data = get_section(report_json, cache_dir, new_cache_dir)
 
     report_mqc = {
         "id": report_name,
@@ -88,16 +141,41 @@ def convert_report(report_file, mqc_file, report_name):
         "data": data,
     }
 
+    if sample:
+        report_mqc["parent_id"] = sample
+        report_mqc["parent_name"] = sample
+
     with open(mqc_file, 'w') as outfile:
-        yaml.dump(report_mqc, outfile, default_flow_style=False)
+        yaml.dump(report_mqc, outfile, Dumper=SafeDumper, default_flow_style=False)
+
 
+def convert_reports(lo_reports, lo_samples, cache_dir, new_cache_dir, batch):
+    """
+    Main function: converts the records of the reports into MultiQC custom
+      content sections.
+    param: list lo_reports = report.json files, e.g.:
+           ['S1.bwa_report.json', 'S1.quast_report.json', ...]
+    param: list lo_samples = sample of each report, e.g.: ['S1', 'S1', ...]
+    param: str cache_dir = folder of the cached sections of the reports
+    param: str new_cache_dir = folder of the new cache entries, which are
+           published to the report cache
+    param: bool batch = if True, the reports are of several samples, which
+           are converted for a single MultiQC report, with the sections of
+           each sample grouped under the sample name
+    output: one _mqc.yml file per report
+    """
 
-def convert_reports(lo_reports):
-    """Convert reports"""
+    for report_json, sample in zip(lo_reports, lo_samples):
+        if batch:
+            # e.g.: S1.R1.bwa_report.json -> S1_R1_bwa_report
+            report_name = report_json[:-5].replace('.', '_')
+        else:
+            sample = ''
+            report_name = report_json.split('.')[-2]
+        convert_report(report_json, report_json[:-5] + '_mqc.yml', report_name,
+                       cache_dir, new_cache_dir, sample)
 
-    for report_file in lo_reports:
-        report_name = report_file.split('.')[-2]
-        convert_report(report_file, report_file[:-4] + '_mqc.yml', report_name)
+    logger.info('Converted ' + str(len(lo_reports)) + ' reports.')
 
 
 if __name__ == "__main__":
@@ -111,4 +189,5 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(convert_reports("$reports".split()))
+    sys.exit(convert_reports("$reports".split(), "$sample_names".split(), "cache",
+                             "report_cache", "$batch" == "true"))
@@ -5,11 +5,10 @@
 
 
 import csv
+import json
 import logging
-import matplotlib.pyplot as plt
 import numpy as np
 import platform
-import re
 import sys
 import yaml
 from pathlib import Path
@@ -18,40 +17,111 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
-def parse_file(depth_file):
+class Report:
     """
-    Extracts the read depths values from a 'samtools_depth.txt' file.
-    return: list lo_depths = read depth for each base in the genome, sorted by
-            position; e.g.: [0,0,1,1,4,5,7,19,45, ...]
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text. QC metrics are not part of the
+      text, they are added after the lines as ['metric', name, value,
+      reference] records, which MAKE_QC_DB stores in the QC database.
     """
 
-    lo_depths = []
-    with open(depth_file, 'r') as in_file:
-        for line in in_file:
-            line = line.rstrip('\\n')
-            depth = line.split()[2]
-            lo_depths.append(int(depth))
-    return lo_depths
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.lo_metrics = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def metric(self, name, value, reference=''):
+        """
+        Adds a QC metric of the task, e.g.: metric('percent_mapped', 98.7).
+        param: str name = name of the metric
+        param: float value = value of the metric
+        param: str reference = reference the metric refers to, if it is not
+               the reference of the task, e.g. for Mash distances
+        """
+
+        self.lo_metrics.append(['metric', name, float(value), reference])
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
 
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
 
-def translate_low_coverage(lo_depths, MIN_DEPTH):
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records + self.lo_metrics, outfile)
+
+
+def read_coverage(coverage_file):
     """
-    Translation of a list of numbers into a string of 'a' and 'B', where an
-      'a' indicates that the corresponding number was Above MIN_DEPTH or
-      'B' Below it
-    param: list lo_depths = read depths for each base in the genome
-    param: int MIN_DEPTH = minimal value to be sufficiently mapped by reads
-    return str ab_string = string of 'a' and 'B'
-           e.g.: [1,1,5,6,4,1], MIN_DEPTH=3 => 'BBaaaB'
+    Extracts the read depths values from the coverage array made by
+      MAKE_COVERAGE.
+    param: str coverage_file = .npz file with the read depth for each base
+    return: list lo_contigs = contig names, in the order of the reference
+    return: list lo_lengths = number of bases per contig
+    return: array depths = read depth for each base in the genome, sorted by
+            position; e.g.: [0,0,1,1,4,5,7,19,45, ...]
     """
 
-    ab_string = ''
-    for depth in lo_depths:
-        if depth >= MIN_DEPTH:
-            ab_string += 'a'
-        else:
-            ab_string += 'B'
-    return ab_string
+    with np.load(coverage_file) as coverage:
+        return coverage['contigs'].tolist(), coverage['lengths'].tolist(), \
+            coverage['depths']
 
 
 def depth_by_group(lo_depths, MIN_DEPTH):
@@ -59,22 +129,14 @@ def depth_by_group(lo_depths, MIN_DEPTH):
     Splits lo_depths into three lists (depth == 0, 0 < depth < MIN_DEPTH,
       depth >= MIN_DEPTH), and calculates the mean, standard deviation and
       length of each list.
-    param: list lo_depths = read depths for each base in the genome
+    param: array lo_depths = read depths for each base in the genome
     param: int MIN_DEPTH = minimal value to be sufficiently mapped by reads
     return: tuple of tuples with mean, std and length for each list
     """
 
-    lo_above = []
-    lo_below = []
-    lo_zeros = []
-
-    for depth in lo_depths:
-        if depth >= MIN_DEPTH:
-            lo_above.append(depth)
-        elif 0 < depth < MIN_DEPTH:
-            lo_below.append(depth)
-        elif depth == 0:
-            lo_zeros.append(depth)
+    lo_above = lo_depths[lo_depths >= MIN_DEPTH]
+    lo_below = lo_depths[(lo_depths > 0) & (lo_depths < MIN_DEPTH)]
+    lo_zeros = lo_depths[lo_depths == 0]
 
     if len(lo_above) > 0:
         above = (np.mean(lo_above), np.std(lo_above), len(lo_above))
@@ -92,20 +154,47 @@ def depth_by_group(lo_depths, MIN_DEPTH):
     return above, below, zero
 
 
-def count_gaps(ab_string, GAP_LENGTH):
+def find_gaps(lo_depths, lo_contigs, lo_lengths, MIN_DEPTH, GAP_LENGTH):
     """
-    Counts the number of all gaps >= GAP_LENGTH.
-    param: str ab_string = string of 'a' and 'B', e.g. 'BBaaaB...'
+    Finds all gaps >= GAP_LENGTH, i.e. runs of bases with a read depth below
+      MIN_DEPTH, in a single pass over the read depths of each contig.
+    param: array lo_depths = read depths for each base in the genome
+    param: list lo_contigs = contig names, in the order of the reference
+    param: list lo_lengths = number of bases per contig
+    param: int MIN_DEPTH = minimal value to be sufficiently mapped by reads
     param: int GAP_LENGTH = minimal gap length to be counted
-    return: int no_gaps = number of gaps >= GAP_LENGTH
+    return: list lo_gaps = list of (contig, start, length) for each gap, where
+            start is 0-based, e.g.: [('NODE_1', 1022, 43), ...]
     """
 
-    query = 'B' * GAP_LENGTH + '+'
-    # re.findall('BBBB+', str) finds all substrings of 4 or more 'B' in str
-    lo_gaps = re.findall(query, ab_string)
-    no_gaps = len(lo_gaps)
-    lo_gap_lens = [len(x) for x in lo_gaps]
-    return lo_gap_lens, no_gaps
+    lo_gaps = []
+    end = 0
+    for contig, length in zip(lo_contigs, lo_lengths):
+        start, end = end, end + length
+        # pads the contig with a covered base on each side, so that every
+        # gap has a start (covered -> low) and an end (low -> covered)
+        low = np.concatenate(([False], lo_depths[start:end] < MIN_DEPTH, [False]))
+        changes = np.flatnonzero(low[1:] != low[:-1])
+        gap_starts = changes[0::2]
+        gap_lens = changes[1::2] - gap_starts
+        for gap_start, gap_len in zip(gap_starts.tolist(), gap_lens.tolist()):
+            if gap_len >= GAP_LENGTH:
+                lo_gaps.append((contig, gap_start, gap_len))
+    return lo_gaps
+
+
+def write_bed(bed_file, lo_gaps):
+    """
+    Writes the gaps to a BED file, one gap per row.
+    param: str bed_file = output file
+    param: list lo_gaps = list of (contig, start, length) for each gap
+    output: BED file with contig, start (0-based) and end of each gap
+    """
+
+    with open(bed_file, 'w', newline='') as output:
+        output_writer = csv.writer(output, delimiter='\t')
+        for contig, start, length in lo_gaps:
+            output_writer.writerow([contig, start, start + length])
 
 
 def write_report(report_file, lo_depth_stats, MIN_DEPTH, GAP_LENGTH):
@@ -122,48 +211,55 @@ def write_report(report_file, lo_depth_stats, MIN_DEPTH, GAP_LENGTH):
     percent_below = round((count_below * 100 / count_all), 2)
     percent_above = 100 - percent_below
 
-    with open(report_file, 'a') as report:
-
-        print('\\nAlignment QC (Samtools depth):', file=report)
-
-        print('Total number of bases:\t' + str(count_all), file=report)
-        print('Number (percent) of bases with read depth < '\
-              + str(MIN_DEPTH) + ':\t' + str(count_below)\
-              + ' (' + str(percent_below) + '%)', file=report)
-        print('Number (percent) of bases with read depth >= '\
-              + str(MIN_DEPTH) + ':\t' + str(count_above)\
-              + ' (' + str(percent_above) + '%)', file=report)
-
-        print('Average read depth (S.D.):\t' + str(depth_mean) + ' ('\
-              + str(depth_sd) + ')', file=report)
-
-        print('Average read depth (S.D., count) for bases with read depth'\
-              + ' >= ' + str(MIN_DEPTH) + ':\t'\
-              + str(round(depth_above[0], 2)) + ' ('\
-              + str(round(depth_above[1], 2)) + ', '\
-              + str(round(depth_above[2], 2)) + ')', file=report)
-        print('Average read depth (S.D., count) for bases with read depth'\
-              + ' > 0 and < ' + str(MIN_DEPTH) + ':\t'\
-              + str(round(depth_below[0], 2)) + ' ('\
-              + str(round(depth_below[1], 2)) + ', '\
-              + str(round(depth_below[2], 2)) + ')', file=report)
-        print('Average read depth (S.D., count) for bases with read depth'\
-              + ' == 0:\t'\
-              + str(round(depth_zero[0], 2)) + ' ('\
-              + str(round(depth_zero[1], 2)) + ', '\
-              + str(round(depth_zero[2], 2)) + ')', file=report)
-
-        print('Number of gaps >= ' + str(GAP_LENGTH) + ' bases:\t', no_gaps,\
-              file=report)
-        print('List of gaps >= ' + str(GAP_LENGTH) + ' bases:\t',\
-              sorted(lo_gap_lens), file=report)
-
-        print('Total number of bases in gaps >= ' + str(GAP_LENGTH)\
-              + ' bases:\t', sum(lo_gap_lens), file=report)
-
-        # placeholders for images in html file
-        print('Figure: Read depth per base (plot)', file=report)
-        print('Figure: Read depth per base (histogram)', file=report)
+    report = Report(report_file)
+
+    report.print('\\nAlignment QC (Samtools depth):')
+
+    report.print('Total number of bases:\t' + str(count_all))
+    report.print('Number (percent) of bases with read depth < '\
+                 + str(MIN_DEPTH) + ':\t' + str(count_below)\
+                 + ' (' + str(percent_below) + '%)')
+    report.print('Number (percent) of bases with read depth >= '\
+                 + str(MIN_DEPTH) + ':\t' + str(count_above)\
+                 + ' (' + str(percent_above) + '%)')
+
+    report.print('Average read depth (S.D.):\t' + str(depth_mean) + ' ('\
+                 + str(depth_sd) + ')')
+
+    report.print('Average read depth (S.D., count) for bases with read depth'\
+                 + ' >= ' + str(MIN_DEPTH) + ':\t'\
+                 + str(round(depth_above[0], 2)) + ' ('\
+                 + str(round(depth_above[1], 2)) + ', '\
+                 + str(round(depth_above[2], 2)) + ')')
+    report.print('Average read depth (S.D., count) for bases with read depth'\
+                 + ' > 0 and < ' + str(MIN_DEPTH) + ':\t'\
+                 + str(round(depth_below[0], 2)) + ' ('\
+                 + str(round(depth_below[1], 2)) + ', '\
+                 + str(round(depth_below[2], 2)) + ')')
+    report.print('Average read depth (S.D., count) for bases with read depth'\
+                 + ' == 0:\t'\
+                 + str(round(depth_zero[0], 2)) + ' ('\
+                 + str(round(depth_zero[1], 2)) + ', '\
+                 + str(round(depth_zero[2], 2)) + ')')
+
+    report.print('Number of gaps >= ' + str(GAP_LENGTH) + ' bases:\t', no_gaps)
+    report.print('List of gaps >= ' + str(GAP_LENGTH) + ' bases:\t',\
+                 sorted(lo_gap_lens))
+
+    report.print('Total number of bases in gaps >= ' + str(GAP_LENGTH)\
+                 + ' bases:\t', sum(lo_gap_lens))
+
+    # placeholders for images in html file
+    report.print('Figure: Read depth per base (plot)')
+    report.print('Figure: Read depth per base (histogram)')
+
+    report.metric('depth_mean', depth_mean)
+    report.metric('depth_sd', depth_sd)
+    report.metric('percent_below_min_depth', percent_below)
+    report.metric('gaps', no_gaps)
+    report.metric('bases_in_gaps', sum(lo_gap_lens))
+
+    report.flush()
 
 
 def write_log(MIN_DEPTH, GAP_LENGTH, INTERVAL):
@@ -175,85 +271,55 @@ def write_log(MIN_DEPTH, GAP_LENGTH, INTERVAL):
     """
 
     logger.info('\\ncount_nnn_gaps.py settings:')
-    logger.info('minimal read depth:', MIN_DEPTH)
-    logger.info('minimal gap length:', GAP_LENGTH)
-    logger.info('counting interval:', INTERVAL)
+    logger.info('minimal read depth: ' + str(MIN_DEPTH))
+    logger.info('minimal gap length: ' + str(GAP_LENGTH))
+    logger.info('counting interval: ' + str(INTERVAL))
 
 
-def calc_n_per_interval(ab_string, INTERVAL):
+def calc_n_per_interval(lo_depths, MIN_DEPTH, INTERVAL):
     """
     Counts the number of low depth bases within a region of length INTERVAL.
-    param: str ab_string = string of 'a' and 'B', e.g. 'BBaaaB...'
+    param: array lo_depths = read depths for each base in the genome
+    param: int MIN_DEPTH = minimal value to be sufficiently mapped by reads
     param: int INTERVAL = size of subsections of the genome, e.g. 5000 bp
     return: list lo_depth_per_interval = list of counts of low coverage bases
             per INTERVAL, e.g.: [0,0,167,5000,5000,321,0,0,0,...]
     """
 
-    lo_depth_per_interval = [ab_string[i:i+INTERVAL].count('B') for i in\
-                             range(0, len(ab_string), INTERVAL)]
-    return lo_depth_per_interval
+    if len(lo_depths) == 0:
+        return []
+    low = (lo_depths < MIN_DEPTH).astype(np.int64)
+    lo_depth_per_interval = np.add.reduceat(low, np.arange(0, len(low), INTERVAL))
+    return lo_depth_per_interval.tolist()
 
 
-def histo_read_depth_distr(histo_depths_file, lo_depths):
+def write_plot_data(plot_data_file, lo_depths):
     """
-    Plots a histogram of the read depth per base distribution.
-    param: list lo_depths = read depths for each base in the genome
-    output: histogram of the read depth per base distribution, including the
-            mean and mean +/- 3 StDev
+    Reduces the read depths to what RENDER_PLOTS needs to draw the
+      'histo_depths' and 'plot_depths' figures.
+    param: str plot_data_file = output file
+    param: array lo_depths = read depths for each base in the genome
+    output: .npz file with the read depth histogram, the mean and StDev, and
+            the read depth per base
     """
 
-    average = np.mean(lo_depths)
-    SD = np.std(lo_depths)
+    depths = np.asarray(lo_depths, dtype=np.uint32)
+    depth_counts, depth_edges = np.histogram(depths, bins=20)
 
-    plt.hist(lo_depths, bins=20, color='brown')
-    # Draw a default (v-)line at x that spans the y-range
-    plt.axvline(x= average, color='blue', linewidth=3)
-    plt.axvline(x= (average + 3 * SD), color='blue')
-    plt.axvline(x= (average - 3 * SD), color='blue')
-    plt.title('Read depth per base (average +/- 3 SD)')
-    plt.xlabel('Read depth per base')
-    plt.ylabel('Number of bases')
-    plt.savefig(histo_depths_file)
-    plt.close()
+    np.savez_compressed(plot_data_file,
+                        figures=np.array(['histo_depths', 'plot_depths']),
+                        depth_counts=depth_counts, depth_edges=depth_edges,
+                        depth_mean=np.mean(lo_depths),
+                        depth_sd=np.std(lo_depths), depths=depths)
 
 
-def plot_read_depth_distr(plot_depths_file, lo_depths):
+def count_nnn_gaps(coverage_file, plot_data_file, output_file, report_file,
+                   bed_file, percent_mapped, MIN_DEPTH, GAP_LENGTH, INTERVAL, MAX_NO_NS,
+                   MAX_NO_GAPS, MAPPED_THRESHOLD):
     """
-    Plots the read depth per base distribution.
-    param: list lo_depths = read depths for each base in the genome
-    output: histogram of the read depth per base distribution, including
-            lines indicating the mean +/- 3 * StDev
-    """
-
-    average = np.mean(lo_depths)
-    SD = np.std(lo_depths)
-    max_x_val = int(np.ceil(len(lo_depths)/500000)) + 1  # highest value on x-axis
-    fig, ax = plt.subplots()
-
-    plt.plot(lo_depths, color='blue')
-    # Draw a line at y that spans the x-range
-    plt.axhline(y= average, color='red', linewidth=3)
-    plt.axhline(y= (average + 3 * SD), color='orange')
-    plt.axhline(y= (average - 3 * SD), color='orange')
-    plt.title('Read depth per base (average +/- 3 SD)')
-    plt.xlabel('Read depth per base [Mb]')
-    plt.ylabel('Number of reads')
-
-    # set the tick labels to 500000 bp intervals
-    ax.set_xticks([500000 * x for x in range(0, max_x_val)])
-    # change the tick labels from absolute values to intervals of 0.5 Mb
-    ax.set_xticklabels([0.5 * x for x in range(0, max_x_val)])
-
-    plt.savefig(plot_depths_file)
-    plt.close()
-
-
-def count_nnn_gaps(depth_file, histo_depths_file, plot_depths_file,
-                   output_file, report_file, percent_mapped, MIN_DEPTH,
-                   GAP_LENGTH, INTERVAL, MAX_NO_NS, MAX_NO_GAPS, MAPPED_THRESHOLD):
-    """
-    Main function: parses the 'samtools_depth.txt' file, writes statistics
-      to the report, and plots the distribution of poorly covered regions.
+    Main function: reads the coverage array, writes statistics to the
+      report, writes the gaps to a BED file, and saves the read depths for
+      plotting.
     param: int MIN_DEPTH = minimal value to be sufficiently mapped by reads
     param: int GAP_LENGTH = minimal gap length
     param: int INTERVAL = size of subsections of the genome, e.g. 5000 bp
@@ -261,21 +327,24 @@ def count_nnn_gaps(depth_file, histo_depths_file, plot_depths_file,
     return: float depth_sd = standard deviation read depth per base
     """
 
-    # list of depths values, where the first element is base number 1
-    lo_depths = parse_file(depth_file)
+    # array of depths values, where the first element is base number 1
+    lo_contigs, lo_lengths, lo_depths = read_coverage(coverage_file)
 
-    # string of 'a' and 'B' for above/below MIN_DEPTH
-    ab_string = translate_low_coverage(lo_depths, MIN_DEPTH)
+    # finds all gaps larger than GAP_LENGTH
+    lo_gaps = find_gaps(lo_depths, lo_contigs, lo_lengths, MIN_DEPTH, GAP_LENGTH)
+    lo_gap_lens = [length for contig, start, length in lo_gaps]
+    no_gaps = len(lo_gaps)
+    write_bed(bed_file, lo_gaps)
 
-    # counts the number of gaps larger than GAP_LENGTH
-    lo_gap_lens, no_gaps = count_gaps(ab_string, GAP_LENGTH)
+    # counts the number of low depth bases per INTERVAL
+    lo_depth_per_interval = calc_n_per_interval(lo_depths, MIN_DEPTH, INTERVAL)
 
     # mean and standard deviation for all bases
     depth_mean = round(np.mean(lo_depths), 2)
     depth_sd = round(np.std(lo_depths), 3)
     # count number of bases above and below MIN_DEPTH
-    count_all = len(ab_string)
-    count_below = ab_string.count('B')
+    count_all = len(lo_depths)
+    count_below = int(np.count_nonzero(lo_depths < MIN_DEPTH))
     count_above = count_all - count_below
     # average read depth, standard deviation and number for bases with
     # depth == 0, 0 < depth < MIN_DEPTH, and depth >= MIN_DEPTH
@@ -288,25 +357,25 @@ def count_nnn_gaps(depth_file, histo_depths_file, plot_depths_file,
     # add data to the report and log file
     write_report(report_file, lo_depth_stats, MIN_DEPTH, GAP_LENGTH)
     write_log(MIN_DEPTH, GAP_LENGTH, INTERVAL)
-
-    # plot the distribution of read depths per base
-    histo_read_depth_distr(histo_depths_file, lo_depths)
-    plot_read_depth_distr(plot_depths_file, lo_depths)
+    logger.info('low depth bases per interval: ' + str(lo_depth_per_interval))
 
     # if there are too many unmapped bases, abort unless it might be a
     # candidate reference
     if (count_below > MAX_NO_NS) and not (percent_mapped < MAPPED_THRESHOLD):
-        logger.error('There are ' + str(n_count) \
+        logger.error('There are ' + str(count_below) \
                      + ' unmapped bases, which is far too many.')
         sys.exit(2)
 
     # if there are too many gaps, abort unless it might be a candidate reference
     if (no_gaps > MAX_NO_GAPS) and not (percent_mapped < MAPPED_THRESHOLD):
-        logger.error('There are ' + str(gaps) \
+        logger.error('There are ' + str(no_gaps) \
                      + ' gaps compared to the reference genome,'\
                      + ' which is far too many.')
         sys.exit(2)
 
+    # save the distribution of read depths per base for RENDER_PLOTS
+    write_plot_data(plot_data_file, lo_depths)
+
     with open(output_file, 'a', newline='') as output:
         output_writer = csv.writer(output)
         output_writer.writerow([depth_mean])
@@ -324,7 +393,7 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(count_nnn_gaps("$depth", "$histo_depths", "$plot_depths", "$output", "$report",
+    sys.exit(count_nnn_gaps("$coverage", "$plot_data", "$output", "$report", "$bed",
                             float("$percent_mapped"), int("$min_depth"), int("$gap_length"),
                             int("$interval"), int("$max_no_ns"), int("$max_no_gaps"),
                             float("$mapped_threshold")))
@@ -4,6 +4,7 @@
 """Filter contigs."""
 
 
+import csv
 import logging
 import platform
 import random
@@ -15,11 +16,35 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
-def filter_contigs(contigs_in, contigs_out, MIN_CONTIG_LEN, MIN_CONTIG_COV):
+def read_contigs_index(contigs_index_file):
     """
-    Goes through the spades contigs file and writes the contigs above
-      MIN_CONTIG_LEN and MIN_CONTIG_COV to a new file.
+    Reads the contig index written by INDEX_CONTIGS.
+    param: str contigs_index_file = contig index file
+    return: list lo_records = [[header, contig number, length, coverage,
+            byte offset, record size in bytes], ...] as strings, e.g.:
+            [['NODE_1_length_238256_cov_41.824755', '1', '238256',
+              '41.824755', '0', '242262'], ...]
+    """
+
+    lo_records = []
+    with open(contigs_index_file, 'r', newline='') as infile:
+        reader = csv.reader(infile, dialect='excel-tab')
+        for row in reader:
+            # ignore the header
+            if row[0].startswith('#'):
+                continue
+            lo_records.append(row)
+    return lo_records
+
+
+def filter_contigs(contigs_in, contigs_index, contigs_out, MIN_CONTIG_LEN,
+                   MIN_CONTIG_COV):
+    """
+    Goes through the contig index and copies the contigs above
+      MIN_CONTIG_LEN and MIN_CONTIG_COV from the spades contigs file to a new
+      file, using the byte offsets from the index.
     param: str contigs_in = input contigs file
+    param: str contigs_index = contig index file for contigs_in
     param: str contigs_out = output contigs file
     param: int MIN_CONTIG_LEN = min lengths of contig in bases
     param: float MIN_CONTIG_COV = minimal contig coverage per base
@@ -27,25 +52,19 @@ def filter_contigs(contigs_in, contigs_out, MIN_CONTIG_LEN, MIN_CONTIG_COV):
             selection criteria
     """
 
-    with open(contigs_in, 'r') as in_file:
-        with open(contigs_out, 'a') as out_file:
-            for line in in_file:
-                line = line.rstrip('\\n')
-                if line.startswith('>'):
-                    data = line.split('_')
-                    length = int(data[3])
-                    cov = float(data[5])
-                    if length > MIN_CONTIG_LEN\
-                    and cov > MIN_CONTIG_COV:
-                        do_copy = True
-                    else:
-                        do_copy = False
-                if do_copy:
-                    print(line, file=out_file)
-
-    logger.info('\\nfilter_contigs:')
-    logger.info('minimal contig length:', MIN_CONTIG_LEN)
-    logger.info('minimal contig coverage:', MIN_CONTIG_COV)
+    lo_records = read_contigs_index(contigs_index)
+
+    with open(contigs_in, 'rb') as in_file:
+        with open(contigs_out, 'ab') as out_file:
+            for header, node, length, cov, offset, size in lo_records:
+                if int(length) > MIN_CONTIG_LEN\
+                and float(cov) > MIN_CONTIG_COV:
+                    in_file.seek(int(offset))
+                    out_file.write(in_file.read(int(size)))
+
+    logger.info('filter_contigs:')
+    logger.info('minimal contig length: %s', MIN_CONTIG_LEN)
+    logger.info('minimal contig coverage: %s', MIN_CONTIG_COV)
 
 
 if __name__ == "__main__":
@@ -59,4 +78,4 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(filter_contigs("$contigs", "$filtered_contigs", int("$min_contig_len"), float("$min_contig_cov")))
+    sys.exit(filter_contigs("$contigs", "$contigs_index", "$filtered_contigs", int("$min_contig_len"), float("$min_contig_cov")))
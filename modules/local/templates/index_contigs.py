@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+
+"""Index contigs."""
+
+
+import csv
+import logging
+import os
+import platform
+import sys
+import yaml
+from pathlib import Path
+
+
+logger = logging.getLogger()
+
+
+def read_contig_records(contigs_file):
+    """
+    Reads a 'SPAdes_contigs.fa' file once in binary mode and returns the
+      header data and location of each contig record in the file.
+    param: str contigs_file = SPAdes contigs file
+    return: list lo_records = [(header, contig number, length, coverage,
+            byte offset, record size in bytes), ...], where contig number,
+            length and coverage are kept as written in the header, e.g.:
+            [('NODE_1_length_238256_cov_41.824755', '1', '238256',
+              '41.824755', 0, 242262), ...]
+    """
+
+    lo_records = []
+    offset = 0
+
+    with open(contigs_file, 'rb') as infile:
+        for line in infile:
+            if line.startswith(b'>'):
+                # close the previous record
+                if lo_records:
+                    lo_records[-1][5] = offset - lo_records[-1][4]
+                # >NODE_1_length_238256_cov_41.824755
+                header = line.rstrip(b'\\n').decode()[1:]
+                data = header.split('_')
+                lo_records.append([header, data[1], data[3], data[5],
+                                   offset, 0])
+            offset += len(line)
+
+    # close the last record
+    if lo_records:
+        lo_records[-1][5] = os.path.getsize(contigs_file) - lo_records[-1][4]
+
+    return lo_records
+
+
+def index_contigs(contigs_file, contigs_index_file):
+    """
+    Writes a contig summary table for a 'SPAdes_contigs.fa' file, so that
+      later steps can get the contig lengths and coverages without parsing
+      the headers again and can copy single contigs by random access.
+    param: str contigs_file = SPAdes contigs file
+    param: str contigs_index_file = output contig index file
+    output: tab-separated file with one row per contig: header, node, length,
+            coverage, byte offset, and size of the record in bytes
+    """
+
+    lo_records = read_contig_records(contigs_file)
+
+    with open(contigs_index_file, 'w', newline='') as outfile:
+        writer = csv.writer(outfile, dialect='excel-tab')
+        writer.writerow(['#header', 'node', 'length', 'coverage', 'offset',
+                         'size'])
+        writer.writerows(lo_records)
+
+    logger.info('Indexed %d contigs.', len(lo_records))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
+
+    versions = {}
+    versions["${task.process}"] = {
+        "python": platform.python_version(),
+        "yaml": yaml.__version__,
+    }
+    with open("versions.yml", "w") as f:
+        yaml.dump(versions, f, default_flow_style=False)
+
+    sys.exit(index_contigs("$contigs", "$contigs_index"))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+
+"""Make coverage."""
+
+
+import logging
+import numpy as np
+import platform
+import subprocess
+import sys
+import yaml
+from pathlib import Path
+
+
+logger = logging.getLogger()
+
+
+CHUNK_SIZE = 4 * 1024 * 1024  # characters of the depth output parsed at a time
+
+
+def parse_depths(depth_lines):
+    """
+    Extracts the read depth values per contig from the output of samtools
+      depth, which lists every base of the reference genome (samtools depth
+      -aa), e.g.: 'NODE_1   1   0'. The output is parsed in chunks of lines as
+      it is read, so that only the read depths are kept for the whole genome,
+      and the contigs are found where the contig name changes.
+    param: file depth_lines = text stream of the samtools depth output
+    return: list lo_contigs = contig names, in the order of the reference
+    return: list lo_lengths = number of bases per contig
+    return: array depths = read depth for each base in the genome, sorted by
+            contig and position; e.g.: [0,0,1,1,4,5,7,19,45, ...]
+    """
+
+    lo_contigs = []
+    lo_starts = []
+    lo_depths = []
+    bases = 0
+
+    while True:
+        lo_lines = depth_lines.readlines(CHUNK_SIZE)
+        if not lo_lines:
+            break
+
+        # every line has three fields: contig, position, and read depth
+        lo_fields = ''.join(lo_lines).split()
+        lo_depths.append(np.array(lo_fields[2::3], dtype=np.uint32))
+
+        # a contig starts where the name differs from the line before
+        names = np.array(lo_fields[0::3], dtype=object)
+        is_start = np.empty(len(names), dtype=bool)
+        is_start[0] = not lo_contigs or names[0] != lo_contigs[-1]
+        is_start[1:] = names[1:] != names[:-1]
+        starts = np.flatnonzero(is_start)
+
+        lo_contigs.extend(names[starts].tolist())
+        lo_starts.extend((bases + starts).tolist())
+        bases += len(names)
+
+    depths = np.concatenate(lo_depths) if lo_depths else np.array([], dtype=np.uint32)
+    lo_lengths = np.diff(lo_starts + [bases]).tolist()
+
+    return lo_contigs, lo_lengths, depths
+
+
+def get_depth_dtype(depths):
+    """
+    Returns the smallest unsigned integer type that holds all read depths.
+    param: array depths = read depth for each base in the genome
+    return: type = np.uint16 or np.uint32
+    """
+
+    if depths.size == 0 or depths.max() <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+def make_coverage(bam_file, coverage_file, args):
+    """
+    Main function: converts the read depths of a sample mapped against a
+      reference into a coverage array, which is shared by COUNT_NNN_GAPS
+      (gap statistics) and MAKE_SNP_CONS (N-masking of unmapped bases).
+      samtools depth is piped straight into the parser, so the per-base text
+      is never written to disk.
+    param: str bam_file = BAM file of the sample mapped against the reference
+    param: str coverage_file = output file
+    param: str args = arguments for samtools depth, e.g.: '-aa'
+    output: compressed .npz file with the contig names, contig lengths, and
+            the read depth for each base in the genome (uint16, or uint32 if
+            any read depth is above 65535)
+    """
+
+    command = ['samtools', 'depth'] + args.split() + [bam_file]
+    with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as process:
+        lo_contigs, lo_lengths, depths = parse_depths(process.stdout)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+    np.savez_compressed(coverage_file,
+                        contigs=np.array(lo_contigs, dtype=str),
+                        lengths=np.array(lo_lengths, dtype=np.int64),
+                        depths=depths.astype(get_depth_dtype(depths)))
+
+    logger.info('Read depths for ' + str(sum(lo_lengths)) + ' bases in '
+                + str(len(lo_contigs)) + ' contigs.')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
+
+    versions = {}
+    versions["${task.process}"] = {
+        "python": platform.python_version(),
+        "samtools": subprocess.run(['samtools', '--version'], capture_output=True, text=True).stdout.split()[1],
+        "yaml": yaml.__version__,
+    }
+    with open("versions.yml", "w") as f:
+        yaml.dump(versions, f, default_flow_style=False)
+
+    sys.exit(make_coverage("$bam", "$coverage", "$args"))
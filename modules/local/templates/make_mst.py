@@ -5,9 +5,10 @@
 
 
 import csv
+import json
 import logging
 import platform
-import pydot
+import subprocess
 import sys
 import yaml
 from heapq import heappop, heappush
@@ -17,6 +18,94 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records, outfile)
+
+
+def get_pydot():
+    """
+    Imports pydot on first use, so that runs without drawings don't pay for
+      the import.
+    return: module pydot
+    """
+
+    import pydot
+    return pydot
+
+
 def make_graph(lo_concat_pairwise_diffs):
     """
     Turns a list of [(G1, G2, V1),(G2, G1, V1),...] tuples into a graph, which
@@ -54,8 +143,8 @@ def prim_mst(graph):
     """
 
     start = next(iter(graph))
-    lo_nodes = []  # nodes in MST
-    MST = {}       # the MST
+    so_nodes = set()  # nodes in MST
+    MST = {}          # the MST
 
     # Priority Queue (weight , previous_node , current_node)
     queue = [(0, None, start)]
@@ -67,11 +156,11 @@ def prim_mst(graph):
         weight, previous_node, current_node = heappop(queue)
 
         #skip any vertices already in the MST
-        if current_node in lo_nodes:
+        if current_node in so_nodes:
             continue
 
-        # add current node to list
-        lo_nodes.append(current_node)
+        # add current node to set
+        so_nodes.add(current_node)
 
         # add to the MST structure, which is a dictionary node:list-of-nodes
         if previous_node is None:
@@ -86,7 +175,8 @@ def prim_mst(graph):
 
         # retrieve new node and edge weight from graph and add to queue
         for new_node, edge_weight in graph[current_node].items():
-            heappush(queue, (edge_weight, current_node, new_node))
+            if new_node not in so_nodes:
+                heappush(queue, (edge_weight, current_node, new_node))
 
     return MST
 
@@ -108,6 +198,11 @@ def weighted_mst(lo_concat_pairwise_diffs, MST):
     lo_MST = []
     lo_weighted_MST = []
 
+    # (G1, G2):[(G1, G2, INT), ...] pairs to look up the weights
+    do_pairwise_diffs = {}
+    for tupel in lo_concat_pairwise_diffs:
+        do_pairwise_diffs.setdefault(tupel[:2], []).append(tupel)
+
     # turn the dict G1:[G2,G3] into a list [(G1,G2), (G1:G3),...]
     for key in MST.keys():
         lo_vals = MST.get(key)
@@ -117,9 +212,7 @@ def weighted_mst(lo_concat_pairwise_diffs, MST):
     # use the list to select those triplet tuples (G1, G2, (V1))
     # that belong to the MST
     for nodes in lo_MST:
-        for tupel in lo_concat_pairwise_diffs:
-            if nodes[0] == tupel[0] and nodes[1] == tupel[1]:
-                lo_weighted_MST.append(tupel)
+        lo_weighted_MST.extend(do_pairwise_diffs.get(nodes, []))
 
     # returns an MST with the weight (V1) added
     return lo_weighted_MST
@@ -160,47 +253,56 @@ def get_ref_colors(genome, reference):
     return color
 
 
-def draw_graph(reference, color):
+def draw_graph(reference, layout):
     """
     Returns a graph object containing the reference strain to start with.
     param: str ref = name of a reference strain
-    param: str color = name of a color for all nodes (except the reference)
+    param: str layout = Graphviz layout engine, e.g. 'dot' or 'sfdp'
     return: graph_object = a graph object with the reference strain as first
-            node; e.g.: draw_graph('a_name', 'red') returns:
+            node; e.g.: draw_graph('a_name', 'dot') returns:
             graph G {layout=dot; a_name [shape=box, style=filled,
-                     fillcolor=red]; }
+                     fillcolor=orange]; }
 
     """
 
     # make a new, undirected graph
-    # layout 'dot' gives a nice, hirachical layout, alternatives include
-    #  'neato', 'fdp', 'twopi', stay away from 'circo'
-    graph_object = pydot.Dot(graph_type='graph', layout='dot')
-
-    # add the reference strain
+    # layout 'dot' gives a nice, hirachical layout, but takes minutes and
+    #  becomes unreadable for clusters with hundreds of isolates, for which
+    #  the force-directed 'sfdp' is used instead; stay away from 'circo'
+    pydot = get_pydot()
+    graph_object = pydot.Dot(graph_type='graph', layout=layout)
+    if layout != 'dot':
+        graph_object.set_overlap('false')
+
+    # add the reference strain, highlighted
     graph_object.add_node(pydot.Node(reference, shape='box', style='filled',
-                                     fillcolor=color))
+                                     fillcolor='orange'))
     logger.info('## draw_graph() complete')
     return graph_object
 
 
-def adding_nodes(edge, graph_object, color):
+def adding_nodes(edge, graph_object, color, so_nodes):
     """
-    Adds a new node (= genome) to the graph_object and connects it with an
-      edge to an existing node.
+    Adds the nodes (= genomes) of an edge to the graph_object, unless they
+      are already present, and connects them with the edge.
     param: tuple edge = (G1, G2, V1) for names of genomes 1 and 2 and count of
            mutation events or SNPs
     param: graph_object = the (growing) graph object
     param: str color = name of a color for all nodes (except the reference)
+    param: set so_nodes = names of the nodes already in the graph_object
     return: a graph object with added nodes and edges
     """
 
+    pydot = get_pydot()
+
     # unpack the tuple of (G1, G2, V1)
     G1, G2, V1 = edge
 
     # add new nodes for G1 and G2 to the graph_object
-    graph_object.add_node(pydot.Node(G1, style='filled', fillcolor=color))
-    graph_object.add_node(pydot.Node(G2, style='filled', fillcolor=color))
+    for node in [G1, G2]:
+        if node not in so_nodes:
+            graph_object.add_node(pydot.Node(node, style='filled', fillcolor=color))
+            so_nodes.add(node)
 
     # connect G1 to G2, add the number of mutation events or SNPs as edge label
     graph_object.add_edge(pydot.Edge(G1, G2, label=V1, arrowhead='none',
@@ -209,34 +311,81 @@ def adding_nodes(edge, graph_object, color):
     return graph_object
 
 
-def finish_draw_graph(graph_object, reference, color):
+def render_graph(graph_object, lo_files, RENDER_TIMEOUT):
     """
-    Changes the colors and shapes of the reference and query in the MST.
+    Renders the graph_object with Graphviz into one or more files, giving up
+      after RENDER_TIMEOUT seconds.
     param: graph_object = the graph object
-    param: str ref = name of a reference strain
-    param: str isolate = isolate name, e.g.: 'IDR001234'
-    param: str color = name of a color for all nodes (except the reference)
-    return: a graph object with highlighted reference and query
+    param: list lo_files = names of the output files; the format is taken
+           from the file extension, e.g. 'MST_ME.png' or 'MST_ME.svg'
+    param: int RENDER_TIMEOUT = maximum run time of Graphviz in seconds
+    return: bool = True if all files were rendered
     """
 
-    graph_object.add_node(pydot.Node(reference, shape='box', style='filled',
-                                     fillcolor='orange'))
+    command = ['dot']
+    for filename in lo_files:
+        command += ['-T' + Path(filename).suffix[1:], '-o', filename]
+
+    try:
+        subprocess.run(command, input=graph_object.to_string().encode(),
+                       capture_output=True, check=True, timeout=RENDER_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        logger.warning('Rendering the MST took more than %s seconds.', RENDER_TIMEOUT)
+    except subprocess.CalledProcessError as err:
+        logger.warning('Rendering the MST failed: %s', err.stderr.decode().strip())
+    except OSError as err:
+        logger.warning('Rendering the MST failed: %s', err)
+    else:
+        return True
+
+    # remove partial output, so that no broken drawing is published
+    for filename in lo_files:
+        Path(filename).unlink(missing_ok=True)
+    return False
+
+
+def write_mst_json(json_file, reference, suffix, lo_nodes, lo_weighted_MST):
+    """
+    Writes the MST as a compact JSON edge list for interactive viewing.
+    param: str json_file = name of the JSON file
+    param: str reference = name of the reference strain
+    param: str suffix = 'ME' or 'SNP'
+    param: list lo_nodes = names of all nodes in the MST
+    param: list lo_weighted_MST = a list of tuples [(G1, G2, INT),...]
+    output: e.g.: {"reference":"Paris","metric":"ME","nodes":["Paris",...],
+            "edges":[["Paris","iso1",3],...]}
+    """
 
-    # graph_object.add_node(pydot.Node(isolate, shape='box', style='filled',
-    #                                  fillcolor=color))
+    do_mst = {
+        'reference': reference,
+        'metric': suffix,
+        'nodes': lo_nodes,
+        'edges': lo_weighted_MST
+    }
 
-    return graph_object
+    with open(json_file, 'w') as outfile:
+        json.dump(do_mst, outfile, separators=(',', ':'))
 
 
-def make_mst(concat_pairwise_diffs_file, mst_file, report_file, genome, suffix, reference):
+def make_one_mst(concat_pairwise_diffs_file, mst_file, svg_file, json_file, report,
+                 genome, suffix, reference, skip_plots, LAYOUT_THRESHOLD, RENDER_TIMEOUT):
     """
-    main function
-    param: str isolate = name of the bacterial isolate, user supplied
-    param: str ref_fa_file = name of a reference strain's FASTA file
-    param: list lo_concat_pairwise_diffs = differences (mutation events or
+    Makes, writes and draws the MST for one metric.
+    param: str concat_pairwise_diffs_file = differences (mutation events or
            SNPs) between isolate pairs in the same cluster
-    param: str FILE_NAME = file name, 'MST_ME.png' or 'MST_SNP.png'
+    param: str mst_file = file name, e.g. 'Paris.MST_ME.png'
+    param: str svg_file = file name, e.g. 'Paris.MST_ME.svg'
+    param: str json_file = file name, e.g. 'Paris.MST_ME.json'
+    param: Report report = report of the task
+    param: str genome = species, e.g. 'Lpn'
     param: str suffix = 'ME' or 'SNP'
+    param: str reference = name of the reference strain
+    param: bool skip_plots = if True, don't draw the MST
+    param: int LAYOUT_THRESHOLD = number of nodes above which the MST is laid
+           out with 'sfdp' instead of 'dot'
+    param: int RENDER_TIMEOUT = maximum time to draw the MST in seconds, after
+           which the MST is only reported as a table
+    output: the MST as JSON edge list, and drawn as PNG and SVG
     """
 
     lo_concat_pairwise_diffs = []
@@ -251,41 +400,88 @@ def make_mst(concat_pairwise_diffs_file, mst_file, report_file, genome, suffix,
     logger.info('## make_graph() completed')
 
     # returns a Minimum Spanning Tree
-    MST = prim_mst(graph)
+    MST = prim_mst(graph) if graph else {}
     logger.info('## prim_mst() completed')
 
     # converts the MST dict back into a list of tuples
     lo_weighted_MST = weighted_mst(lo_concat_pairwise_diffs, MST)
     logger.info('## write_to_log() completed')
 
-    # sets the background color for the nodes in the graph drawing, will be
-    # 'white' if reference is not in the reference:color dict
-    color = get_ref_colors(genome, reference)
+    # the MST is always written, whether or not it is drawn
+    write_mst_json(json_file, reference, suffix, list(graph), lo_weighted_MST)
 
-    # generate a graph_object for drawing, start with the reference strain as
-    #  first node
-    graph_drawing = draw_graph(reference, color)
-    logger.info('## draw_graph() completed')
+    drawn = False
 
-    # adding nodes and egdes to the graph_object
-    for edge in lo_weighted_MST:
-        adding_nodes(edge, graph_drawing, color)
-    logger.info('## add_node() completed')
+    if skip_plots:
+        logger.info('## Skipped drawing the MST')
+    else:
+        # sets the background color for the nodes in the graph drawing, will be
+        # 'white' if reference is not in the reference:color dict
+        color = get_ref_colors(genome, reference)
 
-    # highlights the reference
-    finish_draw_graph(graph_drawing, reference, color)
+        # large clusters are laid out with a force-directed layout
+        layout = 'dot' if len(graph) <= LAYOUT_THRESHOLD else 'sfdp'
 
-    # save the drawn graph_object to file
-    graph_drawing.write_png(mst_file)
-    logger.info('## write_png() completed for', suffix)
+        # generate a graph_object for drawing, start with the reference strain as
+        #  first node
+        graph_drawing = draw_graph(reference, layout)
+        logger.info('## draw_graph() completed')
 
-    # write note to report file
-    with open(report_file, 'a') as report_file:
-        print('\\nFigure: Minimum Spanning tree (' + suffix + ')\\n', file=report_file)
+        # adding nodes and egdes to the graph_object
+        so_nodes = {reference}
+        for edge in lo_weighted_MST:
+            adding_nodes(edge, graph_drawing, color, so_nodes)
+        logger.info('## add_node() completed')
+
+        # save the drawn graph_object to file
+        drawn = render_graph(graph_drawing, [mst_file, svg_file], RENDER_TIMEOUT)
+        logger.info('## render_graph() completed for %s with %s', suffix, layout)
+
+    # write note to report file, or the MST as table if it was not drawn
+    if drawn:
+        report.print('\\nFigure: Minimum Spanning tree (' + suffix + ')\\n')
+    else:
+        report.print('\\nTable: Minimum Spanning tree (' + suffix + ')\\n')
+        for G1, G2, V1 in lo_weighted_MST:
+            report.print(' | '.join([G1.replace('\\n', ', '), G2.replace('\\n', ', '), str(V1)]))
 
     logger.info('## Added a Minimum Spanning Tree (' + suffix + ').')
 
 
+def make_mst(concat_pairwise_mes_file, concat_pairwise_snps_file, prefix, report_file,
+             genome, reference, skip_plots=False, LAYOUT_THRESHOLD=100, RENDER_TIMEOUT=300):
+    """
+    main function: makes the MSTs for mutation events and for SNPs in one
+      go, so that a cluster update only needs a single task.
+    param: str concat_pairwise_mes_file = mutation events between isolate
+           pairs in the same cluster
+    param: str concat_pairwise_snps_file = SNPs between isolate pairs in the
+           same cluster
+    param: str prefix = prefix of the output files, e.g. 'Paris'
+    param: str report_file = file name of the report
+    param: str genome = species, e.g. 'Lpn'
+    param: str reference = name of the reference strain
+    param: bool skip_plots = if True, don't draw the MSTs
+    param: int LAYOUT_THRESHOLD = number of nodes above which the MSTs are
+           laid out with 'sfdp' instead of 'dot'
+    param: int RENDER_TIMEOUT = maximum time to draw each MST in seconds
+    output: the MSTs as JSON edge lists, and drawn as PNG and SVG
+    """
+
+    report = Report(report_file)
+
+    for suffix, concat_pairwise_diffs_file in [('ME', concat_pairwise_mes_file),
+                                               ('SNP', concat_pairwise_snps_file)]:
+        make_one_mst(concat_pairwise_diffs_file,
+                     prefix + '.MST_' + suffix + '.png',
+                     prefix + '.MST_' + suffix + '.svg',
+                     prefix + '.MST_' + suffix + '.json',
+                     report, genome, suffix, reference, skip_plots,
+                     LAYOUT_THRESHOLD, RENDER_TIMEOUT)
+
+    report.flush()
+
+
 if __name__ == "__main__":
     logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
 
@@ -297,4 +493,6 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(make_mst("$concat_pairwise_diffs", "$mst", "$report", "$genome", "$suffix", "$meta.ref"))
+    sys.exit(make_mst("$concat_pairwise_mes", "$concat_pairwise_snps", "$prefix", "$report",
+                      "$genome", "$meta.ref", "$skip_plots" == "true", int("$layout_threshold"),
+                      int("$render_timeout")))
@@ -5,9 +5,11 @@
 
 
 import csv
+import hashlib
 import logging
 import platform
 import sys
+import numpy as np
 import yaml
 from pathlib import Path
 
@@ -29,19 +31,39 @@ def write_csv(outfile, lo_rows):
             csv_writer.writerow(row)
 
 
-def read_mutations_matrix(mutations_matrix_file):
+def get_csv_md5(mutations_matrix_file):
     """
-    Takes a matrix of data from the CSV file and returns pairs of tuples:
-      [(G1, G2, V1, V2, V3, V4),(G2, G1, V1, V2, V3, V4), ...], excluding cases
-      where G1 == G2.
-    param: list lo_rows = list of lists, where the inner lists are the rows
-           of the CSV file
-    return: list of tuples: [(G1, G2, V1, V2, V3, V4), ...]; e.g.:
-            [('iso1', 'iso2', 2, 1, 4, 1), ('iso2', 'iso1', 2, 1, 4, 1), ...]
+    Returns the md5 of the CSV file, which tells if the sidecar still matches
+      it, whatever the copies and moves of both files in between.
+    param: str mutations_matrix_file = name of the mutations matrix
+    return: str = md5 hex digest of the file content
+    """
+
+    with open(mutations_matrix_file, 'rb') as infile:
+        return hashlib.md5(infile.read()).hexdigest()
+
+
+def read_mutations_matrix(mutations_matrix_file, sidecar_file):
+    """
+    Reads the mutations matrix, from its NPZ sidecar if that is up to date,
+      else from the CSV file, where each cell is 'V1 (V2, V3, V4)' or 'nd'.
+    param: str mutations_matrix_file = name of the mutations matrix
+    param: str sidecar_file = NPZ sidecar written by the previous run, or ''
+           for none
+    return: list lo_isolates = the isolate names, in matrix order
+    return: array mutations = int array of shape (4, N, N) with V1 (mutation
+            events), V2 (indel events), V3 (bases in indels) and V4 (SNPs)
+            for the isolate in the row versus the one in the column, where -1
+            means not determined
     """
 
+    if sidecar_file:
+        with np.load(sidecar_file) as npz:
+            if str(npz['csv_md5']) == get_csv_md5(mutations_matrix_file):
+                logger.info('Read the mutations matrix from %s.', sidecar_file)
+                return npz['isolates'].tolist(), npz['mutations']
+
     lo_rows = []
-    snd_lo_pairwise_diffs = []
 
     with open(mutations_matrix_file, newline='') as infile:
         reader = csv.reader(infile)
@@ -52,245 +74,333 @@ def read_mutations_matrix(mutations_matrix_file):
                     k = [''] + k     # ... add an empty cell in top left corner
                 lo_rows.append(k)
 
-    # lo_rows[0][i] are the isolate names in the first column
-    # lo_rows[j][0] are the isolate names in the first row
-    # lo_rows[j][i] are the SNPs per column / row
-    for i in range(1, len(lo_rows)):
-        for j in range(1, len(lo_rows)):
-            # if the two isolates have different names
-            if lo_rows[0][i] != lo_rows[j][0]:
-                # extract the names and values
-                G1 = lo_rows[0][i]
-                G2 = lo_rows[j][0]
-                lo_Vs = lo_rows[j][i].split()
-                V1 = int(lo_Vs[0])
-                V2 = int(lo_Vs[1][1:-1]) # omitting the ( and ,
-                V3 = int(lo_Vs[2][:-1])  # omitting the ,
-                V4 = int(lo_Vs[3][:-1])  # omitting the )
-                # add names and values to the list
-                snd_lo_pairwise_diffs.append((G1,G2,V1,V2,V3,V4))
-
-    return snd_lo_pairwise_diffs
-
-
-def write_mutations_matrix(mutations_matrix_file, lo_pairwise_diffs):
+    if not lo_rows:
+        return [], np.full((4, 0, 0), -1, dtype=np.int32)
+
+    # lo_rows[0][i] are the isolate names in the first row
+    # lo_rows[j][0] are the isolate names in the first column
+    # lo_rows[j][i] are the V1 (V2, V3, V4) per column / row
+    lo_isolates = lo_rows[0][1:]
+    do_posns = {isolate: n for n, isolate in enumerate(lo_isolates)}
+
+    mutations = np.full((4, len(lo_isolates), len(lo_isolates)), -1, dtype=np.int32)
+    for row in lo_rows[1:]:
+        j = do_posns[row[0]]
+        for i, cell in enumerate(row[1:]):
+            if cell != 'nd':
+                # e.g.: '23 (5, 9, 18)' -> [23, 5, 9, 18]
+                mutations[:, j, i] = cell.replace('(', '').replace(')', '').replace(',', '').split()
+
+    return lo_isolates, mutations
+
+
+def merge_pairwise_diffs(lo_isolates, mutations, lo_new_pairwise_diffs):
     """
-    Takes a list of pairwise differences, and writes a matrix to file:
-        V1 (V2, V3, V4)
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
-    param: str VCF_path_ref = path the reference's VCF-folder
-    param: list lo_pairwise_diffs = list of tuples:
+    Adds new pairwise differences to the mutations matrix, adding any new
+      isolates in sorted order.
+    param: list lo_isolates = the isolate names, in matrix order
+    param: array mutations = as returned by read_mutations_matrix()
+    param: list lo_new_pairwise_diffs = list of tuples:
            [(G1, G2, V1, V2, V3, V4), (G2, G1, V1, V2, V3, V4), ...]
-    return: the mutations_matrix
-    output: the mutations_matrix written to a .csv file,
-            if print_to_file == True
+    return: list slo_isolates = the sorted isolate names
+    return: array merged = the mutations matrix with the new differences
     """
 
-    lo_isolates = [isolate[0] for isolate in lo_pairwise_diffs] # extract isolates
-    so_isolates = set(lo_isolates)  # remove duplicates
-    slo_isolates = sorted(list(so_isolates))  # sort list
+    so_isolates = set(lo_isolates)
+    for G1, G2, V1, V2, V3, V4 in lo_new_pairwise_diffs:
+        so_isolates.update([G1, G2])
+    slo_isolates = sorted(so_isolates)
+    do_posns = {isolate: n for n, isolate in enumerate(slo_isolates)}
 
-    # make a dictionary of isolate:position pairs
-    do_posns = {}
-    for n, isolate in enumerate(slo_isolates):
-        do_posns[isolate] = n+1
+    # matrix of dimension x * x filled with -1 (= not determined)
+    x = len(slo_isolates)
+    merged = np.full((4, x, x), -1, dtype=np.int32)
 
-    x = len(slo_isolates)  # number of isolates+1 = dimension of matrix
+    # copy the old matrix into its new positions
+    posns = np.array([do_posns[isolate] for isolate in lo_isolates], dtype=np.intp)
+    merged[:, posns[:, None], posns[None, :]] = mutations
 
-    # make matrix of dimension x+1 * x+2 and fill with 'nd' (= not determined)
-    mutations_matrix = [['nd' for i in range(x+1)] for j in range(x+1)]
-
-    # set upper left corner, mutations_matrix[0][0], to empty
-    mutations_matrix[0][0] = ''
+    # add the new differences
+    if lo_new_pairwise_diffs:
+        fst_posns = [do_posns[pair[0]] for pair in lo_new_pairwise_diffs]
+        snd_posns = [do_posns[pair[1]] for pair in lo_new_pairwise_diffs]
+        values = np.array([pair[2:] for pair in lo_new_pairwise_diffs], dtype=np.int32)
+        merged[:, fst_posns, snd_posns] = values.T
 
     # fill the diagonals with '0'
-    for i in range(1,x+1):
-        mutations_matrix[i][i] = '0 (0, 0, 0)'
+    diagonal = np.arange(x)
+    merged[:, diagonal, diagonal] = 0
 
-    # add row headers
-    for p, isolate in enumerate(slo_isolates):
-        mutations_matrix[p+1][0] = isolate
+    return slo_isolates, merged
 
-    # add column headers
-    for q, isolate in enumerate(slo_isolates):
-        mutations_matrix[0][q+1] = isolate
 
-    # get positions from do_posns, then fill matrix
-    for pair in lo_pairwise_diffs:
-        G1, G2, V1, V2, V3, V4 = pair
-        # format V1 (V2, V3, V4)
-        data = str(V1)+' (' + str(V2)+', ' + str(V3)+', ' + str(V4)+')'
+def get_pairwise_diffs(lo_isolates, mutations):
+    """
+    Takes the mutations matrix and returns pairs of tuples:
+      [(G1, G2, V1, V2, V3, V4),(G2, G1, V1, V2, V3, V4), ...], excluding cases
+      where G1 == G2 or the differences were not determined.
+    param: list lo_isolates = the isolate names, in matrix order
+    param: array mutations = as returned by read_mutations_matrix()
+    return: list of tuples: [(G1, G2, V1, V2, V3, V4), ...]; e.g.:
+            [('iso1', 'iso2', 2, 1, 4, 1), ('iso2', 'iso1', 2, 1, 4, 1), ...]
+    """
+
+    # G1 is the isolate in the column, G2 the one in the row
+    determined = mutations[0].T >= 0
+    np.fill_diagonal(determined, False)
+    lo_i, lo_j = np.nonzero(determined)
+
+    values = mutations[:, lo_j, lo_i].T.tolist()
+    return [(lo_isolates[i], lo_isolates[j], *vs)
+            for i, j, vs in zip(lo_i.tolist(), lo_j.tolist(), values)]
+
+
+def format_matrix(lo_names, cells):
+    """
+    Returns the rows of a matrix for write_csv(), with the names as first row
+      and first column.
+    param: list lo_names = the isolate names
+    param: array cells = array of str for all cells of the matrix
+    return: list lo_rows = list of rows, where each row is a list of cells
+    """
+
+    lo_rows = [[''] + lo_names]
+    for name, row in zip(lo_names, cells.tolist()):
+        lo_rows.append([name] + row)
+    return lo_rows
+
 
-        fst_posn = do_posns.get(G1, None)
-        snd_posn = do_posns.get(G2, None)
-        mutations_matrix[fst_posn][snd_posn] = data
+def write_mutations_matrix(mutations_matrix_file, sidecar_file, lo_isolates,
+                           mutations):
+    """
+    Writes the mutations matrix to file as V1 (V2, V3, V4), and to its NPZ
+      sidecar, so that the next run can load it without parsing the CSV.
+    param: str mutations_matrix_file = name of the mutations matrix
+    param: str sidecar_file = name of the NPZ sidecar
+    param: list lo_isolates = the isolate names, in matrix order
+    param: array mutations = as returned by read_mutations_matrix()
+    output: the mutations_matrix written to a .csv file and a .npz sidecar
+    """
 
-    # write the mutations matrix to file
-    write_csv(mutations_matrix_file, mutations_matrix)
+    # format V1 (V2, V3, V4), or 'nd' (= not determined)
+    V1, V2, V3, V4 = (layer.astype(str) for layer in mutations)
+    cells = np.char.add(np.char.add(np.char.add(np.char.add(np.char.add(
+        np.char.add(np.char.add(V1, ' ('), V2), ', '), V3), ', '), V4), ')')
+    cells = np.where(mutations[0] < 0, 'nd', cells)
+
+    write_csv(mutations_matrix_file, format_matrix(lo_isolates, cells))
     logger.info('Made mutations_matrix.csv')
 
-    return mutations_matrix
+    np.savez(sidecar_file, isolates=np.array(lo_isolates, dtype=str),
+             mutations=mutations.astype(np.int32),
+             csv_md5=np.array(get_csv_md5(mutations_matrix_file)))
 
 
-def get_identicals(lo_pairwise_diffs, USE_SNPs):
+def get_identicals(lo_pairwise_diffs):
     """
-    Takes the data from a SNP-matrix and returns a list of the names of
-      isolate pairs that have zero differences (mutation events [default] or
-      SNPs) between each other.
+    Takes the data from a SNP-matrix and returns the names of the isolate
+      pairs that have zero mutation events, and of those that have zero SNPs
+      between each other, in one pass over the pairs. Zero mutation events
+      means zero SNPs, so these pairs are only in the first list.
     param: list lo_pairwise_diffs = list of tuples (G1, G2, V1, V2, V3, V4)
-    return: list of isolate pairs that have different names and that have a
-            mutation-event count (default, else SNP count) of zero
+    return: list lo_ident_MEs = isolate pairs that have different names and a
+            mutation-event count of zero
+    return: list lo_ident_SNPs = isolate pairs that have different names, a
+            SNP count of zero and a mutation-event count above zero
     """
 
-    lo_identicals = []
+    lo_ident_MEs = []
+    lo_ident_SNPs = []
 
     for pair in lo_pairwise_diffs:
         G1, G2, V1, V2, V3, V4 = pair
 
-        # use V1 = mutation events by default, use V4 = SNPs as needed
-        V_metric = V1
-        if USE_SNPs:
-            V_metric = V4
-
-        # the two isolates are the same or have more than 0 differences
-        if G1 == G2 or V_metric > 0:
+        # the two isolates are the same or have more than 0 SNPs
+        if G1 == G2 or V4 > 0:
             continue
         # isolates G1 and G2 are not the same, but have 0 differences
+        if V1 == 0:
+            lo_ident_MEs.append([G1, G2])
         else:
-            lo_identicals.append([G1, G2])
+            lo_ident_SNPs.append([G1, G2])
 
-    return sorted(lo_identicals)
+    return sorted(lo_ident_MEs), sorted(lo_ident_SNPs)
 
 
-def combine_identicals(lo_identicals):
+def add_identicals(do_groups, lo_identicals):
     """
-    Takes a sorted list of isolate pairs and combines all those that have zero
-      mutation events or SNPs in common.
+    Adds a sorted list of isolate pairs to the groups of identical isolates,
+      combining all groups that the pairs connect.
+    param: dict do_groups = isolate:group pairs, where isolates with zero
+           variants between them share the same group (a list of two or more
+           isolates); updated in place
     param: list lo_identicals = list of lists, where each sublist includes a
            pair of isolate names that share zero mutation events or SNPs
-    return: list of lists, where all isolates that share zero mutation events
-            or SNPs are combined into one list
     """
 
-    # list of lists, where each sublist contains two or more isolates with
-    # zero variants
-    lo_comb_ident = []
-
-    # list.pop() removes one list [pair of isolates] at a time
-    while lo_identicals != []:
-        G1, G2 = lo_identicals.pop()
-
-        # at the beginning, lo_comb_ident is empty, so add the first pair
-        if lo_comb_ident == []:
-            lo_comb_ident.append([G1, G2])
-
-        # enumerate(lo_comb_ident) returns the count and a sublist from
-        # lo_comb_ident
-        for count, lo_results in enumerate(lo_comb_ident):
-            # if pair already present in the results' sublist, move on
-            if G1 in lo_results and G2 in lo_results:
-                break
-            # if one of the two is present, add the missing one
-            elif G1 in lo_results and G2 not in lo_results:
-                lo_results.append(G2)
-            elif G2 in lo_results and G1 not in lo_results:
-                lo_results.append(G1)
-            # the two items of the pair are not present in any sublist and
-            # lo_comb_ident has been exhausted: add isolate pair as new list
-            # to lo_comb_ident
-            elif count+1 == len(lo_comb_ident):
-                lo_comb_ident.append([G1, G2])
-
-    return sorted(lo_comb_ident)
-
-
-def concat_identicals(lo_pairwise_diffs, lo_comb_ident, USE_SNPs):
+    for G1, G2 in lo_identicals:
+        group1 = do_groups.get(G1)
+        group2 = do_groups.get(G2)
+        # if pair already present in the same group, move on
+        if group1 is not None and group1 is group2:
+            continue
+        # neither isolate is in a group yet: start a new group
+        elif group1 is None and group2 is None:
+            do_groups[G1] = do_groups[G2] = [G1, G2]
+        # one of the two is present, add the missing one
+        elif group2 is None:
+            group1.append(G2)
+            do_groups[G2] = group1
+        elif group1 is None:
+            group2.append(G1)
+            do_groups[G1] = group2
+        # both are present in different groups: merge the smaller group
+        # into the larger one
+        else:
+            if len(group1) < len(group2):
+                group1, group2 = group2, group1
+            group1.extend(group2)
+            for isolate in group2:
+                do_groups[isolate] = group1
+
+
+def get_groups(do_groups):
+    """
+    Returns a copy of the groups of identical isolates.
+    param: dict do_groups = isolate:group pairs, as made by add_identicals()
+    return: list of lists, where each sublist contains two or more isolates
+            with zero variants
+    """
+
+    return sorted(list(group) for group in
+                  {id(group): group for group in do_groups.values()}.values())
+
+
+def combine_identicals(lo_ident_MEs, lo_ident_SNPs):
+    """
+    Takes the sorted lists of isolate pairs and combines all those that have
+      zero mutation events, and all those that have zero SNPs in common. The
+      groups for zero mutation events are made first and then extended by the
+      pairs with zero SNPs, so that each pair is only combined once.
+    param: list lo_ident_MEs = list of lists, where each sublist includes a
+           pair of isolate names that share zero mutation events
+    param: list lo_ident_SNPs = list of lists, where each sublist includes a
+           pair of isolate names that share zero SNPs, but not zero mutation
+           events
+    return: list lo_comb_ident_ME = list of lists, where all isolates that
+            share zero mutation events are combined into one list
+    return: list lo_comb_ident_SNP = list of lists, where all isolates that
+            share zero SNPs are combined into one list
+    """
+
+    do_groups = {}
+
+    add_identicals(do_groups, lo_ident_MEs)
+    lo_comb_ident_ME = get_groups(do_groups)
+
+    add_identicals(do_groups, lo_ident_SNPs)
+    lo_comb_ident_SNP = get_groups(do_groups)
+
+    return lo_comb_ident_ME, lo_comb_ident_SNP
+
+
+def get_str_idents(lo_comb_ident):
+    """
+    Maps each isolate name to the string of concatenated names of its group,
+      separated by a newline.
+    param: lo_comb_ident = list of isolates that share zero differences
+    return: dict do_str_ident = isolate:concatenated names pairs
+    """
+
+    do_str_ident = {}
+    for ident in lo_comb_ident:
+        str_ident = '\\n'.join(sorted(ident))
+        for isolate in ident:
+            do_str_ident[isolate] = str_ident
+    return do_str_ident
+
+
+def concat_identicals(lo_pairwise_diffs, lo_comb_ident_ME, lo_comb_ident_SNP):
     """
     Combines a list, lo_pairwise_diffs, of isolate pairs with their mutation
-      events counts (default, else SNPs), and a list, lo_comb_ident, of
-      isolates that share zero differences:
-    - converts each list in lo_comb_ident into a concatenated string of names
+      events counts and SNPs, and the lists, lo_comb_ident_ME and
+      lo_comb_ident_SNP, of isolates that share zero mutation events or SNPs,
+      in one pass over the pairs:
+    - converts each list in lo_comb_ident_ME and lo_comb_ident_SNP into a
+       concatenated string of names
     - replaces each isolate name in lo_pairwise_diffs with the concatenated
        name, if applicable
     - returns only pairs of isolates that have more than zero differences,
       where groups of isolates with zero differences are represented by their
       concatenated name
     param: lo_pairwise_diffs = isolate pairs with their indel and SNP counts
-    param: lo_comb_ident = list of isolates that share zero differences
-    return: list of isolates that have more than zero differences
+    param: lo_comb_ident_ME = list of isolates that share zero mutation events
+    param: lo_comb_ident_SNP = list of isolates that share zero SNPs
+    return: list lo_concat_MEs = isolates that have more than zero mutation
+            events
+    return: list lo_concat_SNPs = isolates that have more than zero SNPs
     """
 
-    # converts the list of isolate names into a string of concatenated names,
-    #  separated by a newline
-    lo_str_ident = ['\\n'.join(sorted(ident)) for ident in lo_comb_ident]
+    do_str_ident_ME = get_str_idents(lo_comb_ident_ME)
+    do_str_ident_SNP = get_str_idents(lo_comb_ident_SNP)
 
-    lo_comb = []
+    lo_concat_MEs = []
+    lo_concat_SNPs = []
+    so_comb_MEs = set()   # entries already in lo_concat_MEs, prevents duplicates
+    so_comb_SNPs = set()  # entries already in lo_concat_SNPs
 
     for pair in lo_pairwise_diffs:
         G1, G2, V1, V2, V3, V4 = pair
 
-        V_metric = V1
-        if USE_SNPs:
-            V_metric = V4
-
-        # replace G1 with the concatenated name, if applicable
-        for ident1 in lo_str_ident:
-            if G1 in ident1:
-                G1 = ident1
+        for lo_comb, so_comb, do_str_ident, V_metric in [
+                (lo_concat_MEs, so_comb_MEs, do_str_ident_ME, V1),
+                (lo_concat_SNPs, so_comb_SNPs, do_str_ident_SNP, V4)]:
+            # replace G1 and G2 with the concatenated name, if applicable
+            H1 = do_str_ident.get(G1, G1)
+            H2 = do_str_ident.get(G2, G2)
 
-        # replace G2 with the concatenated name, if applicable
-        for ident2 in lo_str_ident:
-            if G2 in ident2:
-                G2 = ident2
+            # add to returned list if isolate names are not identical and the
+            #  entry is not already present
+            if H1 == H2:
+                continue
+            for entry in [(H1, H2, V_metric), (H2, H1, V_metric)]:
+                if entry not in so_comb:
+                    so_comb.add(entry)
+                    lo_comb.append(list(entry))
 
-        # add to returned list if isolate names are not identical and the entry
-        #  is not already present (prevents duplicates)
-        if G1 != G2 and [G1, G2, V_metric] not in lo_comb:
-            lo_comb.append([G1, G2, V_metric])
-        if G1 != G2 and [G2, G1, V_metric] not in lo_comb:
-            lo_comb.append([G2, G1, V_metric])
+    return lo_concat_MEs, lo_concat_SNPs
 
-    return lo_comb
 
-
-def process_data(lo_rows, MODE):
+def process_data(lo_isolates, mutations, MODE):
     """
-    Takes the list of rows and replaces the text in each cell with a modified
-      text: removes suffixes from isolate names, and restricts the data to
-      either MEs or SNPs
+    Projects the mutations matrix onto either MEs or SNPs, and removes
+      suffixes from isolate names:
           isolate-name_suffix -> isolate-name
           ME (IDE, BID, SNP)  -> ME
           ME (IDE, BID, SNP)  -> SNP
-    param: list lo_rows = list of original data from the CSV file, were each
-           row is a list and each data cell is a string
+    param: list lo_isolates = the isolate names, in matrix order
+    param: array mutations = as returned by read_mutations_matrix()
     param: str MODE = determines the output data, either 'SNP' or 'ME'
     return: list lo_mod_rows = list of rows with modified data cells
     """
 
-    lo_mod_rows = []
-    for row in lo_rows:
-        lo_mod_cells = []
-        for cell in row:
-            # extracts ME or SNP from the data cells
-            if '(' in cell and ')' in cell:
-                # e.g.: 23 (5, 9, 18) -> 18
-                if MODE == 'SNP':
-                    cell = cell.split()[3][:-1]
-                # e.g.: 23 (5, 9, 18) -> 23
-                elif MODE == 'ME':
-                    cell = cell.split()[0]
-            # removes suffixes from the isolate names
-            # e.g.: IDR2000166282-01-00_S78 -> IDR2000166282-01-00
-            elif cell.startswith('IDR') and '_' in cell:
-                cell = cell.split('_')[0]
-            lo_mod_cells.append(cell)
-        lo_mod_rows.append(lo_mod_cells)
-    return lo_mod_rows
+    # removes suffixes from the isolate names
+    # e.g.: IDR2000166282-01-00_S78 -> IDR2000166282-01-00
+    lo_names = [isolate.split('_')[0] if isolate.startswith('IDR') and '_' in isolate
+                else isolate for isolate in lo_isolates]
+
+    # extracts ME or SNP from the data cells
+    # e.g.: 23 (5, 9, 18) -> 18 for SNP, or 23 for ME
+    layer = mutations[3] if MODE == 'SNP' else mutations[0]
+    cells = np.where(layer < 0, 'nd', layer.astype(str))
+
+    return format_matrix(lo_names, cells)
 
 
 def make_mutations_matrix(lo_cluster_pairwise_diffs, mutations_matrix_file,
-                          snp_matrix_file, me_matrix_file,
-                          concat_pairwise_snps_file, concat_pairwise_mes_file):
+                          stored_sidecar_file, sidecar_file, snp_matrix_file,
+                          me_matrix_file, concat_pairwise_snps_file,
+                          concat_pairwise_mes_file, rebuild=False):
     """
     Main function: Compares 'SNP_cons.txt' files in a folder and returns for
       each pair of isolates a list of two tuples: [(G1, G2, V1, V2, V3, V4),
@@ -309,13 +419,21 @@ def make_mutations_matrix(lo_cluster_pairwise_diffs, mutations_matrix_file,
     param: str isolate = isolate name, e.g.: 'IDR001234'
     param: str ref_fa_file = name of a reference strain's FASTA file
     param: str SS_dir = species-specific directory, e.g.: 'Lpn/'
+    param: str stored_sidecar_file = NPZ sidecar of the stored mutations
+           matrix, or '' for none
+    param: str sidecar_file = NPZ sidecar of the new mutations matrix
+    param: bool rebuild = if True, ignore the existing mutations matrix and
+           make a new one from the pairwise differences only
     return: list of lo_concat_pairwise_MEs = isolate names and number of
             mutation events
     return: list of lo_concat_pairwise_SNPs = isolate names and number of SNPs
-    output: new or updated 'mutations_matrix.csv' file
+    output: new or updated 'mutations_matrix.csv' file and its NPZ sidecar
     """
 
-    snd_lo_pairwise_diffs = read_mutations_matrix(mutations_matrix_file)
+    lo_isolates, mutations = [], np.full((4, 0, 0), -1, dtype=np.int32)
+    if not rebuild:
+        lo_isolates, mutations = read_mutations_matrix(mutations_matrix_file,
+                                                       stored_sidecar_file)
     so_pairwise_diffs = set()
 
     for pairwise_diffs_file in lo_cluster_pairwise_diffs:
@@ -325,49 +443,44 @@ def make_mutations_matrix(lo_cluster_pairwise_diffs, mutations_matrix_file,
                 so_pairwise_diffs.add((G1, G2, int(V1), int(V2), int(V3), int(V4)))
                 so_pairwise_diffs.add((G2, G1, int(V1), int(V2), int(V3), int(V4)))
 
-    lo_pairwise_diffs = snd_lo_pairwise_diffs + list(so_pairwise_diffs)
+    lo_isolates, mutations = merge_pairwise_diffs(lo_isolates, mutations,
+                                                  sorted(so_pairwise_diffs))
 
     # writes the mutations matrix, [V1 (V2, V3, V4)], to the
     # 'mutations_matrix.csv' file
-    mutations_matrix = write_mutations_matrix(mutations_matrix_file,
-                                              lo_pairwise_diffs)
+    write_mutations_matrix(mutations_matrix_file, sidecar_file, lo_isolates,
+                           mutations)
     logger.info('Added or updated the mutations matrix.')
 
     # generate ME- and SNP-matrices from mutations_matrix
-    lo_SNP_rows = process_data(mutations_matrix, 'SNP')
+    lo_SNP_rows = process_data(lo_isolates, mutations, 'SNP')
     write_csv(snp_matrix_file, lo_SNP_rows)
 
-    lo_ME_rows = process_data(mutations_matrix, 'ME')
+    lo_ME_rows = process_data(lo_isolates, mutations, 'ME')
     write_csv(me_matrix_file, lo_ME_rows)
 
+    lo_pairwise_diffs = get_pairwise_diffs(lo_isolates, mutations)
+
     # formatting the data for the MST: the next three functions combine
-    # isolate pairs with zero indels events + SNPs to de-clutter the MST
-    # returns list of isolate pairs that have zero events + SNPs between them
+    # isolate pairs with zero indels events + SNPs to de-clutter the MST;
+    # the isolate pairs are gone through once for both the mutation events
+    # and the SNPs
 
-    ##### 1. run once to get data for mutation events #########################
-    lo_ident_isol_MEs = get_identicals(lo_pairwise_diffs, False)
+    # returns lists of isolate pairs that have zero events or SNPs between them
+    lo_ident_isol_MEs, lo_ident_isol_SNPs = get_identicals(lo_pairwise_diffs)
     logger.info(lo_ident_isol_MEs)
-
-    # combines all identical isolates
-    lo_comb_ident_ME = combine_identicals(lo_ident_isol_MEs)
-    logger.info(lo_comb_ident_ME)
-
-    # fuses list entries for identical isolates (ME = mutation event)
-    lo_concat_pairwise_MEs = concat_identicals(lo_pairwise_diffs,
-                                               lo_comb_ident_ME, False)
-    logger.info(lo_concat_pairwise_MEs)
-
-    ##### 2. run again to get data for SNPs only ##############################
-    lo_ident_isol_SNPs = get_identicals(lo_pairwise_diffs, True)
     logger.info(lo_ident_isol_SNPs)
 
     # combines all identical isolates
-    lo_comb_ident_SNP = combine_identicals(lo_ident_isol_SNPs)
+    lo_comb_ident_ME, lo_comb_ident_SNP = combine_identicals(lo_ident_isol_MEs,
+                                                             lo_ident_isol_SNPs)
+    logger.info(lo_comb_ident_ME)
     logger.info(lo_comb_ident_SNP)
 
     # fuses list entries for identical isolates (ME = mutation event)
-    lo_concat_pairwise_SNPs = concat_identicals(lo_pairwise_diffs,
-                                                lo_comb_ident_SNP, True)
+    lo_concat_pairwise_MEs, lo_concat_pairwise_SNPs = concat_identicals(
+        lo_pairwise_diffs, lo_comb_ident_ME, lo_comb_ident_SNP)
+    logger.info(lo_concat_pairwise_MEs)
     logger.info(lo_concat_pairwise_SNPs)
 
     # write the uncluttered list of isolate pairs, where isolates with zero
@@ -388,5 +501,5 @@ if __name__ == "__main__":
         yaml.dump(versions, f, default_flow_style=False)
 
     sys.exit(make_mutations_matrix("$cluster_pairwise_diffs".split(), "$mutations_matrix",
-                                   "$snp_matrix", "$me_matrix", "$concat_pairwise_snps",
-                                   "$concat_pairwise_mes"))
+                                   "$stored_npz", "$mutations_npz", "$snp_matrix", "$me_matrix", "$concat_pairwise_snps",
+                                   "$concat_pairwise_mes", "$rebuild" == "true"))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+
+"""Make QC database."""
+
+
+import csv
+import json
+import logging
+import platform
+import shutil
+import sqlite3
+import sys
+import yaml
+from datetime import datetime
+from pathlib import Path
+
+
+logger = logging.getLogger()
+
+
+def read_metrics(report_json, sample, reference):
+    """
+    Extracts the QC metrics from the JSON records of a report. The report is
+      named after the step, e.g.: 'S1.R1.bwa_report.json' or
+      'S1.mash_RvSp_report.json'.
+    param: str report_json = report.json file of one step
+    param: str sample = sample of the report
+    param: str reference = reference of the report ('' if none)
+    return: list lo_rows = [(sample, reference, stage, metric, value), ...],
+            e.g.: [('S1', 'R1', 'bwa', 'percent_mapped', 98.7)]
+    """
+
+    stage = Path(report_json).name[:-len('_report.json')].split('.')[-1]
+
+    with open(report_json, 'r') as infile:
+        lo_records = json.load(infile)
+
+    lo_rows = []
+    for record in lo_records:
+        if record[0] == 'metric':
+            # a metric can refer to another reference, e.g. Mash distances
+            kind, metric, value, metric_reference = record
+            lo_rows.append((sample, metric_reference or reference, stage,
+                            metric, value))
+
+    return lo_rows
+
+
+def create_qc_db(qc_db):
+    """
+    Creates a new QC database with an empty qc_metrics table.
+    param: str qc_db = SQLite database file
+    return: sqlite3.Connection connection = connection to the database
+    """
+
+    connection = sqlite3.connect(qc_db)
+    connection.execute('CREATE TABLE qc_metrics ('
+                       'sample TEXT NOT NULL, '
+                       'reference TEXT NOT NULL, '
+                       'stage TEXT NOT NULL, '
+                       'metric TEXT NOT NULL, '
+                       'value REAL, '
+                       'run_name TEXT, '
+                       'updated TEXT, '
+                       'PRIMARY KEY (sample, reference, stage, metric))')
+    connection.execute('CREATE INDEX qc_metrics_stage '
+                       'ON qc_metrics (stage, metric)')
+    return connection
+
+
+def make_qc_db(manifest, stored_db, run_db, qc_db, run_name):
+    """
+    Main function: writes the QC metrics of all samples of a run to a run
+      database, and adds them to a copy of the QC database of the earlier
+      runs. Of the metrics with the same sample, reference, stage and metric,
+      the latest one is kept.
+    param: str manifest = tsv file with the sample, reference ('' if none)
+           and report.json file of each report of the run
+    param: str stored_db = QC database of the earlier runs, or '' for none
+    param: str run_db = output file for the metrics of this run
+    param: str qc_db = output file for the metrics of all runs
+    param: str run_name = name of the Nextflow run
+    output: table qc_metrics in both databases, with one row per sample,
+            reference ('' if none), stage, and metric
+    """
+
+    lo_rows = []
+    with open(manifest, 'r', newline='') as infile:
+        for sample, reference, report_json in csv.reader(infile, delimiter='\t'):
+            lo_rows.extend(read_metrics(report_json, sample, reference))
+
+    updated = datetime.now().isoformat(timespec='seconds')
+
+    # two reports of a run can hold the same metric, the last one is kept
+    connection = create_qc_db(run_db)
+    with connection:
+        connection.executemany('INSERT OR REPLACE INTO qc_metrics '
+                               'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               [row + (run_name, updated) for row in lo_rows])
+    connection.close()
+
+    logger.info('Stored ' + str(len(lo_rows)) + ' QC metrics of '
+                + str(len(set(row[0] for row in lo_rows))) + ' samples.')
+
+    # the metrics of this run are added to the QC database of the earlier
+    # runs, replacing their metrics with the same key
+    if stored_db:
+        shutil.copyfile(stored_db, qc_db)
+        connection = sqlite3.connect(qc_db)
+    else:
+        connection = create_qc_db(qc_db)
+    connection.execute('ATTACH DATABASE ? AS run', (run_db,))
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO qc_metrics '
+                           'SELECT * FROM run.qc_metrics')
+    connection.close()
+
+    logger.info('Added the QC metrics of run ' + run_name + ' to ' + qc_db + '.')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
+
+    versions = {}
+    versions["${task.process}"] = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "yaml": yaml.__version__,
+    }
+    with open("versions.yml", "w") as f:
+        yaml.dump(versions, f, default_flow_style=False)
+
+    sys.exit(make_qc_db("$manifest", "$stored_db", "$run_db", "$summary_db", "$run_name"))
@@ -6,6 +6,7 @@
 
 import csv
 import logging
+import numpy as np
 import platform
 import sys
 import yaml
@@ -45,21 +46,24 @@ def read_ref_file(reference_file):
     return lo_contigs
 
 
-def convert_to_base_list(lo_contigs):
+def read_coverage(coverage_file):
     """
-    Takes a list of [[header_1, sequence_1], ...] and converts it to a list
-      of [[contig, position, base], ...]
-    param: list lo_contigs = [[header_1, sequence_1], ...]
-    return: list lo_bases = list of [contig-name, position, base] for all
-            contig sequences
+    Reads the coverage array made by MAKE_COVERAGE and returns, for each
+      contig, which bases were mapped by at least one read.
+    param: str coverage_file = .npz file with the read depth for each base
+    return: dict do_covered = contig : bool array with one value per base
     """
 
-    lo_bases = []
-    for contig in lo_contigs:
-        for i, base in enumerate(contig[1]):
-            lo_bases.append([contig[0], str(i+1), base])
+    do_covered = {}
+    with np.load(coverage_file) as coverage:
+        ends = np.cumsum(coverage['lengths'])
+        starts = ends - coverage['lengths']
+        covered = coverage['depths'] > 0
+        for contig, start, end in zip(coverage['contigs'].tolist(),
+                                      starts.tolist(), ends.tolist()):
+            do_covered[contig] = covered[start:end]
 
-    return lo_bases
+    return do_covered
 
 
 def read_mpileup(mpileup_file):
@@ -309,22 +313,33 @@ def read_freebayes_snps(freebayes_file):
     return do_freebayes_data
 
 
-def combine_csv(csv_file, lo_bases, do_mpileup_data, do_freebayes_data,
-                isolate, reference):
+def make_consensus(snp_cons_file, csv_file, lo_contigs, do_mpileup_data,
+                   do_freebayes_data, do_covered, isolate, reference,
+                   diagnostic_mode=False):
     """
-    Combines the data from 'mpileup.vcf' and 'freebayes.vcf' with the data
-      from the reference sequence. The latter is a list that is used to make
-      dictionary keys to retrieve the mpileup and freebayes data, if available.
-      The combined data are written to a csv file.
-    param: list lo_bases = [[contig, posn, base], ...] for the reference genome
+    Combines the data from 'mpileup.vcf' and 'freebayes.vcf' with the
+      reference sequence, one base at a time, writes the combined data to a
+      csv file, and determines a consensus sequence for the query:
+    - if both or only FreeBayes calls it a mutation, it's a mutation
+    - if no read was mapped to that position, it's unmapped ('N')
+    - if only mpileup calls it a mutation, it's ambiguous ('n') (the mutation
+      might be below FreeBayes threshold values)
+    - if no mpileup data are available for that positionn, it's unmapped ('N')
+    - note that some reference genomes can include the letter 'N'
+    - if deletion, insert '-'
+    - if insertion, add the inserted bases behind the last matching base, e.g.:
+      insertion of 'CT' after 'A': 'ACT'
+    param: list lo_contigs = [[header_1, sequence_1], ...] for the reference
     param: dict do_mpileup_data = contig plus position : [ref_base, query_base]
     param: dict do_freebayes_data =  contig plus position :
                                      (posn, ref_base, query_base, tl_CIGAR)
+    param: dict do_covered = contig : bool array, True if mapped by reads
     param: str isolate = isolate name, e.g.: 'IDR001234'
     output: a CSV file combining all input data
+    output: a '_SNP_cons.txt' file that contains the combined mutation data
     """
 
-    with open(csv_file, 'w') as output:
+    with open(csv_file, 'w') as output, open(snp_cons_file, 'w') as outfile:
         # generates a tab-separated csv file
         row_writer = csv.writer(output, dialect='excel-tab')
         # write the header rows
@@ -333,119 +348,75 @@ def combine_csv(csv_file, lo_bases, do_mpileup_data, do_freebayes_data,
                              'mp-query', 'fb-posn', 'fb-ref', 'fb-query',
                              'fb-CIGAR'])
 
-        # one base in the ref seq at a time
-        for base in lo_bases:
-
-            # each row is a list, to which data are added
-            combined_rows = base
-
-            # the key is the contig plus posn
-            key = base[0] + '_' + base[1]
-            # retrieve REF and ALT data from mpileup file, or ['',''] if
-            # no data available, then add to the row
-            mp_data = do_mpileup_data.get(key,['',''])
-            combined_rows.extend(mp_data)
-            # same for freebayes data
-            fb_data = do_freebayes_data.get(key,['','',''])
-            combined_rows.extend(fb_data)
-
-            # write to cvsv file
-            row_writer.writerow(combined_rows)
-
-
-def make_consensus(snp_cons_file, csv_file, isolate, reference, diagnostic_mode=False):
-    """
-    Takes a "combined_files.csv" file made by combine_csv() and determines a
-    consensus sequence for the query from the mpileup and the FreeBayes data:
-    - if both or only FreeBayes calls it a mutation, it's a mutation
-    - if only mpileup calls it a mutation, it's ambiguous ('n') (the mutation
-      might be below FreeBayes threshold values)
-    - if no mpileup data are available for that positionn, it's unmapped ('N')
-    - note that some reference genomes can include the letter 'N'
-    - if deletion, insert '-'
-    - if insertion, add the inserted bases behind the last matching base, e.g.:
-      insertion of 'CT' after 'A': 'ACT'
-    param: str isolate = isolate name, e.g.: 'IDR001234'
-    output: a '_SNP_cons.txt' file that contains the combined mutation data
-    """
-
-    with open(snp_cons_file, 'w') as outfile:
         # write a header
         print('# SNPs and INDELs after comparing strain', reference,
               'with', isolate,
               '(Based on bcftools mpileup and FreeBayes data.)',
               file=outfile)
 
-        with open(csv_file, 'r') as infile:
-            for line in infile:
-                line = line.rstrip('\\n')
-                data = line.split()
-                # ignore header
-                if data[0] == '#':
-                    continue
-                # adding data
-                else:
-                    # 3 = contig, posn, base of ref, but the position was not
-                    # mapped by mpileup or FreeBayes
-                    if len(data) == 3:
-                        contig, posn, ref = data
-                        if diagnostic_mode:
-                            print(contig, posn, ref, 'N', 'unmapped',
-                                  file=outfile)
-                        else:
-                            print('N', file=outfile)
-
-                    # mpileup, but no FreeBayes data, are available
-                    elif len(data) == 5:
-                        contig, posn, ref, mp_ref, mp_alt = data
-                        # query base is the same as the reference base
-                        if (ref == mp_ref) and (mp_alt == '<*>'):
-                            if diagnostic_mode:
-                                print(contig, posn, ref, ref, file=outfile)
-                            else:
-                                print(ref, file=outfile)
-                        # query different from reference, but no FreeBayes data
-                        # to support it => possible mutation is below threshold
-                        else:
-                            if diagnostic_mode:
-                                print(contig, posn, ref, 'n', 'unsupported',
-                                      file=outfile)
-                            else:
-                                print('n', file=outfile)
-
-                    # FreeBayes, but no mpileup data, are available
-                    elif len(data) == 7:
-                        contig, posn, ref, fb_posn, fb_ref, fb_alt, cigar \
-                        = data
-                        # FreeBayes would only list something, fb_alt, if it
-                        # was different from the reference
-                        if diagnostic_mode:
-                            print(contig, posn, ref, fb_posn, fb_ref, fb_alt,
-                                  cigar, file=outfile)
-                        else:
-                            print(fb_alt, file=outfile)
+        # one base in the ref seq at a time
+        for contig, seq in lo_contigs:
 
-                    # we got mpileup and FreeBayes data for that posn
-                    elif len(data) == 9:
-                        contig, posn, ref, mp_ref, mp_alt, \
-                        fb_posn, fb_ref, fb_alt, cigar = data
-                        # write down FreeBayes output for that posn
+            covered = do_covered.get(contig)
+            if covered is None:
+                logger.warning('No read depths for contig ' + contig + '.')
+                covered = np.ones(len(seq), dtype=bool)
+
+            for i, ref in enumerate(seq):
+
+                # the key is the contig plus posn
+                posn = str(i+1)
+                key = contig + '_' + posn
+                # retrieve REF and ALT data from mpileup file, and the
+                # FreeBayes data, if available
+                mp_data = do_mpileup_data.get(key)
+                fb_data = do_freebayes_data.get(key)
+
+                # write to csv file, with '' if no data are available
+                row_writer.writerow([contig, posn, ref]
+                                    + list(mp_data or ['',''])
+                                    + list(fb_data or ['','','']))
+
+                # FreeBayes data are available: FreeBayes would only list
+                # something, fb_alt, if it was different from the reference
+                if fb_data:
+                    fb_posn, fb_ref, fb_alt, cigar = fb_data
+                    if diagnostic_mode and mp_data:
+                        print(contig, posn, ref, fb_alt, cigar, file=outfile)
+                    elif diagnostic_mode:
+                        print(contig, posn, ref, fb_posn, fb_ref, fb_alt,
+                              cigar, file=outfile)
+                    else:
+                        print(fb_alt, file=outfile)
+
+                # mpileup, but no FreeBayes data, are available
+                elif mp_data and covered[i]:
+                    mp_ref, mp_alt = mp_data
+                    # query base is the same as the reference base
+                    if (ref == mp_ref) and (mp_alt == '<*>'):
                         if diagnostic_mode:
-                            print(contig, posn, ref, fb_alt, cigar,
-                                  file=outfile)
+                            print(contig, posn, ref, ref, file=outfile)
                         else:
-                            print(fb_alt, file=outfile)
-
-                    # catching all else
+                            print(ref, file=outfile)
+                    # query different from reference, but no FreeBayes data
+                    # to support it => possible mutation is below threshold
                     else:
                         if diagnostic_mode:
-                            print('unexpected number of data',
+                            print(contig, posn, ref, 'n', 'unsupported',
                                   file=outfile)
                         else:
-                            print('N', file=outfile)
+                            print('n', file=outfile)
 
+                # the position was not mapped by any read
+                else:
+                    if diagnostic_mode:
+                        print(contig, posn, ref, 'N', 'unmapped',
+                              file=outfile)
+                    else:
+                        print('N', file=outfile)
 
-def make_snp_cons(reference_file, mpileup_file, freebayes_file, csv_file, snp_cons_file, isolate, reference):
+
+def make_snp_cons(reference_file, mpileup_file, freebayes_file, coverage_file, csv_file, snp_cons_file, isolate, reference):
     """
     main function
     param: str isolate = isolate name, e.g.: 'IDR001234'
@@ -455,20 +426,19 @@ def make_snp_cons(reference_file, mpileup_file, freebayes_file, csv_file, snp_co
     # returns a list of contigs [header, sequence] for the reference
     lo_contigs = read_ref_file(reference_file)
 
-    # returns list of [contig, posn, base] for the reference
-    lo_bases = convert_to_base_list(lo_contigs)
-
     # returns dict of mpileup data
     do_mpileup_data = read_mpileup(mpileup_file)
 
     # returns dict of freebayes data
     do_freebayes_data = read_freebayes_snps(freebayes_file)
 
-    # makes csv file from ref seq, mpileup, and freebayes data
-    combine_csv(csv_file, lo_bases, do_mpileup_data, do_freebayes_data, isolate, reference)
+    # returns dict of mapped bases per contig
+    do_covered = read_coverage(coverage_file)
 
-    # converts csv file into consensus <isolate>_SNP_cons.txt file
-    make_consensus(snp_cons_file, csv_file, isolate, reference)
+    # makes csv file from ref seq, mpileup, and freebayes data, and the
+    # consensus <isolate>_SNP_cons.txt file
+    make_consensus(snp_cons_file, csv_file, lo_contigs, do_mpileup_data,
+                   do_freebayes_data, do_covered, isolate, reference)
 
 
 if __name__ == "__main__":
@@ -482,5 +452,5 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(make_snp_cons("$fasta", "$mpileup", "$freebayes", "$output", "$snp_cons", "$meta.id", "$meta.ref"))
+    sys.exit(make_snp_cons("$fasta", "$mpileup", "$freebayes", "$coverage", "$output", "$snp_cons", "$meta.id", "$meta.ref"))
 
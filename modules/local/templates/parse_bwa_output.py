@@ -5,6 +5,7 @@
 
 
 import csv
+import json
 import logging
 import numpy as np
 import platform
@@ -16,11 +17,103 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
-def calculate_frag_len(sam_file, report_file):
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text. QC metrics are not part of the
+      text, they are added after the lines as ['metric', name, value,
+      reference] records, which MAKE_QC_DB stores in the QC database.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.lo_metrics = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def metric(self, name, value, reference=''):
+        """
+        Adds a QC metric of the task, e.g.: metric('percent_mapped', 98.7).
+        param: str name = name of the metric
+        param: float value = value of the metric
+        param: str reference = reference the metric refers to, if it is not
+               the reference of the task, e.g. for Mash distances
+        """
+
+        self.lo_metrics.append(['metric', name, float(value), reference])
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records + self.lo_metrics, outfile)
+
+
+def calculate_frag_len(sam_file, report):
     """
     Extracts the fragment lengths from a SAM file and writes the mean and
     other stats to the report.
     param: str sam_file = input sam file
+    param: Report report = report of the task
     output: text added to report
     """
 
@@ -38,43 +131,43 @@ def calculate_frag_len(sam_file, report_file):
                 else:
                     lo_frag_lens.append(int(frag_len))
 
-    with open(report_file, 'a') as report:
-        print('\\n\\nGenomic fragments:', file=report)
-        print('Smallest fragment:\t', min(lo_frag_lens), file=report)
-        print('Mean length:\t', round(np.mean(lo_frag_lens), 2), file=report)
-        print('S.D.:\t', round(np.std(lo_frag_lens), 2), file=report)
-        print('median:\t', np.median(lo_frag_lens), file=report)
-        print('Largest fragment:\t', max(lo_frag_lens), file=report)
+    report.print('\\n\\nGenomic fragments:')
+    report.print('Smallest fragment:\t', min(lo_frag_lens))
+    report.print('Mean length:\t', round(np.mean(lo_frag_lens), 2))
+    report.print('S.D.:\t', round(np.std(lo_frag_lens), 2))
+    report.print('median:\t', np.median(lo_frag_lens))
+    report.print('Largest fragment:\t', max(lo_frag_lens))
 
 
 def parse_bwa_output(reference_file, sam_file, flagstat_file, idxstats_file, output_file, report_file, reference, MAPPED_THRESHOLD):
     """Parse flagstat file."""
 
-    with open(report_file, 'a') as report:
-        print('\\n\\nMapping the query against strain ' + reference + ' (BWA MEM):', file=report)
+    report = Report(report_file)
+    report.print('\\n\\nMapping the query against strain ' + reference + ' (BWA MEM):')
 
-        with open(flagstat_file, 'r') as flagstat:
-            flagstat_data = ''.join(flagstat.readlines())
-            percent_mapped = float(flagstat_data.split('mapped (')[1].split('%')[0])
+    with open(flagstat_file, 'r') as flagstat:
+        flagstat_data = ''.join(flagstat.readlines())
+        percent_mapped = float(flagstat_data.split('mapped (')[1].split('%')[0])
 
-        print('\\nAlignment QC (Samtools flagstat):', file=report)
-        print(flagstat_data, file=report)
-        print('\\n\\nPercentage of mapped reads:', percent_mapped, file=report)
+    report.print('\\nAlignment QC (Samtools flagstat):')
+    report.print(flagstat_data)
+    report.print('\\n\\nPercentage of mapped reads:', percent_mapped)
+    report.metric('percent_mapped', percent_mapped)
 
-        if percent_mapped <= MAPPED_THRESHOLD:
-            print('\\nNOTE:\\nPercentage of mapped reads below threshold.\\n'\
-                + 'Adding the isolate to the list of candidate reference '\
-                + 'genomes.',
-                  file=report)
+    if percent_mapped <= MAPPED_THRESHOLD:
+        report.print('\\nNOTE:\\nPercentage of mapped reads below threshold.\\n'\
+                     + 'Adding the isolate to the list of candidate reference '\
+                     + 'genomes.')
 
-        with open(idxstats_file, 'r') as idxstats:
-            idxstats_data = ''.join(idxstats.readlines())
+    with open(idxstats_file, 'r') as idxstats:
+        idxstats_data = ''.join(idxstats.readlines())
 
-        print('\\n\\nAlignment QC (Samtools idxstats):', file=report)
-        print('ref_fa_file\tlen\tmapped\tunmapped', file=report)
-        print(idxstats_data, file=report)
+    report.print('\\n\\nAlignment QC (Samtools idxstats):')
+    report.print('ref_fa_file\tlen\tmapped\tunmapped')
+    report.print(idxstats_data)
 
-    calculate_frag_len(sam_file, report_file)
+    calculate_frag_len(sam_file, report)
+    report.flush()
 
     with open(output_file, 'a', newline='') as output:
         output_writer = csv.writer(output)
@@ -4,6 +4,7 @@
 """Parse FastQC output."""
 
 
+import json
 import logging
 import platform
 import sys
@@ -14,6 +15,83 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records, outfile)
+
+
 def parse_fastqc_output(lo_reads_files, lo_fastqc_results, report_file):
     """
     Extracts basic statistics and summary results from the 'fastqc_data.txt'
@@ -25,35 +103,35 @@ def parse_fastqc_output(lo_reads_files, lo_fastqc_results, report_file):
     output: writes basic statistics to the report file
     """
 
-    with open(report_file, 'a') as report:
-        print('\\nRead quality control (FastQC results):', file=report)
+    report = Report(report_file)
+    report.print('\\nRead quality control (FastQC results):')
 
     for reads_file, fastqc_results in zip(lo_reads_files, lo_fastqc_results):
 
         # extract selected data from the 'fastqc_data.txt' file
-        with open(report_file, 'a') as report:
-            # Original name of the file with the raw reads
-            print('Results for processed reads from:', reads_file, file=report)
-            with open(Path(fastqc_results) / 'fastqc_data.txt', mode='r') as infile_1:
-                for line in infile_1:
-                    line = line.rstrip('\\n')
-                    if line.startswith('Filename') \
-                    or line.startswith('Total Sequences') \
-                    or line.startswith('Sequences flagged') \
-                    or line.startswith('Sequence length') \
-                    or line.startswith('%GC'):
-                        print(line, file=report)
+        # Original name of the file with the raw reads
+        report.print('Results for processed reads from:', reads_file)
+        with open(Path(fastqc_results) / 'fastqc_data.txt', mode='r') as infile_1:
+            for line in infile_1:
+                line = line.rstrip('\\n')
+                if line.startswith('Filename') \
+                or line.startswith('Total Sequences') \
+                or line.startswith('Sequences flagged') \
+                or line.startswith('Sequence length') \
+                or line.startswith('%GC'):
+                    report.print(line)
 
         # extract all data from the 'summary.txt' file
         lo_qc_results = []
-        with open(report_file, 'a') as report:
-            with open(Path(fastqc_results) / 'summary.txt', mode='r') as infile_2:
-                for line in infile_2:
-                    line = line.rstrip('\\n')
-                    # remove read_file name in each line
-                    qc_result, what = line.split('	')[:2]
-                    lo_qc_results.append(qc_result)
-                    print(qc_result + '   ' + what, file=report)
+        with open(Path(fastqc_results) / 'summary.txt', mode='r') as infile_2:
+            for line in infile_2:
+                line = line.rstrip('\\n')
+                # remove read_file name in each line
+                qc_result, what = line.split('	')[:2]
+                lo_qc_results.append(qc_result)
+                report.print(qc_result + '   ' + what)
+
+    report.flush()
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@
 """Parse kraken output."""
 
 
+import csv
+import json
 import logging
 import numpy as np
 import platform
@@ -15,138 +17,197 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records, outfile)
+
+
 def sort_kraken_res(kraken_file, GENUS):
     """
-    Sort the headers of contigs into two lists, depending on if they match
+    Sorts the headers of contigs into a dict, depending on if they match
       the GENUS or not.
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
+    param: str kraken_file = Kraken results file
     param: str GENUS = taxonimic genus to which the isolate belongs
-    return: list lo_headers = headers of contigs matching the genus
-    return: list lo_wrong_genera = full kraken taxonomic information for
-            contigs not matching the genus
+    return: dict do_kraken_res = contig header : (bool matches GENUS, full
+            kraken taxonomic information), e.g.:
+            {'NODE_1_length_238256_cov_41.824755': (True, 'NODE_1_...'), ...}
     """
 
-    lo_headers = []
-    lo_wrong_genera = []
+    do_kraken_res = {}
     with open(kraken_file, 'r') as infile:
         for line in infile:
             line = line.rstrip('\\n')
-            if GENUS in line:
-                header = line.split()[0]
-                lo_headers.append(header)
-            else:
-                lo_wrong_genera.append(line)
+            if line == '':
+                continue
+            header = line.split()[0]
+            do_kraken_res[header] = (GENUS in line, line)
 
-    return lo_headers, lo_wrong_genera
+    return do_kraken_res
 
 
-def write_good_contigs_to_fasta(contigs_file, good_contigs_file, isolate, lo_headers,
-                                MIN_COV=3.0, MIN_LEN=250):
+def read_contigs_index(contigs_index_file):
     """
-    Copies contigs from a 'SPAdes_contigs.fa' file if they meet criteria
-      for Genus, minimum length, and coverage. Returns count of all contigs
-      processed, list of lengths, and list of contigs that are of good quality
-      but wrong genus.
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
-    param: str isolate = isolate name, e.g.: 'IDR001234'
-    param: list lo_headers = headers of contigs matching the genus
+    Reads the contig index written by INDEX_CONTIGS.
+    param: str contigs_index_file = contig index file
+    return: list lo_records = [[header, contig number, length, coverage,
+            byte offset, record size in bytes], ...] as strings, e.g.:
+            [['NODE_1_length_238256_cov_41.824755', '1', '238256',
+              '41.824755', '0', '242262'], ...]
+    """
+
+    lo_records = []
+    with open(contigs_index_file, 'r', newline='') as infile:
+        reader = csv.reader(infile, dialect='excel-tab')
+        for row in reader:
+            # ignore the header
+            if row[0].startswith('#'):
+                continue
+            lo_records.append(row)
+    return lo_records
+
+
+def write_contigs_to_fasta(contigs_file, contigs_index_file, good_contigs_file,
+                           bad_contigs_file, do_kraken_res, MIN_COV=3.0,
+                           MIN_LEN=250, BUFFER_SIZE=1048576):
+    """
+    Goes through the contig index once and copies each contig record from a
+      'SPAdes_contigs.fa' file to one of two new fasta files: contigs that meet
+      criteria for Genus, minimum length, and coverage go to
+      good_contigs_file; contigs that are of good quality but wrong genus go
+      to bad_contigs_file (allows easy search with BLASTN, e.g. to look for
+      plasmids). Returns count of all contigs processed, list of lengths, and
+      list of contigs that are of good quality but wrong genus.
+    param: str contigs_file = SPAdes contigs file
+    param: str contigs_index_file = contig index file for contigs_file
+    param: str good_contigs_file = output file for good contigs
+    param: str bad_contigs_file = output file for wrong genus contigs
+    param: dict do_kraken_res = contig header : (bool matches GENUS, kraken
+           taxonomic information)
     param: int MIN_COV = minimum read coverage, default 3.0 fold
     param: int MIN_LEN = minimum contig length, default 250 bp
+    param: int BUFFER_SIZE = size of the output buffers in bytes
     return: int count = count of all contigs
     return: list lo_lens = list of the lengths of contigs that are above
             MIN_COV and above MIN_LEN
     return: list lo_bad_contigs = list of headers from contigs that passed
             QC requirements, but that are of the wrong genus
     output: isolate + '_cc.fasta' file
+    output: 'wrong_genus_contigs.fasta' file
     """
 
-    write_to_file = False
     count = 0
     lo_lens = []
     lo_bad_contigs = []
 
-    with open(contigs_file, 'r') as infile:
-        with open(good_contigs_file, 'a') as outfile:
-
-            # if header is on the list, write it and all sequence lines
-            # to the new fasta file, else ignore
-            for line in infile:
-                line = line.rstrip('\\n')
-
-                # check the header
-                if line.startswith('>'):
-                    count += 1
-                    # check that contig meets minimal criteria
-                    n, contig, l, length, c, coverage = line.split('_')
-                    meets_QC = False
-                    if int(length) >= MIN_LEN and float(coverage) >= MIN_COV:
-                        meets_QC = True
-                        lo_lens.append(int(length))
-
-                    # write to file if contig is of right Genus and meets QC
-                    # each line starts with '>', the headers in the list do not
-                    if line[1:] in lo_headers and meets_QC:
-                        write_to_file = True
-                        print(line, file=outfile)
-                    # keep track of contigs that are of wrong species but that
-                    # are large and of sufficient coverage
-                    # 1000bp and 7.5x is used by the Lpn-pipeline to filter
-                    # out low quality contigs
-                    elif line[1:] not in lo_headers and int(length) >= MIN_LEN\
-                    and float(coverage) >= MIN_COV:
-                        lo_bad_contigs.append(line)
-                        write_to_file = False
-                    else:
-                        write_to_file = False
-
-                # write sequence to file only if header checks out
-                else:
-                    if write_to_file:
-                        print(line, file=outfile)
-
-    return count, lo_lens, lo_bad_contigs
-
-
-def write_bad_contigs_to_fasta(contigs_file, bad_contigs_file, lo_bad_contigs):
-    """
-    Copies contigs from a 'SPAdes_contigs.fa' to a new fasta file, but
-      only those contigs that were of the wrong genus: allows easy search
-      with BLASTN (e.g. to look for plasmids).
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
-    param: list lo_bad_contigs = list of headers from contigs that passed
-           QC requirements, but that are of the wrong genus
-    output: 'wrong_genus_contigs.fasta' file
-    """
-
-    write_to_file = False
-
-    with open(contigs_file, 'r') as infile:
-        with open(bad_contigs_file, 'a') as outfile:
-
-            # if header that's on the list, write it and all sequence lines
-            # to the new fasta file, else ignore
-            for line in infile:
-                line = line.rstrip('\\n')
+    with open(contigs_file, 'rb') as infile, \
+         open(good_contigs_file, 'ab', buffering=BUFFER_SIZE) as good_file, \
+         open(bad_contigs_file, 'ab', buffering=BUFFER_SIZE) as bad_file:
+
+        for header, node, length, coverage, offset, size \
+        in read_contigs_index(contigs_index_file):
+            count += 1
+
+            # check that contig meets minimal criteria, else ignore it
+            if int(length) < MIN_LEN or float(coverage) < MIN_COV:
+                continue
+            lo_lens.append(int(length))
+
+            # write to file if contig is of right Genus and meets QC
+            if do_kraken_res.get(header, (False,))[0]:
+                outfile = good_file
+            # keep track of contigs that are of wrong species but that are
+            # large and of sufficient coverage
+            # 1000bp and 7.5x is used by the Lpn-pipeline to filter out low
+            # quality contigs
+            else:
+                lo_bad_contigs.append('>' + header)
+                outfile = bad_file
 
-                # check the header
-                if line.startswith('>'):
-                    # write to file if contig is of wrong Genus
-                    if line in lo_bad_contigs:
-                        write_to_file = True
-                        print(line, file=outfile)
-                    else:
-                        write_to_file = False
+            # copy the whole record (header and sequence) to the output file
+            infile.seek(int(offset))
+            outfile.write(infile.read(int(size)))
 
-                # write sequence to file only if header checks out
-                else:
-                    if write_to_file:
-                        print(line, file=outfile)
+    return count, lo_lens, lo_bad_contigs
 
 
-def combine_failed_contigs(lo_wrong_genera, lo_bad_contigs):
+def combine_failed_contigs(do_kraken_res, lo_bad_contigs):
     """
-    Combines two lists to include the data in the report.
-    param: list lo_wrong_genera = Kraken data for all contigs of wrong genus
+    Combines the Kraken data and the list of bad contigs to include the data
+      in the report.
+    param: dict do_kraken_res = contig header : (bool matches GENUS, kraken
+           taxonomic information)
     param: list lo_bad_contigs = headers from SPAdes for contigs with wrong
            genus but good data quality
     return: list lo_failed_contigs = list of suspicious contigs
@@ -154,10 +215,10 @@ def combine_failed_contigs(lo_wrong_genera, lo_bad_contigs):
 
     lo_failed_contigs = []
 
-    for item in lo_wrong_genera:
-        header = '>' + item.split()[0]
-        if header in lo_bad_contigs:
-            lo_failed_contigs.append(item)
+    for header in lo_bad_contigs:
+        matches_genus, line = do_kraken_res.get(header[1:], (True, ''))
+        if not matches_genus:
+            lo_failed_contigs.append(line)
 
     return lo_failed_contigs
 
@@ -186,10 +247,10 @@ def calc_N50(lo_lens):
         return -1
 
 
-def write_report(report_file, isolate, lo_lens, count, lo_failed_contigs):
+def write_report(report, isolate, lo_lens, count, lo_failed_contigs):
     """
     Writes some summary statistics to the report.
-    param: str work_dir = isolate-specific folder, e.g.: 'WH200812_001259/'
+    param: Report report = report of the task
     param: str isolate = isolate name, e.g.: 'IDR001234'
     param: list lo_lens = list of the lengths of contigs that are above
            MIN_COV and above MIN_LEN
@@ -198,42 +259,30 @@ def write_report(report_file, isolate, lo_lens, count, lo_failed_contigs):
     output: text added to report.txt
     """
 
-    with open(report_file, 'a') as outfile:
-        print('\\n\\nContigs overview:\\n(after Kraken species ID and removal'\
-              + ' of questionable contigs)', file=outfile)
-        # print('- Folder:                  {:21s}'.format(work_dir),
-              # file=outfile)
-        print('- Isolate:                 {:21s}'.format(isolate),
-              file=outfile)
-        print('- Input contigs [n]:       {:12,d}'.format(count),
-              file=outfile)
-        print('- Acceptable contigs [n]:  {:12,d}'.format(len(lo_lens)),
-              file=outfile)
-        print('- Total length [bp]:       {:12,d}'.format(sum(lo_lens)),
-              file=outfile)
-        print('- N50 [bp]:                {:12,d}'.format(calc_N50(lo_lens)),
-              file=outfile)
-        print('- Largest contig [bp]:     {:12,d}'.format(max(lo_lens)),
-              file=outfile)
-        print('- Mean contig [bp]:        {:14,.1f}'.format(np.mean(lo_lens)),
-              file=outfile)
-        print('- Median contig [bp]:      {:14,.1f}'.format(np.median(lo_lens)),
-              file=outfile)
-        print('- Smallest contig [bp]:    {:12,d}'.format(min(lo_lens)),
-              file=outfile)
-        if lo_failed_contigs != []:
-            print('- Contigs of concern (wrong genus, but good quality data):',
-                  file=outfile)
-            for failed_contig in lo_failed_contigs:
-                if ';' in failed_contig:
-                    print('\t', failed_contig.split('\t')[0], '\t',
-                          failed_contig.split(';')[-1], file=outfile)
-                else:
-                    print('\t', failed_contig, file=outfile)
-        print('\\n', file=outfile)
-
-
-def parse_kraken_output(kraken_file, contigs_file, good_contigs_file, bad_contigs_file, report_file, isolate, genus):
+    report.print('\\n\\nContigs overview:\\n(after Kraken species ID and removal'\
+                 + ' of questionable contigs)')
+    # report.print('- Folder:                  {:21s}'.format(work_dir))
+    report.print('- Isolate:                 {:21s}'.format(isolate))
+    report.print('- Input contigs [n]:       {:12,d}'.format(count))
+    report.print('- Acceptable contigs [n]:  {:12,d}'.format(len(lo_lens)))
+    report.print('- Total length [bp]:       {:12,d}'.format(sum(lo_lens)))
+    report.print('- N50 [bp]:                {:12,d}'.format(calc_N50(lo_lens)))
+    report.print('- Largest contig [bp]:     {:12,d}'.format(max(lo_lens)))
+    report.print('- Mean contig [bp]:        {:14,.1f}'.format(np.mean(lo_lens)))
+    report.print('- Median contig [bp]:      {:14,.1f}'.format(np.median(lo_lens)))
+    report.print('- Smallest contig [bp]:    {:12,d}'.format(min(lo_lens)))
+    if lo_failed_contigs != []:
+        report.print('- Contigs of concern (wrong genus, but good quality data):')
+        for failed_contig in lo_failed_contigs:
+            if ';' in failed_contig:
+                report.print('\t', failed_contig.split('\t')[0], '\t',
+                             failed_contig.split(';')[-1])
+            else:
+                report.print('\t', failed_contig)
+    report.print('\\n')
+
+
+def parse_kraken_output(kraken_file, contigs_file, contigs_index_file, good_contigs_file, bad_contigs_file, report_file, isolate, genus):
     """
     Main function: run Kraken on SPAdes output files
     param: list lo_phylo_tree_data = list of:
@@ -246,24 +295,28 @@ def parse_kraken_output(kraken_file, contigs_file, good_contigs_file, bad_contig
     output: several FASTA files
     """
 
-    lo_headers, lo_wrong_genera = sort_kraken_res(kraken_file, genus)
+    do_kraken_res = sort_kraken_res(kraken_file, genus)
 
-    logger.info('\\n', len(lo_headers), 'contigs matched the Genus')
-    logger.info(len(lo_wrong_genera), 'contigs did not match the Genus')
+    no_matches = sum(1 for matches_genus, line in do_kraken_res.values()
+                     if matches_genus)
+    logger.info('%d contigs matched the Genus', no_matches)
+    logger.info('%d contigs did not match the Genus',
+                len(do_kraken_res) - no_matches)
 
     # correct genus, good quality contigs: write to fasta file
-    count, lo_lens, lo_bad_contigs = \
-    write_good_contigs_to_fasta(contigs_file, good_contigs_file, isolate, lo_headers)
-
     # wrong genus: write to fasta file for easy blast search
-    write_bad_contigs_to_fasta(contigs_file, bad_contigs_file, lo_bad_contigs)
+    count, lo_lens, lo_bad_contigs = \
+    write_contigs_to_fasta(contigs_file, contigs_index_file, good_contigs_file,
+                           bad_contigs_file, do_kraken_res)
 
-    # combine info from lo_wrong_genera and lo_bad_contigs into one:
+    # combine info from do_kraken_res and lo_bad_contigs into one:
     # contigs of poor quality or wrong genus
-    lo_failed_contigs = combine_failed_contigs(lo_wrong_genera, lo_bad_contigs)
+    lo_failed_contigs = combine_failed_contigs(do_kraken_res, lo_bad_contigs)
 
     # writes some statistics to file
-    write_report(report_file, isolate, lo_lens, count, lo_failed_contigs)
+    report = Report(report_file)
+    write_report(report, isolate, lo_lens, count, lo_failed_contigs)
+    report.flush()
 
 
 if __name__ == "__main__":
@@ -277,4 +330,4 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(parse_kraken_output("$kraken", "$contigs", "$good_contigs", "$bad_contigs", "$report", "$meta.id", "$genus"))
+    sys.exit(parse_kraken_output("$kraken", "$contigs", "$contigs_index", "$good_contigs", "$bad_contigs", "$report", "$meta.id", "$genus"))
@@ -5,22 +5,118 @@
 
 
 import csv
+import json
 import logging
 import platform
 import sys
 import yaml
+from heapq import heappop, heappush
 from pathlib import Path
 
 
 logger = logging.getLogger()
 
 
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text. QC metrics are not part of the
+      text, they are added after the lines as ['metric', name, value,
+      reference] records, which MAKE_QC_DB stores in the QC database.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.lo_metrics = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def metric(self, name, value, reference=''):
+        """
+        Adds a QC metric of the task, e.g.: metric('percent_mapped', 98.7).
+        param: str name = name of the metric
+        param: float value = value of the metric
+        param: str reference = reference the metric refers to, if it is not
+               the reference of the task, e.g. for Mash distances
+        """
+
+        self.lo_metrics.append(['metric', name, float(value), reference])
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records + self.lo_metrics, outfile)
+
+
 class Mash_result(object):
     """
     The output from Mash dist is represented as an object for easy comparison
     and ranking.
     """
 
+    # no per-object __dict__, as there can be one object per reference
+    __slots__ = ('_reference', '_query', '_distance', '_pvalue', '_hashes')
+
     # initializes a Mash_result object
     # removes paths and file extentions from reference and query and converts
     #  text to numbers where appropriate
@@ -77,30 +173,84 @@ def read_species_file(species_file):
     return do_species
 
 
+def near_tie_limit(min_dist):
+    """
+    Returns the Mash distance below which a reference is considered to be as
+      close as the one with the smallest distance.
+      helper function to read_distance_file()
+    The function x+0.001+x*0.05 was determined emprically based on actual
+      Mash distances: it runs parallel to the Hashes vs Mash distance curve.
+      At small distances, the "+0.001" will keep the two curves parallel, at
+      large distances, the "x*0.05" becomes more important).
+    param: float min_dist = smallest Mash distance
+    return: float = upper limit (exclusive) for near-tied distances
+    """
+
+    return min_dist+0.001+min_dist*0.05
+
+
 def read_distance_file(dist_file):
     """
-    Extracts data from the distances file created by 'Mash dist'.
-      helper function to sort_mash_output()
+    Extracts data from the distances file created by 'Mash dist'. Only the
+      references with a distance below near_tie_limit() of the smallest
+      distance and the closest reference outside of that range (the
+      runner-up) are kept, so the file is streamed once with a heap that is
+      as large as the number of near-tied references.
+      helper function to parse_mash_output()
     param: str dist_file = name of TAB file produced by mash dist
-    return: list lo_refs = Mash_result objects with reference name, query name,
-            Mash distance, p-value, and number of matching hashes, sorted by
-            distance
+    return: list lo_sm_dist = Mash_result objects with reference name, query
+            name, Mash distance, p-value, and number of matching hashes of the
+            near-tied references sorted by distance (ties in file order),
+            followed by the runner-up; if there is no runner-up, the last
+            reference is repeated
+    return: int no_refs = number of references in the distances file
     """
 
-    # retrieve the data and write them to a sorted list as a Mash_result object
-    lo_refs = []
+    heap = []          # (-distance, -line number, Mash_result) within range
+    runner_up = None   # (distance, line number, Mash_result) outside of range
+    min_dist = None
+    no_refs = 0
+
     with open(dist_file, 'r') as in_file:
         for line in in_file:
             line = line.rstrip('\\n')
             if line != '':
                 # reference, query, Mash distance, p-value, matching hashes:
                 REF, QRY, DIS, PVL, HSH = line.split()
-                # creating a Mash_result object
-                mr = Mash_result(REF, QRY, DIS, PVL, HSH)
             else:  # stand-in if Mash failed for some reason
-                mr = Mash_result('-fail-', '-fail-', 1, 1, '-fail-')
-            lo_refs.append(mr)
-    return sorted(lo_refs)
+                REF, QRY, DIS, PVL, HSH = '-fail-', '-fail-', 1, 1, '-fail-'
+            distance = float(DIS)
+            no_refs += 1
+
+            # a new smallest distance narrows the range: the references that
+            #  fall out of it compete for runner-up
+            if min_dist is None or distance < min_dist:
+                min_dist = distance
+                limit = near_tie_limit(min_dist)
+                while heap and -heap[0][0] >= limit:
+                    neg_dist, neg_n, mr = heappop(heap)
+                    if runner_up is None or (-neg_dist, -neg_n) < runner_up[:2]:
+                        runner_up = (-neg_dist, -neg_n, mr)
+
+            # only references that are kept become Mash_result objects
+            if distance < limit:
+                heappush(heap, (-distance, -no_refs,
+                                Mash_result(REF, QRY, DIS, PVL, HSH)))
+            elif runner_up is None or distance < runner_up[0]:
+                runner_up = (distance, no_refs,
+                             Mash_result(REF, QRY, DIS, PVL, HSH))
+
+    lo_sm_dist = [mr for neg_dist, neg_n, mr in sorted(heap, reverse=True)]
+
+    if no_refs > 1:
+        if runner_up is not None:
+            lo_sm_dist.append(runner_up[2])
+        # if all references are within range, add last list element again
+        # (the duplicate will be removed when lo_min_dist_refs is created)
+        else:
+            lo_sm_dist.append(lo_sm_dist[-1])
+
+    return lo_sm_dist, no_refs
 
 
 def write_references_file(references_file, lo_min_dist_refs):
@@ -109,12 +259,11 @@ def write_references_file(references_file, lo_min_dist_refs):
         references_writer.writerow(lo_min_dist_refs)
 
 
-def write_to_file(report_file, lo_refs, lo_sm_dist, header_text, do_species):
+def write_to_file(report, lo_sm_dist, header_text, do_species):
     """
     Write Mash results to report file.
       helper function to parse_mash_output()
-    param: str report_file = output report file
-    param: list lo_refs = Mash_result objects sorted by distance
+    param: Report report = report of the task
     param: list lo_sm_dist = list of references with the smallest Mast distances
     param: str header_text = header text for the report.txt
     param: dict do_species = dict of species abbreviations mapped to names
@@ -122,54 +271,53 @@ def write_to_file(report_file, lo_refs, lo_sm_dist, header_text, do_species):
     """
 
     # write results to the report file
-    with open(report_file, 'a') as report:
-        # header
-        print(header_text, file=report)
-        # if more than one reference
-        if len(lo_sm_dist) > 1:
-
-            # print reference(s) with smallest distance, then the runner-up
-            for i in range(len(lo_sm_dist)):
-                if i < len(lo_sm_dist) - 1:
-                    print('\\nReference with the shortest distance:', file=report)
-                else:
-                    print('\\nRunner up:', file=report)
-                # extract data from the Mash_result object
-                print('Strain name:\t', lo_sm_dist[i].get_reference(),
-                      file=report)
-                print('Mash distance:\t', lo_sm_dist[i].get_distance(),
-                      file=report)
-                print('P-value:\t', lo_sm_dist[i].get_pvalue(),
-                      file=report)
-                print('Matching hashes:\t', lo_sm_dist[i].get_hashes(),
-                      file=report)
-
-                # extract the species name in case of the contamination check
-                if do_species is not None:
-                    tent_species = do_species.get(lo_sm_dist[i].get_reference(),
-                                                  'UNKNOWN SPECIES')
-                    print('These reads seem to have come from:', tent_species, \
-                          'or a related species.', file=report)
-        # in case there is only one reference
-        else:
-            print('\\nReference with the shortest distance:', file=report)
-            print('Strain name:\t', lo_sm_dist[0].get_reference(),
-                  file=report)
-            print('Mash distance:\t', lo_sm_dist[0].get_distance(),
-                  file=report)
-            print('P-value:\t', lo_sm_dist[0].get_pvalue(),
-                  file=report)
-            print('Matching hashes:\t', lo_sm_dist[0].get_hashes(),
-                  file=report)
-            print('\\nRunner up: none', file=report)
-
-
-def check_quality(ref_object, report_file):
+    # header
+    report.print(header_text)
+    # if more than one reference
+    if len(lo_sm_dist) > 1:
+
+        # print reference(s) with smallest distance, then the runner-up
+        for i in range(len(lo_sm_dist)):
+            if i < len(lo_sm_dist) - 1:
+                report.print('\\nReference with the shortest distance:')
+            else:
+                report.print('\\nRunner up:')
+            # extract data from the Mash_result object
+            report.print('Strain name:\t', lo_sm_dist[i].get_reference())
+            report.print('Mash distance:\t', lo_sm_dist[i].get_distance())
+            report.print('P-value:\t', lo_sm_dist[i].get_pvalue())
+            report.print('Matching hashes:\t', lo_sm_dist[i].get_hashes())
+            report.metric('distance', lo_sm_dist[i].get_distance(),
+                          lo_sm_dist[i].get_reference())
+            report.metric('p_value', lo_sm_dist[i].get_pvalue(),
+                          lo_sm_dist[i].get_reference())
+
+            # extract the species name in case of the contamination check
+            if do_species is not None:
+                tent_species = do_species.get(lo_sm_dist[i].get_reference(),
+                                              'UNKNOWN SPECIES')
+                report.print('These reads seem to have come from:', tent_species, \
+                             'or a related species.')
+    # in case there is only one reference
+    else:
+        report.print('\\nReference with the shortest distance:')
+        report.print('Strain name:\t', lo_sm_dist[0].get_reference())
+        report.print('Mash distance:\t', lo_sm_dist[0].get_distance())
+        report.print('P-value:\t', lo_sm_dist[0].get_pvalue())
+        report.print('Matching hashes:\t', lo_sm_dist[0].get_hashes())
+        report.metric('distance', lo_sm_dist[0].get_distance(),
+                      lo_sm_dist[0].get_reference())
+        report.metric('p_value', lo_sm_dist[0].get_pvalue(),
+                      lo_sm_dist[0].get_reference())
+        report.print('\\nRunner up: none')
+
+
+def check_quality(ref_object, report):
     """
     Checks if distance and p-value for the species-reference with the smallest
       distance are below thresholds. The sample might be contaminated if not.
     param: str ref_object = reference object with smallest distance
-    param: str report_file = output report file
+    param: Report report = report of the task
     return: bool passed_qc = True if distance and p-value are below thresholds
     output: writes reference_ID, Mash_distance, P_value, Matching_hashes
             to file
@@ -190,8 +338,7 @@ def check_quality(ref_object, report_file):
         passed_qc = False
 
     # writes results to the report file
-    with open(report_file, 'a') as report:
-        print('\\nMash QC results:', qc_text, file=report)
+    report.print('\\nMash QC results:', qc_text)
 
     return passed_qc
 
@@ -216,45 +363,17 @@ def parse_mash_output(dist_file, references_file, report_file, species_file, gen
                          ('IDR00789', 0.034976,  0.0, '160/400')]
     """
 
-    lo_sm_dist = []
-
-    # Extracts data from the distances file created by 'mash dist',
-    #  where each reference is a Mash_result object
-    lo_refs = read_distance_file(dist_file)
-    logger.info('Mash list of references: %s', [mr.get_all() for mr in lo_refs])
+    # Extracts data from the distances file created by 'mash dist': the
+    #  references with similar, short Mash distance to be checked later with
+    #  BWA, followed by the runner-up, e.g.:
+    #  [0.00173, 0.00173, 0.00183, 0.00348]
+    # 1. and 2. are equal, 3. is similar to 1., and 4. is the runner-up
+    lo_sm_dist, no_refs = read_distance_file(dist_file)
+    logger.info('Mash number of references: %d', no_refs)
+    logger.info('Mash list of closest references: %s', [mr.get_all() for mr in lo_sm_dist])
 
     # if there is more than 1 reference
-    if len(lo_refs) > 1:
-        # adds the first two references with the smallest distances to the list
-        lo_sm_dist.extend(lo_refs[0:2])
-
-        n = 2   # first two items on list sorted by distance
-
-        # Make a list of references with similar, short Mash distance to be
-        #  checked later with BWA:
-        # While second to last and last item in the list have equal distance
-        # or the last item in the list has a distance similar to the first
-        # item, add a new reference to the list.
-        # The function x+0.001+x*0.05 was determined emprically based on
-        # actual Mash distances: it runs parallel to the Hashes vs Mash
-        # distance curve. At small distances, the "+0.001" will keep the two
-        # curves parallel, at large distances, the "x*0.05" becomes more
-        # important), e.g.: [0.00173, 0.00173, 0.00183, 0.00348]
-        # 1. and 2. are equal, 3. is similar to 1., and 4. is the runner-up
-        while lo_sm_dist[-2].get_distance() == lo_sm_dist[-1].get_distance() \
-        or lo_sm_dist[-1].get_distance() < (lo_sm_dist[0].get_distance()+0.001 \
-                     +lo_sm_dist[0].get_distance()*0.05):
-
-            # add references that are within range to lo_sm_dist
-            if n < len(lo_refs):
-                lo_sm_dist.append(lo_refs[n])
-                n += 1
-            # if end of lo_refs is reached, add last list element again
-            # (the duplicate will be removed when lo_min_dist_refs is created)
-            else:
-                lo_sm_dist.append(lo_refs[n-1])
-                break
-
+    if no_refs > 1:
         # makes a list of those reference fasta files that have the smallest
         #  Mash distances
         lo_min_dist_refs = [ref.get_reference() for ref in lo_sm_dist[:-1]]
@@ -262,24 +381,24 @@ def parse_mash_output(dist_file, references_file, report_file, species_file, gen
 
     # only one reference
     else:
-        lo_sm_dist.extend(lo_refs)
-
         # makes a list of those reference fasta files that have the smallest
         #  Mash distances
         lo_min_dist_refs = [ref.get_reference() for ref in lo_sm_dist]
 
     # writes results to the log and report files
+    report = Report(report_file)
     if species_file != "NO_FILE":
         do_species = read_species_file(species_file)
-        write_to_file(report_file, lo_refs, lo_sm_dist,
+        write_to_file(report, lo_sm_dist,
                       '\\nContamination check (Mash):', do_species)
     else:
-        write_to_file(report_file, lo_refs, lo_sm_dist,
+        write_to_file(report, lo_sm_dist,
                       '\\nFinding a reference strain (Mash):', None)
 
     # checks that the distance and p-value are below threshold; if not, the
     #  sample might be contaminated or the reference a poor choice
-    passed_qc = check_quality(lo_sm_dist[0], report_file)
+    passed_qc = check_quality(lo_sm_dist[0], report)
+    report.flush()
     logger.info('Mash passed QC: %s', passed_qc)
 
     if species_file != "NO_FILE":
@@ -4,6 +4,7 @@
 """Parse qualimap output."""
 
 
+import json
 import logging
 import platform
 import sys
@@ -14,32 +15,109 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records, outfile)
+
+
 def parse_qualimap_output(qualimap_file, report_file):
     """
     Extracts results from the Qualimap output and writes it to report
     output: text added to report
     """
 
+    report = Report(report_file)
+
     # opens the report from Qualimap and writes selected lines to report
     with open(qualimap_file, 'r') as in_file:
 
-        # opens the report file
-        with open(report_file, 'a') as report:
-
-            # adds a header to report
-            print('\\n\\nMapping quality check (Qualimap results):', \
-                  file=report)
-
-            # writing specific data to the report
-            for line in in_file:
-                line = line.rstrip('\\n')
-                if line.startswith('     number of bases')\
-                or line.startswith('     number of contigs')\
-                or line.startswith('     number of reads')\
-                or line.startswith('     number of mapped reads')\
-                or line.startswith('     number of mapped bases')\
-                or line.startswith('     mean mapping quality'):
-                    print(line.replace('     ',''), file=report)
+        # adds a header to report
+        report.print('\\n\\nMapping quality check (Qualimap results):')
+
+        # writing specific data to the report
+        for line in in_file:
+            line = line.rstrip('\\n')
+            if line.startswith('     number of bases')\
+            or line.startswith('     number of contigs')\
+            or line.startswith('     number of reads')\
+            or line.startswith('     number of mapped reads')\
+            or line.startswith('     number of mapped bases')\
+            or line.startswith('     mean mapping quality'):
+                report.print(line.replace('     ',''))
+
+    report.flush()
 
 
 if __name__ == "__main__":
@@ -4,8 +4,9 @@
 """Parse spades output."""
 
 
+import csv
+import json
 import logging
-import matplotlib.pyplot as plt
 import numpy as np
 import platform
 import sys
@@ -16,10 +17,87 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
-def write_to_file(report_file, contig_stats, MIN_CONTIG_LEN, MIN_CONTIG_COV):
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records, outfile)
+
+
+def write_to_file(report, contig_stats, MIN_CONTIG_LEN, MIN_CONTIG_COV):
     """
     Writes results from the contig analysis to the report.
-    param: str report_file = report file
+    param: Report report = report of the task
     param: list contig_stats = list of four lists with contigs that
           1) passed none of the thresholds for contig length or coverage
           2) passed one threshold
@@ -33,102 +111,35 @@ def write_to_file(report_file, contig_stats, MIN_CONTIG_LEN, MIN_CONTIG_COV):
     a,b,c,d    = contig_stats
     no_contigs = sum(contig_stats)
 
-    with open(report_file, 'a') as report:
-        print('\\nContig analysis:', file=report)
-        print('(min length: ' + str(MIN_CONTIG_LEN) + ' bp, min coverage: '
-              + str(MIN_CONTIG_COV) + 'x)', file=report)
-        print('contigs that fail both thresholds:\t',
-              round(a*100/no_contigs, 2), '%', file=report)
-        if (a*100/no_contigs) > 20:
-            print('WARNING: The sample seems to be contaminated!', file=report)
-        elif (a*100/no_contigs) > 5:
-            print('NOTE: The sample might be contaminated!', file=report)
-        print('contigs that are too short or have a low coverage:\t',
-              round(b*100/no_contigs, 2), '%', file=report)
-        print('contigs that meet both thresholds:\t',
-              round(c*100/no_contigs, 2), '%', file=report)
-        print('contigs with a high coverage (> 250x):\t',
-              round(d*100/no_contigs, 2), '%', file=report)
-        if (d*100/no_contigs) > 0.5:
-            print('NOTE: There might be a plasmid!', file=report)
-
-
-def plot_it_1(output_file, data, MIN_CONTIG_VALUE, MIN, MAX, COLOR1, COLOR2,
-              TITLE, XLABEL, YLABEL):
-    """
-    Plots a histogram of distributions and saves it to file.
-    helper function to plot_length_dist() and plot_coverage_dist()
-    param: str output_file = output file
-    param: data = lo_len_data or lo_cov_data
-    param: MIN_CONTIG_VALUE = either min contig length threshold (e.g.: 1000)
-           or min contig coverage threshold (e.g.: 7.5)
-    param: int or float MIN = minimal data range to plot
-    param: int MAX = maximal data range to plot
-    param: str COLOR1 = bar color: 'blue' or 'brown'
-    param: str COLOR2 = line color: 'red' or 'blue'
-    param: str TITLE = title of the chart
-    param: str XLABEL = label for the x-axis
-    param: str YLABEL = label for the y-axis
-    param: str FILE_NAME = name of the file
-    """
-
-    fig, ax = plt.subplots()
-    # print a histogram to file, were each bin covers about 5000 bp of the
-    #   genome over the length of the genome
-    plt.hist(data, color=COLOR1,
-             bins=np.logspace(np.log10(MIN),np.log10(MAX), 30), alpha=0.5)
-    plt.title(TITLE)
-    plt.xlabel(XLABEL)
-    plt.ylabel(YLABEL)
-    plt.gca().set_xscale('log')  # set the scale on the x-axis to log
-    plt.axvline(MIN_CONTIG_VALUE, color=COLOR2)  # solid line, min length cutoff
-    plt.savefig(output_file)
-    plt.close()
-
-
-def plot_sum_dist(contig_len_dist_file, contig_cov_dist_file, lo_contig_data, MIN_CONTIG_LEN, MIN_CONTIG_COV):
-    """
-    Plots histograms of contig-lengths and contig-coverage distributions and
-      saves them to disk.
-    param: str contig_len_dist_file = contig len dist output file
-    param: str contig_cov_dist_file = contig cov dist output file
-    param: list lo_contig_data = [(contig number, length, coverage), ...]
-    param: int MIN_CONTIG_LEN = min contig length threshold (e.g.: 1000)
-    param: float MIN_CONTIG_COV = min contig coverage threshold (e.g.: 7.5)
-    output: histogram with contig lengths distributions
-    output: histogram with contig coverages distributions
-    """
-
-    N = str(len(lo_contig_data))
-    lo_len_data = [datum[1] for datum in lo_contig_data]
-    lo_cov_data = [datum[2] for datum in lo_contig_data]
-
-    # plot the contig-lengths distribution
-    plot_it_1(contig_len_dist_file, lo_len_data, MIN_CONTIG_LEN, 100, 1000000,
-              'blue', 'red', 'Contig length distribution (n=' + N + ')',
-              'Length [log10]', 'Number of contigs')
-
-    # plot the contig-coverage distribution
-    plot_it_1(contig_cov_dist_file, lo_cov_data, MIN_CONTIG_COV, 0.1, 1000,
-              'brown', 'blue', 'Contig coverage distribution (n=' + N + ')',
-              'Coverage [log10]', 'Number of contigs')
-
-
-def plot_len_x_cov_dist(contig_len_x_cov_dist_file, lo_contig_data, MIN_CONTIG_LEN,
-                        MIN_CONTIG_COV):
+    report.print('\\nContig analysis:')
+    report.print('(min length: ' + str(MIN_CONTIG_LEN) + ' bp, min coverage: '
+                 + str(MIN_CONTIG_COV) + 'x)')
+    report.print('contigs that fail both thresholds:\t',
+                 round(a*100/no_contigs, 2), '%')
+    if (a*100/no_contigs) > 20:
+        report.print('WARNING: The sample seems to be contaminated!')
+    elif (a*100/no_contigs) > 5:
+        report.print('NOTE: The sample might be contaminated!')
+    report.print('contigs that are too short or have a low coverage:\t',
+                 round(b*100/no_contigs, 2), '%')
+    report.print('contigs that meet both thresholds:\t',
+                 round(c*100/no_contigs, 2), '%')
+    report.print('contigs with a high coverage (> 250x):\t',
+                 round(d*100/no_contigs, 2), '%')
+    if (d*100/no_contigs) > 0.5:
+        report.print('NOTE: There might be a plasmid!')
+
+
+def sort_len_x_cov(lo_contig_data, MIN_CONTIG_LEN, MIN_CONTIG_COV):
     """
-    Plots a histogram of contig-lengths * contig-coverage distributions and
-      saves it to file. Bars that meet the thresholds for min coverage and min
-      length are shown in green, those that meet one of the two are shown in
-      orange, and those that meet none are shown in red. A large red area
-      suggests problematic data, such as contaminations.
-    param: str contig_len_x_cov_dist_file = contig len x cov dist output file
+    Sorts the contig-lengths * contig-coverage products into four lists,
+      depending on how many of the thresholds for min coverage and min length
+      a contig meets.
     param: list lo_contig_data = [(contig number, length, coverage), ...]
     param: int MIN_CONTIG_LEN = min contig length threshold (e.g.: 1000)
     param: float MIN_CONTIG_COV = min contig coverage threshold (e.g.: 7.5)
-    return tuple = the number of contigs that meet none, one, or both minimal
-           criteria or that have a very high coverage
-    output: histogram
+    return tuple = lists of length * coverage for contigs that meet none, one,
+           or both minimal criteria or that have a very high coverage
     """
 
     lo_none     = []   # meets no thresholds
@@ -150,155 +161,111 @@ def plot_len_x_cov_dist(contig_len_x_cov_dist_file, lo_contig_data, MIN_CONTIG_L
         else:
             lo_one.append(datum[1] * datum[2])
 
-    no_contigs = len(lo_none) + len(lo_one) + len(lo_both) + len(lo_high_cov)
+    return lo_none, lo_one, lo_both, lo_high_cov
 
-    fig, ax = plt.subplots()
-    BINS = np.logspace(np.log10(10),np.log10(100000000), 30)
 
-    # print a histogram to file:
-    # bins=np.logspace(np.log10(10),np.log10(100000000), 30) = generate 30
-    #  bins, ranging from 10 to 100000000
-    # red: contigs that are too short and too low coverage
-    plt.hist(lo_none, color='red', bins=BINS, alpha=0.5)
-    # orange: contigs that are too short or too low coverage
-    plt.hist(lo_one, color='orange', bins=BINS, alpha=0.5)
-    # green: contigs with sufficient length and coverage
-    plt.hist(lo_both, color='green', bins=BINS, alpha=0.5)
-    # black: contigs with very high coverage
-    plt.hist(lo_high_cov, color='black', bins=BINS, alpha=0.75)
-
-    plt.title('Contig Length * Coverage distribution (n='\
-              + str(no_contigs) + ')')
-    plt.xlabel('Length * Coverage [log10]')
-    plt.ylabel('Number of contigs')
-    plt.gca().set_xscale('log')  # change x-axis to log10 scale
-    plt.savefig(contig_len_x_cov_dist_file)
-    plt.close()
-
-    return len(lo_none), len(lo_one), len(lo_both), len(lo_high_cov)
-
-
-def plot_it_2(output_file, lo_covs, Color, contig_1k, Title, IS_COV,
-              med_cov, x_label):
+def write_plot_data(plot_data_file, lo_contig_data, lo_len_x_cov,
+                    MIN_CONTIG_LEN, MIN_CONTIG_COV):
     """
-    Plots contig coverage or contig lengths distributions
-      helper function to plot_ind_dist()
-    param: str output_file = output file
-    param: list lo_covs = list of data to be plotted, either contig coverage
-           or contig lengths
-    param: str Color = 'maroon' or 'seagreen'
-    param: int contig_1k = the number of the smallest contig that is >= 1000 bp
-    param: str Title = title of the chart
-    param: bool IS_COV = if True, the lo_covs is contig coverage data,
-           else: contig lengths
-    param: float med_cov = median coverage
-    param: str x_label = label for the x-axis
-    output: one of four possible charts saved to file
+    Reduces the contig data to what RENDER_PLOTS needs to draw the five
+      contig figures: the length, coverage, and length * coverage histograms
+      with 30 bins on a log scale, and the length and coverage of each contig.
+    param: str plot_data_file = output file
+    param: list lo_contig_data = [(contig number, length, coverage), ...]
+    param: tuple lo_len_x_cov = lists of length * coverage for contigs that
+           meet none, one, or both thresholds, or have a very high coverage
+    param: int MIN_CONTIG_LEN = min contig length threshold (e.g.: 1000)
+    param: float MIN_CONTIG_COV = min contig coverage threshold (e.g.: 7.5)
+    output: .npz file with the histograms and the per contig data
     """
 
-    # plot a bar chart that is as wide as the list of data, as high as the
-    # data, in maroon, align bars to the edge, make bars 1 pixel wide, and
-    # tone down the color intensity
-    plt.bar(range(len(lo_covs)), lo_covs, color=Color, align='edge',
-            width=1, alpha=0.7)
-
-    # Draw horizonal lines at y that spans the x-range
-    if IS_COV:
-        plt.axhline(y=1, color='orange', linewidth=2)
-        plt.axhline(y=10, color='orange', linewidth=2)
-        plt.axhline(y=100, color='orange', linewidth=2)
-        plt.axhline(y=7.5, color='blue', linewidth=2)
-        plt.axhline(y= med_cov, color='red', linewidth=3)
-    else:
-        plt.axhline(y=100, color='orange', linewidth=2)
-        plt.axhline(y=1000, color='blue', linewidth=2)
-        plt.axhline(y=10000, color='orange', linewidth=2)
-        plt.axhline(y=100000, color='orange', linewidth=2)
-
-    # Draw vertical lines at x that span the y-range
-    plt.axvline(x=contig_1k, color='blue', linewidth=2)
-    plt.title(Title)
-    plt.xlabel('Contig')
-    plt.ylabel(x_label)
-    plt.yscale('log')  # apply log10 scale on y-axis
-    plt.savefig(output_file)
-    plt.close()
-
-
-def plot_ind_dist(contig_ind_len_file, contig_ind_cov_file, lo_contig_data):
+    lengths = np.array([datum[1] for datum in lo_contig_data], dtype=np.int64)
+    coverages = np.array([datum[2] for datum in lo_contig_data],
+                         dtype=np.float64)
+
+    len_counts, len_edges = np.histogram(
+        lengths, bins=np.logspace(np.log10(100),np.log10(1000000), 30))
+    cov_counts, cov_edges = np.histogram(
+        coverages, bins=np.logspace(np.log10(0.1),np.log10(1000), 30))
+
+    # generate 30 bins, ranging from 10 to 100000000
+    BINS = np.logspace(np.log10(10),np.log10(100000000), 30)
+    none_counts, one_counts, both_counts, high_cov_counts = \
+        [np.histogram(lo_data, bins=BINS)[0] for lo_data in lo_len_x_cov]
+
+    np.savez_compressed(plot_data_file,
+                        figures=np.array(['contig_len_dist', 'contig_cov_dist',
+                                          'Ampel_dist', 'plot_contig_len',
+                                          'plot_contig_cov']),
+                        min_contig_len=MIN_CONTIG_LEN,
+                        min_contig_cov=MIN_CONTIG_COV,
+                        lengths=lengths, coverages=coverages,
+                        len_counts=len_counts, len_edges=len_edges,
+                        cov_counts=cov_counts, cov_edges=cov_edges,
+                        len_x_cov_edges=BINS, none_counts=none_counts,
+                        one_counts=one_counts, both_counts=both_counts,
+                        high_cov_counts=high_cov_counts)
+
+
+def read_contigs_index(contigs_index_file):
     """
-    Organizes the plotting of four graphs using plot_it_2()
-    param: str contig_ind_len_file = contig ind len output file
-    param: str contig_ind_cov_file = contig ind cov output file
-    param: list lo_contig_data = = [(contig number, length, coverage), ...]
-    output: manages plotting four charts, see also plot_it_2()
+    Reads the contig index written by INDEX_CONTIGS.
+    param: str contigs_index_file = contig index file
+    return: list lo_records = [[header, contig number, length, coverage,
+            byte offset, record size in bytes], ...] as strings, e.g.:
+            [['NODE_1_length_238256_cov_41.824755', '1', '238256',
+              '41.824755', '0', '242262'], ...]
     """
 
-    # Number of the smallest contig that is >= 1000 bp
-    contig_1k = len([datum[2] for datum in lo_contig_data if datum[1] >= 1000])
-
-    # Length of all contigs
-    lo_len = [(datum[1]) for datum in lo_contig_data]
-    plot_it_2(contig_ind_len_file, lo_len, 'maroon', contig_1k,
-              'Contig length distribution (median=' \
-              + str(round(np.median(lo_len), 2)) \
-              + ')\\nsmallest contig >=1000 bp = ' + str(contig_1k),
-              False, 0, 'Length [log10]')
-
-    # Coverage for all contigs
-    lo_cov = [datum[2] for datum in lo_contig_data]
-    med_cov = np.median(lo_cov)  # median coverage
-    plot_it_2(contig_ind_cov_file, lo_cov, 'seagreen', contig_1k,
-              'Contig coverage distribution\\n(median='  \
-              + str(round(med_cov, 2)) + ')',
-              True, med_cov, 'Coverage [log10]')
-
-
-def parse_spades_output(contigs_file, contig_len_dist_file, contig_cov_dist_file,
-                        contig_len_x_cov_dist_file, contig_ind_len_file,
-                        contig_ind_cov_file, report_file, min_contig_len,
-                        min_contig_cov, max_no_contigs):
+    lo_records = []
+    with open(contigs_index_file, 'r', newline='') as infile:
+        reader = csv.reader(infile, dialect='excel-tab')
+        for row in reader:
+            # ignore the header
+            if row[0].startswith('#'):
+                continue
+            lo_records.append(row)
+    return lo_records
+
+
+def parse_spades_output(contigs_index_file, plot_data_file, report_file,
+                        min_contig_len, min_contig_cov, max_no_contigs):
     """
     Writes information from the SPAdes output file to report.txt and returns
     info about each contig.
-    param: str contigs_file = contigs file
+    param: str contigs_index_file = contig index file for the contigs file
     param: str report_file = report file
+    param: str plot_data_file = plot data output file
     return: list lo_contig_data = [(contig number, length, coverage), ...];
             e.g.: [(1, 238256, 41.824755), (2, 208256, 8.247), ...]
     """
 
     lo_contig_data = []
 
-    with open(report_file, 'a') as report:
-        print('\\n\\nDe novo assembly (SPAdes):', file=report)
-        print('contig\tlength (bp)\tcoverage', file=report)
-
-        with open(contigs_file, 'r') as contigs:
-            for line in contigs:
-                if line.startswith('>'):
-                    line = line.rstrip('\\n')
-                    data = line.split('_')
-                    # contig number, length, coverage; e.g.:
-                    # >NODE_1_length_238256_cov_41.824755
-                    print(data[1], '\t', data[3], '\t', data[5], file=report)
-                    # collect contig info
-                    lo_contig_data.append((int(data[1]), int(data[3]),
-                                           float(data[5])))
+    report = Report(report_file)
+    report.print('\\n\\nDe novo assembly (SPAdes):')
+    report.print('contig\tlength (bp)\tcoverage')
 
-        # Write placeholders for figures to the report
-        print('\\nFigure: contigs vs length', file=report)
-        print('\\nFigure: contigs vs coverage', file=report)
-        print('\\nFigure: contig length distribution', file=report)
-        print('\\nFigure: contig coverage distribution', file=report)
-        print('\\nFigure: contig length * coverage distribution', file=report)
+    for header, node, length, cov, offset, size \
+    in read_contigs_index(contigs_index_file):
+        # contig number, length, coverage; e.g.:
+        # >NODE_1_length_238256_cov_41.824755
+        report.print(node, '\t', length, '\t', cov)
+        # collect contig info
+        lo_contig_data.append((int(node), int(length), float(cov)))
 
-    plot_sum_dist(contig_len_dist_file, contig_cov_dist_file, lo_contig_data, min_contig_len, min_contig_cov)
+    # Write placeholders for figures to the report
+    report.print('\\nFigure: contigs vs length')
+    report.print('\\nFigure: contigs vs coverage')
+    report.print('\\nFigure: contig length distribution')
+    report.print('\\nFigure: contig coverage distribution')
+    report.print('\\nFigure: contig length * coverage distribution')
 
-    contig_stats = plot_len_x_cov_dist(contig_len_x_cov_dist_file, lo_contig_data, min_contig_len, min_contig_cov)
+    lo_len_x_cov = sort_len_x_cov(lo_contig_data, min_contig_len, min_contig_cov)
+    contig_stats = tuple(len(lo_data) for lo_data in lo_len_x_cov)
 
-    write_to_file(report_file, contig_stats, min_contig_len, min_contig_cov)
-
-    plot_ind_dist(contig_ind_len_file, contig_ind_cov_file, lo_contig_data)
+    write_to_file(report, contig_stats, min_contig_len, min_contig_cov)
+    report.flush()
 
     n_contigs = len(lo_contig_data)
 
@@ -306,6 +273,8 @@ def parse_spades_output(contigs_file, contig_len_dist_file, contig_cov_dist_file
         logger.error(f"There were {n_contigs} contigs, which is far too many.")
         sys.exit(2)
 
+    write_plot_data(plot_data_file, lo_contig_data, lo_len_x_cov, min_contig_len, min_contig_cov)
+
 
 if __name__ == "__main__":
     logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
@@ -318,6 +287,5 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(parse_spades_output("$contigs", "$contig_len_dist", "$contig_cov_dist", "$contig_len_x_cov_dist",
-                                 "$contig_ind_len", "$contig_ind_cov", "$report", int("$min_contig_len"),
+    sys.exit(parse_spades_output("$contigs_index", "$plot_data", "$report", int("$min_contig_len"),
                                  float("$min_contig_cov"), int("$max_no_contigs")))
@@ -5,6 +5,7 @@
 
 
 import csv
+import json
 import logging
 import numpy as np
 import platform
@@ -16,6 +17,97 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text. QC metrics are not part of the
+      text, they are added after the lines as ['metric', name, value,
+      reference] records, which MAKE_QC_DB stores in the QC database.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.lo_metrics = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def metric(self, name, value, reference=''):
+        """
+        Adds a QC metric of the task, e.g.: metric('percent_mapped', 98.7).
+        param: str name = name of the metric
+        param: float value = value of the metric
+        param: str reference = reference the metric refers to, if it is not
+               the reference of the task, e.g. for Mash distances
+        """
+
+        self.lo_metrics.append(['metric', name, float(value), reference])
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records + self.lo_metrics, outfile)
+
+
 def parse_trimmomatic_output(trimlog_file, output_file, report_file, min_reads):
     """
     Extracts data from the trimmomatic log file and writes them to the report.
@@ -115,44 +207,52 @@ def parse_trimmomatic_output(trimlog_file, output_file, report_file, min_reads):
             prev_read = base_name, trim_length
 
     # write data to report file
-    with open(report_file, 'a') as report:
-        print('Read pre-processing (Trimmomatic):', file=report)
-        print('Adapters removed, low quality (< Q20) regions removed, short reads (<100) removed, poly-G (>25) removed', file=report)
-        print('Input read pairs:\t', int(input_read_pairs),\
-              sep='', file=report)
-        print('Both surviving:\t', both_surviving,\
-              ' (', round(both_surviving*100/input_read_pairs, 2), '%)',\
-              sep='', file=report)
-        print('Forward only surviving:\t', f_only_surviving,\
-              ' (', round(f_only_surviving*100/input_read_pairs, 2), '%)',\
-              sep='', file=report)
-        print('Reverse only surviving:\t', r_only_surviving, \
-              ' (', round(r_only_surviving*100/input_read_pairs, 2), '%)',\
-              sep='', file=report)
-        print('Dropped read pairs:\t', dropped,\
-              ' (', round(dropped*100/input_read_pairs, 2), '%)',\
-              sep='', file=report)
-        print('Mean (SD) lengths of trimmed F reads:\t',\
-              round(np.mean(lo_f_length_distr), 2), \
-              ' (', round(np.std(lo_f_length_distr), 3), ')',\
-              sep='', file=report)
-        print('Mean (SD) lengths of trimmed R reads:\t',\
-              round(np.mean(lo_r_length_distr), 2),\
-              ' (', round(np.std(lo_r_length_distr), 3), ')',\
-              sep='', file=report)
-        print("Mean (SD) no. of bases trimmed from 5' of F reads(*):\t",\
-              round(np.mean(lo_f_trim_5), 2),\
-              ' (', round(np.std(lo_f_trim_5), 3), ')', sep='', file=report)
-        print("Mean (SD) no. of bases trimmed from 5' of R reads(*):\t",\
-              round(np.mean(lo_r_trim_5), 2),\
-              ' (', round(np.std(lo_r_trim_5), 3), ')', sep='', file=report)
-        print("Mean (SD) no. of bases trimmed from 3' of F reads(*):\t",\
-              round(np.mean(lo_f_trim_3), 2),\
-              ' (', round(np.std(lo_f_trim_3), 3), ')', sep='', file=report)
-        print("Mean (SD) no. of bases trimmed from 3' of R reads(*):\t",\
-              round(np.mean(lo_r_trim_3), 2),\
-              ' (', round(np.std(lo_r_trim_3), 3), ')', sep='', file=report)
-        print('(*) if trimmed read length > 0', file=report)
+    report = Report(report_file)
+    report.print('Read pre-processing (Trimmomatic):')
+    report.print('Adapters removed, low quality (< Q20) regions removed, short reads (<100) removed, poly-G (>25) removed')
+    report.print('Input read pairs:\t', int(input_read_pairs),\
+                 sep='')
+    report.print('Both surviving:\t', both_surviving,\
+                 ' (', round(both_surviving*100/input_read_pairs, 2), '%)',\
+                 sep='')
+    report.print('Forward only surviving:\t', f_only_surviving,\
+                 ' (', round(f_only_surviving*100/input_read_pairs, 2), '%)',\
+                 sep='')
+    report.print('Reverse only surviving:\t', r_only_surviving, \
+                 ' (', round(r_only_surviving*100/input_read_pairs, 2), '%)',\
+                 sep='')
+    report.print('Dropped read pairs:\t', dropped,\
+                 ' (', round(dropped*100/input_read_pairs, 2), '%)',\
+                 sep='')
+    report.print('Mean (SD) lengths of trimmed F reads:\t',\
+                 round(np.mean(lo_f_length_distr), 2), \
+                 ' (', round(np.std(lo_f_length_distr), 3), ')',\
+                 sep='')
+    report.print('Mean (SD) lengths of trimmed R reads:\t',\
+                 round(np.mean(lo_r_length_distr), 2),\
+                 ' (', round(np.std(lo_r_length_distr), 3), ')',\
+                 sep='')
+    report.print("Mean (SD) no. of bases trimmed from 5' of F reads(*):\t",\
+                 round(np.mean(lo_f_trim_5), 2),\
+                 ' (', round(np.std(lo_f_trim_5), 3), ')', sep='')
+    report.print("Mean (SD) no. of bases trimmed from 5' of R reads(*):\t",\
+                 round(np.mean(lo_r_trim_5), 2),\
+                 ' (', round(np.std(lo_r_trim_5), 3), ')', sep='')
+    report.print("Mean (SD) no. of bases trimmed from 3' of F reads(*):\t",\
+                 round(np.mean(lo_f_trim_3), 2),\
+                 ' (', round(np.std(lo_f_trim_3), 3), ')', sep='')
+    report.print("Mean (SD) no. of bases trimmed from 3' of R reads(*):\t",\
+                 round(np.mean(lo_r_trim_3), 2),\
+                 ' (', round(np.std(lo_r_trim_3), 3), ')', sep='')
+    report.print('(*) if trimmed read length > 0')
+
+    report.metric('input_read_pairs', input_read_pairs)
+    report.metric('both_surviving', both_surviving)
+    report.metric('forward_only_surviving', f_only_surviving)
+    report.metric('reverse_only_surviving', r_only_surviving)
+    report.metric('dropped_read_pairs', dropped)
+
+    report.flush()
 
     max_read_len = max(lo_f_length_distr)
 
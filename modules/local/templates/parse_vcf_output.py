@@ -5,8 +5,8 @@
 
 
 import csv
+import json
 import logging
-import matplotlib.pyplot as plt
 import numpy as np
 import platform
 import sys
@@ -17,6 +17,97 @@ from pathlib import Path
 logger = logging.getLogger()
 
 
+class Report:
+    """
+    Collects the report of the task in memory and writes it once, both as the
+      report text and as JSON records, which CONVERT_REPORTS turns into html
+      without parsing the text. Each line of the report is one record:
+      - ['title', name] for the first line, e.g.: 'BWA results:'
+      - ['item', name, value] for lines with one tab, e.g.: 'Reads:<tab>1000'
+      - ['row', [cells]] for lines with more than one tab
+      - ['heading', text] for other lines ending with ':'
+      - ['text', text] for all other lines
+      Empty lines are only kept in the text. QC metrics are not part of the
+      text, they are added after the lines as ['metric', name, value,
+      reference] records, which MAKE_QC_DB stores in the QC database.
+    """
+
+    def __init__(self, report_file):
+        """
+        param: str report_file = report.txt file, the records are written to
+               the .json file of the same name
+        """
+
+        self.report_file = report_file
+        self.json_file = Path(report_file).with_suffix('.json')
+        self.lo_text = []
+        self.lo_records = []
+        self.lo_metrics = []
+        self.line = ''
+
+    def print(self, *values, sep=' ', end='\\n'):
+        """
+        Adds text to the report, with the same arguments as print().
+        """
+
+        text = sep.join(str(value) for value in values) + end
+        self.lo_text.append(text)
+
+        # only complete lines become records
+        *lo_lines, self.line = (self.line + text).split('\\n')
+        for line in lo_lines:
+            self.add_record(line)
+
+    def metric(self, name, value, reference=''):
+        """
+        Adds a QC metric of the task, e.g.: metric('percent_mapped', 98.7).
+        param: str name = name of the metric
+        param: float value = value of the metric
+        param: str reference = reference the metric refers to, if it is not
+               the reference of the task, e.g. for Mash distances
+        """
+
+        self.lo_metrics.append(['metric', name, float(value), reference])
+
+    def add_record(self, line):
+        """
+        Adds the record of one line of the report.
+        """
+
+        if line == '':
+            return
+        if not self.lo_records:
+            self.lo_records.append(['title', line[:-1]])
+        elif line.count('\t') == 1:
+            name, value = line.split('\t')
+            if name.endswith(':'):
+                name = name[:-1]
+            self.lo_records.append(['item', name, value])
+        elif line.count('\t') > 1:
+            self.lo_records.append(['row', line.split('\t')])
+        elif line.endswith(':'):
+            self.lo_records.append(['heading', line[:-1]])
+        else:
+            self.lo_records.append(['text', line])
+
+    def flush(self):
+        """
+        Writes the report text and the JSON records.
+        output: report.txt and report.json files
+        """
+
+        if self.line:
+            self.add_record(self.line)
+            self.line = ''
+
+        with open(self.report_file, 'a') as report:
+            report.write(''.join(self.lo_text))
+        self.lo_text = []
+
+        with open(self.json_file, 'w') as outfile:
+            json.dump(self.lo_records + self.lo_metrics, outfile)
+
+
 def translate_cigar(cigar):
     """
     Translates a CIGAR score from alphanumeric format to all-alphabetical for
@@ -187,55 +278,53 @@ def write_to_file(report_file, reference_file, isolate, to_mutations, ref_seq_le
     data_str = V1 + ' (' + V2 + ', ' +  V3 + ', ' + V4 + ')'
 
     # write results to the report
-    with open(report_file, 'a') as report:
-        print('\\n\\nSNPs and INDEL events between ' + isolate\
-              + ' and reference ' + str(reference_file)[:-3] + ' (FreeBayes):',
-              file=report)
+    report = Report(report_file)
+    report.print('\\n\\nSNPs and INDEL events between ' + isolate\
+                 + ' and reference ' + str(reference_file)[:-3] + ' (FreeBayes):')
 
-        print('\\nFound', data_str, 'SNPs and INDEL events compared to a ' \
-              + 'reference genome of', ref_seq_len, 'bp.', file=report)
-        print('(Note that the indel event count might be slightly lower in'\
-              ' the SNP-matrix.)\\n', file=report)
+    report.print('\\nFound', data_str, 'SNPs and INDEL events compared to a ' \
+                 + 'reference genome of', ref_seq_len, 'bp.')
+    report.print('(Note that the indel event count might be slightly lower in'\
+                 ' the SNP-matrix.)\\n')
 
-        # if too many SNPs/INDELs, make the query it's own reference
-        if to_mutations[0] >= SNP_THRESHOLD:
-            print('\\nNOTE:\\nNumber of SNPs and INDEL events above threshold. '\
-                  + 'Adding the isolate to the list of reference genomes.',
-                  file=report)
+    # if too many SNPs/INDELs, make the query it's own reference
+    if to_mutations[0] >= SNP_THRESHOLD:
+        report.print('\\nNOTE:\\nNumber of SNPs and INDEL events above threshold. '\
+                     + 'Adding the isolate to the list of reference genomes.')
 
-        print('Figure: SNP/INDEL distribution', file=report)
+    report.print('Figure: SNP/INDEL distribution')
 
+    # V1 to V4, see read_vcf_file()
+    for name, V in zip(['mutation_events', 'indel_events', 'indel_bases',
+                        'snps'], to_mutations):
+        report.metric(name, V)
 
-def plot_mutation_dist(mutation_dist_file, isolate, lo_variant_posns, ref_seq_len):
+    report.flush()
+
+
+def write_plot_data(plot_data_file, isolate, lo_variant_posns, ref_seq_len):
     """
-    Produces a histogram showing the distribution of SNPs in the genome.
-      FreeBayes combines SNPs and indels into MNPs (multi-nucleotide
-      polymorphisms) or complex events (composite insertion and substitution
-      events), which have been unravelled into single mutations.
+    Counts the SNPs and indels per 5000 bases, which is all RENDER_PLOTS needs
+      to draw the 'mutation_dist' figure. FreeBayes combines SNPs and indels
+      into MNPs (multi-nucleotide polymorphisms) or complex events (composite
+      insertion and substitution events), which have been unravelled into
+      single mutations.
+    param: str plot_data_file = output file
     param: str isolate = isolate name, e.g.: 'IDR001234'
-    param: int ref_seq_len = length of the reference genome
     param: list lo_variant_posns = list of positions of SNPs and indels
-    output: a histogram, 'mutation_dist.png', that shows the number of SNPs
-            and number of bases in indels in intervals (bins) of 5000 bases
+    param: int ref_seq_len = length of the reference genome
+    output: .npz file with the number of mutations in intervals (bins) of
+            5000 bases
     """
 
-    fig, ax = plt.subplots()
-    max_x_val = int(np.ceil(ref_seq_len/500000)) + 1  # highest value on x-axis
-    # print a histogram to file, were each bin covers about 5000 bp of the
-    #   genome over the length of the genome
-    plt.hist(lo_variant_posns, bins=int(ref_seq_len/5000), \
-             range=(0, ref_seq_len))
-    plt.title('SNP/indel distribution for ' + isolate + ' in 5 kb intervals')
-    plt.xlabel('Position [million bases]')
-    plt.ylabel('Number of mutations per 5kb')
-    # change the tick labels: for a genome of 3.5 Mb, need a tick label every
-    #   0.5 Mb or 500000 bp => make 8 tick labels (0, 0.5, 1, ...)
-    # choose which x locations to have ticks: every 500 kb
-    ax.set_xticks([500000 * x for x in range(0, max_x_val)])
-    # set the labels to display at those ticks: 500 kb intervals
-    ax.set_xticklabels([0.5 * x for x in range(0, max_x_val)])
-    plt.savefig(mutation_dist_file)
-    plt.close()
+    mutation_counts, mutation_edges = np.histogram(lo_variant_posns,
+                                                   bins=int(ref_seq_len/5000),
+                                                   range=(0, ref_seq_len))
+
+    np.savez_compressed(plot_data_file, figures=np.array(['mutation_dist']),
+                        isolate=np.array(isolate), ref_seq_len=ref_seq_len,
+                        mutation_counts=mutation_counts,
+                        mutation_edges=mutation_edges)
 
 
 def seq_len(reference_file):
@@ -253,7 +342,7 @@ def seq_len(reference_file):
     return len(seq)
 
 
-def parse_vcf_output(vcf_file, reference_file, mutation_dist_file, output_file, report_file, isolate, SNP_THRESHOLD):
+def parse_vcf_output(vcf_file, reference_file, plot_data_file, output_file, report_file, isolate, SNP_THRESHOLD):
     """Parses the vcf file and writes the results to the report."""
 
     # reads the freebayes VCF file
@@ -265,8 +354,8 @@ def parse_vcf_output(vcf_file, reference_file, mutation_dist_file, output_file,
     # returns the length of the refernce genome in bp
     ref_seq_len = seq_len(reference_file)
 
-    # makes a plot of the SNP distribution
-    plot_mutation_dist(mutation_dist_file, isolate, lo_variant_posns, ref_seq_len)
+    # saves the SNP distribution for RENDER_PLOTS
+    write_plot_data(plot_data_file, isolate, lo_variant_posns, ref_seq_len)
 
     # adds text to the report file
     write_to_file(report_file, reference_file, isolate, to_mutations, ref_seq_len,
@@ -288,4 +377,4 @@ if __name__ == "__main__":
     with open("versions.yml", "w") as f:
         yaml.dump(versions, f, default_flow_style=False)
 
-    sys.exit(parse_vcf_output("$vcf", "$fasta", "$mutation_dist", "$output", "$report", "$meta.id", int("$snp_threshold")))
+    sys.exit(parse_vcf_output("$vcf", "$fasta", "$plot_data", "$output", "$report", "$meta.id", int("$snp_threshold")))
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+
+
+"""Render plots."""
+
+
+import logging
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import platform
+import sys
+import yaml
+from pathlib import Path
+
+
+logger = logging.getLogger()
+
+
+def plot_histo_depths(output_file, plot_data):
+    """
+    Plots a histogram of the read depth per base distribution.
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by COUNT_NNN_GAPS
+    output: histogram of the read depth per base distribution, including the
+            mean and mean +/- 3 StDev
+    """
+
+    average = plot_data['depth_mean']
+    SD = plot_data['depth_sd']
+    edges = plot_data['depth_edges']
+
+    plt.hist(edges[:-1], bins=edges, weights=plot_data['depth_counts'],
+             color='brown')
+    # Draw a default (v-)line at x that spans the y-range
+    plt.axvline(x= average, color='blue', linewidth=3)
+    plt.axvline(x= (average + 3 * SD), color='blue')
+    plt.axvline(x= (average - 3 * SD), color='blue')
+    plt.title('Read depth per base (average +/- 3 SD)')
+    plt.xlabel('Read depth per base')
+    plt.ylabel('Number of bases')
+    plt.savefig(output_file)
+    plt.close()
+
+
+def plot_plot_depths(output_file, plot_data):
+    """
+    Plots the read depth per base distribution.
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by COUNT_NNN_GAPS
+    output: histogram of the read depth per base distribution, including
+            lines indicating the mean +/- 3 * StDev
+    """
+
+    average = plot_data['depth_mean']
+    SD = plot_data['depth_sd']
+    depths = plot_data['depths']
+    max_x_val = int(np.ceil(len(depths)/500000)) + 1  # highest value on x-axis
+    fig, ax = plt.subplots()
+
+    plt.plot(depths, color='blue')
+    # Draw a line at y that spans the x-range
+    plt.axhline(y= average, color='red', linewidth=3)
+    plt.axhline(y= (average + 3 * SD), color='orange')
+    plt.axhline(y= (average - 3 * SD), color='orange')
+    plt.title('Read depth per base (average +/- 3 SD)')
+    plt.xlabel('Read depth per base [Mb]')
+    plt.ylabel('Number of reads')
+
+    # set the tick labels to 500000 bp intervals
+    ax.set_xticks([500000 * x for x in range(0, max_x_val)])
+    # change the tick labels from absolute values to intervals of 0.5 Mb
+    ax.set_xticklabels([0.5 * x for x in range(0, max_x_val)])
+
+    plt.savefig(output_file)
+    plt.close()
+
+
+def plot_mutation_dist(output_file, plot_data):
+    """
+    Plots a histogram showing the distribution of SNPs in the genome.
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by PARSE_VCF_OUTPUT
+    output: a histogram, 'mutation_dist.png', that shows the number of SNPs
+            and number of bases in indels in intervals (bins) of 5000 bases
+    """
+
+    ref_seq_len = int(plot_data['ref_seq_len'])
+    edges = plot_data['mutation_edges']
+
+    fig, ax = plt.subplots()
+    max_x_val = int(np.ceil(ref_seq_len/500000)) + 1  # highest value on x-axis
+    # the bins were counted by PARSE_VCF_OUTPUT, each covers about 5000 bp
+    plt.hist(edges[:-1], bins=edges, weights=plot_data['mutation_counts'])
+    plt.title('SNP/indel distribution for ' + str(plot_data['isolate']) \
+              + ' in 5 kb intervals')
+    plt.xlabel('Position [million bases]')
+    plt.ylabel('Number of mutations per 5kb')
+    # change the tick labels: for a genome of 3.5 Mb, need a tick label every
+    #   0.5 Mb or 500000 bp => make 8 tick labels (0, 0.5, 1, ...)
+    # choose which x locations to have ticks: every 500 kb
+    ax.set_xticks([500000 * x for x in range(0, max_x_val)])
+    # set the labels to display at those ticks: 500 kb intervals
+    ax.set_xticklabels([0.5 * x for x in range(0, max_x_val)])
+    plt.savefig(output_file)
+    plt.close()
+
+
+def plot_it_1(output_file, counts, edges, MIN_CONTIG_VALUE, COLOR1, COLOR2,
+              TITLE, XLABEL, YLABEL):
+    """
+    Plots a histogram of distributions and saves it to file.
+    helper function to plot_contig_len_dist() and plot_contig_cov_dist()
+    param: str output_file = output file
+    param: array counts = number of contigs per bin
+    param: array edges = bin edges on a log scale
+    param: MIN_CONTIG_VALUE = either min contig length threshold (e.g.: 1000)
+           or min contig coverage threshold (e.g.: 7.5)
+    param: str COLOR1 = bar color: 'blue' or 'brown'
+    param: str COLOR2 = line color: 'red' or 'blue'
+    param: str TITLE = title of the chart
+    param: str XLABEL = label for the x-axis
+    param: str YLABEL = label for the y-axis
+    """
+
+    fig, ax = plt.subplots()
+    plt.hist(edges[:-1], bins=edges, weights=counts, color=COLOR1, alpha=0.5)
+    plt.title(TITLE)
+    plt.xlabel(XLABEL)
+    plt.ylabel(YLABEL)
+    plt.gca().set_xscale('log')  # set the scale on the x-axis to log
+    plt.axvline(MIN_CONTIG_VALUE, color=COLOR2)  # solid line, min length cutoff
+    plt.savefig(output_file)
+    plt.close()
+
+
+def plot_contig_len_dist(output_file, plot_data):
+    """
+    Plots a histogram of the contig-lengths distribution.
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by PARSE_SPADES_OUTPUT
+    output: histogram with contig lengths distributions
+    """
+
+    N = str(len(plot_data['lengths']))
+    plot_it_1(output_file, plot_data['len_counts'], plot_data['len_edges'],
+              plot_data['min_contig_len'], 'blue', 'red',
+              'Contig length distribution (n=' + N + ')',
+              'Length [log10]', 'Number of contigs')
+
+
+def plot_contig_cov_dist(output_file, plot_data):
+    """
+    Plots a histogram of the contig-coverage distribution.
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by PARSE_SPADES_OUTPUT
+    output: histogram with contig coverages distributions
+    """
+
+    N = str(len(plot_data['coverages']))
+    plot_it_1(output_file, plot_data['cov_counts'], plot_data['cov_edges'],
+              plot_data['min_contig_cov'], 'brown', 'blue',
+              'Contig coverage distribution (n=' + N + ')',
+              'Coverage [log10]', 'Number of contigs')
+
+
+def plot_ampel_dist(output_file, plot_data):
+    """
+    Plots a histogram of contig-lengths * contig-coverage distributions. Bars
+      that meet the thresholds for min coverage and min length are shown in
+      green, those that meet one of the two are shown in orange, and those
+      that meet none are shown in red. A large red area suggests problematic
+      data, such as contaminations.
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by PARSE_SPADES_OUTPUT
+    output: histogram
+    """
+
+    no_contigs = len(plot_data['lengths'])
+    BINS = plot_data['len_x_cov_edges']
+
+    fig, ax = plt.subplots()
+    # red: contigs that are too short and too low coverage
+    plt.hist(BINS[:-1], bins=BINS, weights=plot_data['none_counts'],
+             color='red', alpha=0.5)
+    # orange: contigs that are too short or too low coverage
+    plt.hist(BINS[:-1], bins=BINS, weights=plot_data['one_counts'],
+             color='orange', alpha=0.5)
+    # green: contigs with sufficient length and coverage
+    plt.hist(BINS[:-1], bins=BINS, weights=plot_data['both_counts'],
+             color='green', alpha=0.5)
+    # black: contigs with very high coverage
+    plt.hist(BINS[:-1], bins=BINS, weights=plot_data['high_cov_counts'],
+             color='black', alpha=0.75)
+
+    plt.title('Contig Length * Coverage distribution (n='\
+              + str(no_contigs) + ')')
+    plt.xlabel('Length * Coverage [log10]')
+    plt.ylabel('Number of contigs')
+    plt.gca().set_xscale('log')  # change x-axis to log10 scale
+    plt.savefig(output_file)
+    plt.close()
+
+
+def plot_it_2(output_file, lo_covs, Color, contig_1k, Title, IS_COV,
+              med_cov, x_label):
+    """
+    Plots contig coverage or contig lengths distributions
+      helper function to plot_contig_len() and plot_contig_cov()
+    param: str output_file = output file
+    param: array lo_covs = data to be plotted, either contig coverage or
+           contig lengths
+    param: str Color = 'maroon' or 'seagreen'
+    param: int contig_1k = the number of the smallest contig that is >= 1000 bp
+    param: str Title = title of the chart
+    param: bool IS_COV = if True, the lo_covs is contig coverage data,
+           else: contig lengths
+    param: float med_cov = median coverage
+    param: str x_label = label for the x-axis
+    output: one of four possible charts saved to file
+    """
+
+    # plot a bar chart that is as wide as the list of data, as high as the
+    # data, in maroon, align bars to the edge, make bars 1 pixel wide, and
+    # tone down the color intensity
+    plt.bar(range(len(lo_covs)), lo_covs, color=Color, align='edge',
+            width=1, alpha=0.7)
+
+    # Draw horizonal lines at y that spans the x-range
+    if IS_COV:
+        plt.axhline(y=1, color='orange', linewidth=2)
+        plt.axhline(y=10, color='orange', linewidth=2)
+        plt.axhline(y=100, color='orange', linewidth=2)
+        plt.axhline(y=7.5, color='blue', linewidth=2)
+        plt.axhline(y= med_cov, color='red', linewidth=3)
+    else:
+        plt.axhline(y=100, color='orange', linewidth=2)
+        plt.axhline(y=1000, color='blue', linewidth=2)
+        plt.axhline(y=10000, color='orange', linewidth=2)
+        plt.axhline(y=100000, color='orange', linewidth=2)
+
+    # Draw vertical lines at x that span the y-range
+    plt.axvline(x=contig_1k, color='blue', linewidth=2)
+    plt.title(Title)
+    plt.xlabel('Contig')
+    plt.ylabel(x_label)
+    plt.yscale('log')  # apply log10 scale on y-axis
+    plt.savefig(output_file)
+    plt.close()
+
+
+def plot_contig_len(output_file, plot_data):
+    """
+    Plots the length of each contig using plot_it_2()
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by PARSE_SPADES_OUTPUT
+    output: bar chart of contig lengths
+    """
+
+    lo_len = plot_data['lengths']
+    # Number of the smallest contig that is >= 1000 bp
+    contig_1k = int(np.count_nonzero(lo_len >= 1000))
+    plot_it_2(output_file, lo_len, 'maroon', contig_1k,
+              'Contig length distribution (median=' \
+              + str(round(np.median(lo_len), 2)) \
+              + ')\\nsmallest contig >=1000 bp = ' + str(contig_1k),
+              False, 0, 'Length [log10]')
+
+
+def plot_contig_cov(output_file, plot_data):
+    """
+    Plots the coverage of each contig using plot_it_2()
+    param: str output_file = output file
+    param: NpzFile plot_data = plot data written by PARSE_SPADES_OUTPUT
+    output: bar chart of contig coverages
+    """
+
+    lo_cov = plot_data['coverages']
+    contig_1k = int(np.count_nonzero(plot_data['lengths'] >= 1000))
+    med_cov = np.median(lo_cov)  # median coverage
+    plot_it_2(output_file, lo_cov, 'seagreen', contig_1k,
+              'Contig coverage distribution\\n(median='  \
+              + str(round(med_cov, 2)) + ')',
+              True, med_cov, 'Coverage [log10]')
+
+
+# figure name, as listed in a plot data file => function that draws it
+do_plotters = {
+    'histo_depths'   : plot_histo_depths,
+    'plot_depths'    : plot_plot_depths,
+    'mutation_dist'  : plot_mutation_dist,
+    'contig_len_dist': plot_contig_len_dist,
+    'contig_cov_dist': plot_contig_cov_dist,
+    'Ampel_dist'     : plot_ampel_dist,
+    'plot_contig_len': plot_contig_len,
+    'plot_contig_cov': plot_contig_cov,
+}
+
+
+def render_plots(lo_plot_data_files, prefix):
+    """
+    Main function: draws every figure listed in the plot data files of one
+      sample, so that matplotlib is only started once per sample.
+    param: list lo_plot_data_files = .npz files written by the parsers
+    param: str prefix = prefix of the output files, e.g.: 'IDR001234'
+    output: one '<prefix>.<figure>.png' file per figure
+    """
+
+    for plot_data_file in lo_plot_data_files:
+        with np.load(plot_data_file) as plot_data:
+            for figure in plot_data['figures']:
+                figure = str(figure)
+                do_plotters[figure](prefix + '.' + figure + '.png', plot_data)
+                logger.info('## plotted %s from %s', figure, plot_data_file)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename="$log_file", level="$log_level", format="[%(levelname)s] %(message)s")
+
+    versions = {}
+    versions["${task.process}"] = {
+        "python": platform.python_version(),
+        "yaml": yaml.__version__,
+    }
+    with open("versions.yml", "w") as f:
+        yaml.dump(versions, f, default_flow_style=False)
+
+    sys.exit(render_plots("$plot_data".split(), "$prefix"))
@@ -7,7 +7,7 @@ include { BCFTOOLS_MPILEUP                        } from '../../modules/local/bc
 include { BCFTOOLS_VIEW                           } from '../../modules/local/bcftools_view'
 include { SAMTOOLS_FLAGSTAT                       } from '../../modules/local/samtools_flagstat'
 include { SAMTOOLS_IDXSTATS                       } from '../../modules/local/samtools_idxstats'
-include { SAMTOOLS_DEPTH                          } from '../../modules/local/samtools_depth'
+include { MAKE_COVERAGE                           } from '../../modules/local/make_coverage'
 include { PARSE_BWA_OUTPUT                        } from '../../modules/local/parse_bwa_output'
 
 workflow BWA {
@@ -20,6 +20,7 @@ workflow BWA {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     BWA_MEM (
@@ -60,7 +61,9 @@ workflow BWA {
         PICARD_MARKDUPLICATES.out.marked_bam.join(SAMTOOLS_INDEX_MARKED.out.bai)
     )
 
-    SAMTOOLS_DEPTH (
+    // samtools depth is piped straight into the
+    // coverage array, without a depth file
+    MAKE_COVERAGE (
         PICARD_MARKDUPLICATES.out.marked_bam
     )
 
@@ -86,6 +89,9 @@ workflow BWA {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_BWA_OUTPUT.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_BWA_OUTPUT.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(BWA_MEM.out.versions)
     ch_versions = ch_versions.mix(SAMTOOLS_SORT.out.versions)
@@ -96,14 +102,15 @@ workflow BWA {
     ch_versions = ch_versions.mix(BCFTOOLS_VIEW.out.versions)
     ch_versions = ch_versions.mix(SAMTOOLS_FLAGSTAT.out.versions)
     ch_versions = ch_versions.mix(SAMTOOLS_IDXSTATS.out.versions)
-    ch_versions = ch_versions.mix(SAMTOOLS_DEPTH.out.versions)
+    ch_versions = ch_versions.mix(MAKE_COVERAGE.out.versions)
     ch_versions = ch_versions.mix(PARSE_BWA_OUTPUT.out.versions)
 
     emit:
     percent_mapped = ch_percent_mapped
-    depth = SAMTOOLS_DEPTH.out.depth
+    coverage = MAKE_COVERAGE.out.coverage
     bam = PICARD_MARKDUPLICATES.out.marked_bam
     mpileup = BCFTOOLS_VIEW.out.vcf
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
@@ -4,6 +4,7 @@
 
 include { CHECK_INPUT as CHECK_SAMPLES    } from '../../modules/local/check_input'
 include { CHECK_INPUT as CHECK_REFERENCES } from '../../modules/local/check_input'
+include { CHECK_FILES                     } from '../../modules/local/check_files'
 
 workflow CHECK_INPUT {
     take:
@@ -21,7 +22,7 @@ workflow CHECK_INPUT {
     CHECK_SAMPLES.out.csv
         .splitCsv(header: true, sep: ',')
         .map { create_reads_channel(it) }
-        .set { ch_reads }
+        .set { ch_unchecked_reads }
 
     CHECK_REFERENCES (
         references,
@@ -39,12 +40,13 @@ workflow CHECK_INPUT {
     ch_reference_branch.reference
         .map { create_reference_channel(it, false) }
         .multiMap {
-            meta, fasta, snp_cons, bwa, fai, mutations_matrix ->
+            meta, fasta, snp_cons, bwa, fai, mutations_matrix, mutations_npz ->
             fasta:            [ meta, fasta            ]
             snp_cons:         [ meta, snp_cons         ]
             bwa:              [ meta, bwa              ]
             fai:              [ meta, fai              ]
             mutations_matrix: [ meta, mutations_matrix ]
+            mutations_npz:    [ meta, mutations_npz    ]
         }
         .set { ch_reference }
 
@@ -57,6 +59,32 @@ workflow CHECK_INPUT {
         }
         .set { ch_cluster_reference }
 
+    // Check files
+    // Checks all the FASTQ and FASTA files in a single
+    // task, which fails before any sample is processed
+    // if a file is missing, truncated or malformed
+    CHECK_FILES (
+        ch_unchecked_reads
+            .map {
+                meta, reads ->
+                reads
+            }
+            .mix(ch_reference.fasta.map { meta, fasta -> fasta })
+            .mix(ch_cluster_reference.fasta.map { meta, fasta -> fasta })
+            .flatten()
+            .unique()
+            .collect()
+    )
+
+    // The samples only start once all the files passed
+    ch_unchecked_reads
+        .combine(CHECK_FILES.out.csv)
+        .map {
+            meta, reads, stats ->
+            [ meta, reads ]
+        }
+        .set { ch_reads }
+
     ch_reference.fasta
         .map {
             meta, fasta ->
@@ -74,6 +102,7 @@ workflow CHECK_INPUT {
     // Collect versions
     ch_versions = ch_versions.mix(CHECK_SAMPLES.out.versions)
     ch_versions = ch_versions.mix(CHECK_REFERENCES.out.versions)
+    ch_versions = ch_versions.mix(CHECK_FILES.out.versions)
 
     emit:
     reads            = ch_reads
@@ -82,8 +111,10 @@ workflow CHECK_INPUT {
     bwa              = ch_reference.bwa
     fai              = ch_reference.fai
     mutations_matrix = ch_reference.mutations_matrix
+    mutations_npz    = ch_reference.mutations_npz
     cluster_fasta    = ch_cluster_reference.fasta
     cluster_snp_cons = ch_cluster_reference.snp_cons
+    file_stats       = CHECK_FILES.out.csv        // channel: [ files.stats.csv ]
     versions         = ch_versions                // channel: [ versions.yml ]
 }
 
@@ -128,7 +159,10 @@ def create_reference_channel(LinkedHashMap row, boolean cluster_reference) {
         if (!file(row.mutations_matrix).exists()) {
             exit 1, "ERROR: Please check reference samplesheet -> Mutations matrix file does not exist!\n${row.fasta}"
         }
-        return [ meta, file(row.fasta), file(row.snp_cons), file(row.bwa, type: 'dir'), file(row.fai), file(row.mutations_matrix) ]
+        // the NPZ sidecar of the mutations matrix is optional, it only
+        // saves MAKE_MUTATIONS_MATRIX from parsing the CSV file
+        def mutations_npz = row.mutations_npz && file(row.mutations_npz).exists() ? file(row.mutations_npz) : []
+        return [ meta, file(row.fasta), file(row.snp_cons), file(row.bwa, type: 'dir'), file(row.fai), file(row.mutations_matrix), mutations_npz ]
     }
 
     meta.id = row.sample
@@ -9,6 +9,7 @@ workflow FASTQC {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     FASTQC_MODULE (
@@ -33,6 +34,10 @@ workflow FASTQC {
     ch_reports = ch_reports.concat(PARSE_FASTQC_OUTPUT.out.report)
     ch_reports = ch_reports.concat(CALCULATE_COVERAGE.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_FASTQC_OUTPUT.out.report_json)
+    ch_report_records = ch_report_records.concat(CALCULATE_COVERAGE.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(FASTQC_MODULE.out.versions)
     ch_versions = ch_versions.mix(PARSE_FASTQC_OUTPUT.out.versions)
@@ -41,5 +46,6 @@ workflow FASTQC {
     emit:
     fastqc = FASTQC_MODULE.out.fastqc
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
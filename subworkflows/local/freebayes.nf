@@ -13,6 +13,7 @@ workflow FREEBAYES {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     FREEBAYES_MODULE (
@@ -53,6 +54,9 @@ workflow FREEBAYES {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_VCF_OUTPUT.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_VCF_OUTPUT.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(FREEBAYES_MODULE.out.versions)
     ch_versions = ch_versions.mix(VCFFILTER.out.versions)
@@ -61,6 +65,8 @@ workflow FREEBAYES {
     emit:
     mutations = ch_mutations
     vcf = VCFFILTER.out.vcf
+    plot_data = PARSE_VCF_OUTPUT.out.plot_data
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
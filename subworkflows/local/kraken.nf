@@ -3,10 +3,12 @@ include { PARSE_KRAKEN_OUTPUT     } from '../../modules/local/parse_kraken_outpu
 
 workflow KRAKEN {
     take:
-    fasta // channel: [ meta(id, ref), fasta ]
+    fasta         // channel: [ meta(id, ref), fasta         ]
+    contigs_index // channel: [ meta(id, ref), contigs_index ]
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     KRAKEN_MODULE (
@@ -15,13 +17,16 @@ workflow KRAKEN {
     )
 
     PARSE_KRAKEN_OUTPUT (
-        KRAKEN_MODULE.out.kraken.join(fasta),
+        KRAKEN_MODULE.out.kraken.join(fasta).join(contigs_index),
         params.genomes.get(params.genome).binomial.tokenize()[0]
     )
 
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_KRAKEN_OUTPUT.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_KRAKEN_OUTPUT.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(KRAKEN_MODULE.out.versions)
     ch_versions = ch_versions.mix(PARSE_KRAKEN_OUTPUT.out.versions)
@@ -30,5 +35,6 @@ workflow KRAKEN {
     good_contigs = PARSE_KRAKEN_OUTPUT.out.good_contigs
     bad_contigs = PARSE_KRAKEN_OUTPUT.out.bad_contigs
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
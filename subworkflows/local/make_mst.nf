@@ -1,41 +1,50 @@
-include { MAKE_MUTATIONS_MATRIX     } from '../../modules/local/make_mutations_matrix'
-include { MAKE_MST as MAKE_MST_ME   } from '../../modules/local/make_mst'
-include { MAKE_MST as MAKE_MST_SNP  } from '../../modules/local/make_mst'
+include { MAKE_MUTATIONS_MATRIX       } from '../../modules/local/make_mutations_matrix'
+include { MAKE_MST as MAKE_MST_MODULE } from '../../modules/local/make_mst'
 
 workflow MAKE_MST {
     take:
     cluster_pairwise_diffs // channel: [ meta(ref), [ cluster_pairwise_diffs ] ]
     mutations_matrix       // channel: [ meta(ref), mutations_matrix           ]
+    mutations_npz          // channel: [ meta(ref), mutations_npz or []        ]
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
+    // Make mutations matrix
+    // Reads the stored mutations matrix from its NPZ
+    // sidecar, if the sidecar still matches the CSV
     MAKE_MUTATIONS_MATRIX (
-        cluster_pairwise_diffs.join(mutations_matrix)
+        cluster_pairwise_diffs
+            .join(mutations_matrix)
+            .join(mutations_npz)
     )
 
-    MAKE_MST_ME (
-        MAKE_MUTATIONS_MATRIX.out.concat_pairwise_mes,
-        params.genome
-    )
-
-    MAKE_MST_SNP (
-        MAKE_MUTATIONS_MATRIX.out.concat_pairwise_snps,
-        params.genome
+    // Make both the ME and the SNP MST in one task
+    MAKE_MST_MODULE (
+        MAKE_MUTATIONS_MATRIX.out.concat_pairwise_mes
+            .join(MAKE_MUTATIONS_MATRIX.out.concat_pairwise_snps),
+        params.genome,
+        params.skip_plots,
+        params.mst_layout_threshold,
+        params.mst_render_timeout
     )
 
     // Collect reports
-    ch_reports = ch_reports.concat(MAKE_MST_ME.out.report)
-    ch_reports = ch_reports.concat(MAKE_MST_SNP.out.report)
+    ch_reports = ch_reports.concat(MAKE_MST_MODULE.out.report)
+
+    // Collect report records
+    ch_report_records = ch_report_records.concat(MAKE_MST_MODULE.out.report_json)
 
     // Collect versions
     ch_versions = ch_versions.mix(MAKE_MUTATIONS_MATRIX.out.versions)
-    ch_versions = ch_versions.mix(MAKE_MST_ME.out.versions)
-    ch_versions = ch_versions.mix(MAKE_MST_SNP.out.versions)
+    ch_versions = ch_versions.mix(MAKE_MST_MODULE.out.versions)
 
     emit:
     mutations_matrix = MAKE_MUTATIONS_MATRIX.out.mutations_matrix
+    mutations_npz = MAKE_MUTATIONS_MATRIX.out.mutations_npz
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
@@ -5,11 +5,12 @@ include { PARSE_MASH_OUTPUT as PARSE_MASH_OUTPUT_FA } from '../../modules/local/
 
 workflow MASH_FA {
     take:
-    fasta  // channel: [ meta(id), fasta      ]
-    fastas // channel: [ meta(id), [ fastas ] ]
+    fasta  // channel: [ meta(id), fasta            ]
+    fastas // channel: [ meta(id, hash), [ fastas ] ]
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     MASH_SKETCH_QUERY_FA (
@@ -20,12 +21,56 @@ workflow MASH_FA {
         fastas
     )
 
+    // Mash cache channel
+    // Contains the cached distances to the reference sketch,
+    // from the cache shard named after its md5
+    MASH_SKETCH_REF_FA.out.mash
+        .map {
+            meta, reference ->
+            file("${params.mash_cache}/${java.security.MessageDigest.getInstance('MD5').digest(reference.bytes).encodeHex()}")
+        }
+        .map {
+            shard ->
+            shard.exists() ? shard.listFiles().findAll { it.name.endsWith('.tab') } : []
+        }
+        .set { ch_mash_cache }
+
+    // All samples are compared to the reference sketch in one task
     MASH_DIST_FA (
-        MASH_SKETCH_QUERY_FA.out.mash.join(MASH_SKETCH_REF_FA.out.mash)
+        MASH_SKETCH_QUERY_FA.out.mash
+            .collect(flat: false)
+            .map {
+                sketches ->
+                [ [id: 'mash_batch'], sketches.collect { it[0].id }, sketches.collect { it[1] } ]
+            }
+            .combine(MASH_SKETCH_REF_FA.out.mash.map { it[1] }),
+        ch_mash_cache
     )
 
+    // Mash FA distances channel
+    // Contains the distances for each sample,
+    // split out of the batch by sample id
+    MASH_SKETCH_QUERY_FA.out.mash
+        .map {
+            meta, mash ->
+            [ meta.id, meta ]
+        }
+        .join(
+            MASH_DIST_FA.out.dist
+                .transpose()
+                .map {
+                    meta, dist ->
+                    [ dist.name.replaceFirst(/\.[^.]+\.tab$/, ''), dist ]
+                }
+        )
+        .map {
+            id, meta, dist ->
+            [ meta, dist ]
+        }
+        .set { ch_dist }
+
     PARSE_MASH_OUTPUT_FA (
-        MASH_DIST_FA.out.dist,
+        ch_dist,
         Channel.fromPath('NO_FILE').first(),
         params.genome
     )
@@ -40,6 +85,9 @@ workflow MASH_FA {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_MASH_OUTPUT_FA.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_MASH_OUTPUT_FA.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(MASH_SKETCH_QUERY_FA.out.versions)
     ch_versions = ch_versions.mix(MASH_SKETCH_REF_FA.out.versions)
@@ -49,5 +97,6 @@ workflow MASH_FA {
     emit:
     fastas = ch_fastas
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
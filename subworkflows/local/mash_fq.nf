@@ -1,31 +1,72 @@
-include { CONCATENATE                               } from '../../modules/local/concatenate'
-include { MASH_SKETCH as MASH_SKETCH_FQ             } from '../../modules/local/mash_sketch'
+include { MASH_SKETCH_READS as MASH_SKETCH_FQ       } from '../../modules/local/mash_sketch_reads'
 include { MASH_DIST as MASH_DIST_FQ                 } from '../../modules/local/mash_dist'
 include { PARSE_MASH_OUTPUT as PARSE_MASH_OUTPUT_FQ } from '../../modules/local/parse_mash_output'
 
 workflow MASH_FQ {
     take:
     reads // channel: [ meta(id), [ reads ] ]
-    mash  // channel: [ meta(id), mash      ]
+    mash  // channel: mash
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
-    CONCATENATE (
-        reads
-    )
-
     MASH_SKETCH_FQ (
-        CONCATENATE.out.cat
+        reads,
+        params.mash_max_reads
     )
 
+    // Mash cache channel
+    // Contains the cached distances to the species sketch,
+    // from the cache shard named after its md5
+    mash
+        .map {
+            reference ->
+            file("${params.mash_cache}/${java.security.MessageDigest.getInstance('MD5').digest(reference.bytes).encodeHex()}")
+        }
+        .map {
+            shard ->
+            shard.exists() ? shard.listFiles().findAll { it.name.endsWith('.tab') } : []
+        }
+        .set { ch_mash_cache }
+
+    // All samples are compared to the species sketch in one task
     MASH_DIST_FQ (
-        MASH_SKETCH_FQ.out.mash.join(mash)
+        MASH_SKETCH_FQ.out.mash
+            .collect(flat: false)
+            .map {
+                sketches ->
+                [ [id: 'mash_batch'], sketches.collect { it[0].id }, sketches.collect { it[1] } ]
+            }
+            .combine(mash),
+        ch_mash_cache
     )
 
+    // Mash FQ distances channel
+    // Contains the distances for each sample,
+    // split out of the batch by sample id
+    MASH_SKETCH_FQ.out.mash
+        .map {
+            meta, mash ->
+            [ meta.id, meta ]
+        }
+        .join(
+            MASH_DIST_FQ.out.dist
+                .transpose()
+                .map {
+                    meta, dist ->
+                    [ dist.name.replaceFirst(/\.[^.]+\.tab$/, ''), dist ]
+                }
+        )
+        .map {
+            id, meta, dist ->
+            [ meta, dist ]
+        }
+        .set { ch_dist }
+
     PARSE_MASH_OUTPUT_FQ (
-        MASH_DIST_FQ.out.dist,
+        ch_dist,
         Channel.fromList(
             params.genomes
                 .collect {
@@ -40,6 +81,9 @@ workflow MASH_FQ {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_MASH_OUTPUT_FQ.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_MASH_OUTPUT_FQ.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(MASH_SKETCH_FQ.out.versions)
     ch_versions = ch_versions.mix(MASH_DIST_FQ.out.versions)
@@ -47,5 +91,6 @@ workflow MASH_FQ {
 
     emit:
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
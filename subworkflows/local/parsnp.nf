@@ -10,6 +10,7 @@ workflow PARSNP {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     PARSNP_MODULE (
@@ -31,6 +32,9 @@ workflow PARSNP {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_PARSNP_OUTPUT.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_PARSNP_OUTPUT.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(PARSNP_MODULE.out.versions)
     ch_versions = ch_versions.mix(PARSE_PARSNP_OUTPUT.out.versions)
@@ -41,5 +45,6 @@ workflow PARSNP {
     parsnp = PARSNP_MODULE.out.parsnp
     svg = REMOVE_INNER_LABELS.out.no_inner_labels_svg
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
@@ -7,6 +7,7 @@ workflow QUALIMAP {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     QUALIMAP_BAMQC (
@@ -20,11 +21,15 @@ workflow QUALIMAP {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_QUALIMAP_OUTPUT.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_QUALIMAP_OUTPUT.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(QUALIMAP_BAMQC.out.versions)
     ch_versions = ch_versions.mix(PARSE_QUALIMAP_OUTPUT.out.versions)
 
     emit:
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
@@ -6,7 +6,7 @@ workflow QUAST {
     take:
     contigs          // channel: [ meta(id, ref), contigs          ]
     fasta            // channel: [ meta(id, ref), fasta            ]
-    depth            // channel: [ meta(id, ref), depth            ]
+    coverage         // channel: [ meta(id, ref), coverage         ]
     percent_mapped   // channel: [ meta(id, ref), percent_mapped   ]
     max_no_ns        // channel: [ meta(id, ref), max_no_ns        ]
     max_no_gaps      // channel: [ meta(id, ref), max_no_gaps      ]
@@ -14,6 +14,7 @@ workflow QUAST {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     QUAST_MODULE (
@@ -26,7 +27,7 @@ workflow QUAST {
     )
 
     COUNT_NNN_GAPS (
-        depth.join(percent_mapped).join(max_no_ns).join(max_no_gaps).join(mapped_threshold),
+        coverage.join(percent_mapped).join(max_no_ns).join(max_no_gaps).join(mapped_threshold),
         params.min_depth,
         params.gap_length,
         params.interval
@@ -48,6 +49,10 @@ workflow QUAST {
     ch_reports = ch_reports.concat(PARSE_QUAST_OUTPUT.out.report)
     ch_reports = ch_reports.concat(COUNT_NNN_GAPS.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_QUAST_OUTPUT.out.report_json)
+    ch_report_records = ch_report_records.concat(COUNT_NNN_GAPS.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(QUAST_MODULE.out.versions)
     ch_versions = ch_versions.mix(PARSE_QUAST_OUTPUT.out.versions)
@@ -56,6 +61,9 @@ workflow QUAST {
     emit:
     depth_mean = ch_output.depth_mean
     depth_sd = ch_output.depth_sd
+    plot_data = COUNT_NNN_GAPS.out.plot_data
+    gaps = COUNT_NNN_GAPS.out.bed
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
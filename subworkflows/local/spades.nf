@@ -1,4 +1,5 @@
 include { SPADES as SPADES_MODULE } from '../../modules/local/spades'
+include { INDEX_CONTIGS           } from '../../modules/local/index_contigs'
 include { FILTER_CONTIGS          } from '../../modules/local/filter_contigs'
 include { PARSE_SPADES_OUTPUT     } from '../../modules/local/parse_spades_output'
 
@@ -9,20 +10,25 @@ workflow SPADES {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     SPADES_MODULE (
         reads.join(max_read_len)
     )
 
+    INDEX_CONTIGS (
+        SPADES_MODULE.out.contigs
+    )
+
     FILTER_CONTIGS (
-        SPADES_MODULE.out.contigs,
+        SPADES_MODULE.out.contigs.join(INDEX_CONTIGS.out.contigs_index),
         params.min_contig_len,
         params.min_contig_cov
     )
 
     PARSE_SPADES_OUTPUT (
-        SPADES_MODULE.out.contigs,
+        INDEX_CONTIGS.out.contigs_index,
         params.min_contig_len,
         params.min_contig_cov,
         params.max_no_contigs
@@ -31,14 +37,21 @@ workflow SPADES {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_SPADES_OUTPUT.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_SPADES_OUTPUT.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(SPADES_MODULE.out.versions)
+    ch_versions = ch_versions.mix(INDEX_CONTIGS.out.versions)
     ch_versions = ch_versions.mix(FILTER_CONTIGS.out.versions)
     ch_versions = ch_versions.mix(PARSE_SPADES_OUTPUT.out.versions)
 
     emit:
     contigs = SPADES_MODULE.out.contigs
+    contigs_index = INDEX_CONTIGS.out.contigs_index
     filtered_contigs = FILTER_CONTIGS.out.filtered_contigs
+    plot_data = PARSE_SPADES_OUTPUT.out.plot_data
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
@@ -10,6 +10,7 @@ workflow TRIMMOMATIC {
 
     main:
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
     ch_versions = Channel.empty()
 
     GUNZIP (
@@ -79,6 +80,9 @@ workflow TRIMMOMATIC {
     // Collect reports
     ch_reports = ch_reports.concat(PARSE_TRIMMOMATIC_OUTPUT.out.report)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(PARSE_TRIMMOMATIC_OUTPUT.out.report_json)
+
     // Collect versions
     ch_versions = ch_versions.mix(GUNZIP.out.versions)
     ch_versions = ch_versions.mix(REMOVE_POLY_GS.out.versions)
@@ -90,5 +94,6 @@ workflow TRIMMOMATIC {
     reads = ch_output.reads
     max_read_len = ch_output.max_read_len
     reports = ch_reports
+    report_records = ch_report_records
     versions = ch_versions // channel: [ versions.yml ]
 }
@@ -75,11 +75,11 @@ workflow GENERATE_REFERENCES {
         .join(MAKE_REFERENCE.out.mutations_matrix)
         .map {
             meta, fasta, snp_cons, bwa, fai, mutations_matrix ->
-            [ meta.ref, meta.ref, fasta, snp_cons, bwa, fai, mutations_matrix ].join(',')
+            [ meta.ref, meta.ref, fasta, snp_cons, bwa, fai, mutations_matrix, '' ].join(',')
         }
         .set { ch_make_references }
 
-    references_header = [ 'sample', 'reference', 'fasta', 'snp_cons', 'bwa', 'fai', 'mutations_matrix' ].join(',')
+    references_header = [ 'sample', 'reference', 'fasta', 'snp_cons', 'bwa', 'fai', 'mutations_matrix', 'mutations_npz' ].join(',')
     ch_make_references.collectFile(name: "references_${params.genome}.csv", newLine: true, seed: references_header, sort: true, storeDir: params.outdir)
 
 }
@@ -39,8 +39,10 @@ include { MAKE_SNP_CONS                      } from '../modules/local/make_snp_c
 include { COMPARE_SNPS                       } from '../modules/local/compare_snps'
 include { CHECK_REF_QUAL                     } from '../modules/local/check_ref_qual'
 include { CONVERT_REPORTS                    } from '../modules/local/convert_reports'
+include { RENDER_PLOTS                       } from '../modules/local/render_plots'
 include { MAKE_SOFTWARE_VERSIONS             } from '../modules/local/make_software_versions'
 include { MAKE_REPORT                        } from '../modules/local/make_report'
+include { MAKE_QC_DB                         } from '../modules/local/make_qc_db'
 include { MULTIQC                            } from '../modules/local/multiqc'
 include { MULTIQC as MULTIQC_SUMMARY         } from '../modules/local/multiqc'
 
@@ -72,6 +74,8 @@ def multiqc_report = []
 workflow LEGIOCLUSTER {
 
     ch_reports = Channel.empty()
+    ch_report_records = Channel.empty()
+    ch_plot_data = Channel.empty()
     ch_versions = Channel.empty()
 
     // Check input
@@ -91,22 +95,10 @@ workflow LEGIOCLUSTER {
         TRIMMOMATIC.out.reads
     )
 
-    // Mash FQ channel
-    // Contains the reads for each sample
-    // combined with genomes mash file
-    TRIMMOMATIC.out.reads
-        .combine(ch_genomes_mash)
-        .multiMap {
-            meta, reads, mash ->
-            reads: [ meta, reads ]
-            mash:  [ meta, mash  ]
-        }
-        .set { ch_mash_fq }
-
     // Run Mash FQ
     MASH_FQ (
-        ch_mash_fq.reads,
-        ch_mash_fq.mash
+        TRIMMOMATIC.out.reads,
+        ch_genomes_mash
     )
 
     // Run SPAdes
@@ -115,26 +107,27 @@ workflow LEGIOCLUSTER {
         TRIMMOMATIC.out.max_read_len
     )
 
-    // Mash FA channel
-    // Contains the filtered contigs for each sample
-    // combined with the list of reference fastas
-    SPADES.out.filtered_contigs
-        .combine(
-            CHECK_INPUT.out.fasta
-                .collect { it[1] }
-                .map { [ it ] }
-        )
-        .multiMap {
-            meta, fasta, fastas ->
-            fasta:  [ meta, fasta  ]
-            fastas: [ meta, fastas ]
+    // Mash FA references channel
+    // Contains the sorted list of reference fastas,
+    // keyed by their paths, sizes and modification
+    // times so that the reference sketch is only
+    // rebuilt when a reference fasta changes
+    CHECK_INPUT.out.fasta
+        .collect { it[1] }
+        .map {
+            fastas ->
+            fastas.sort { it.toString() }
+        }
+        .map {
+            fastas ->
+            [ [id: "references_${params.genome}", hash: fastas.collect { [ it, it.size(), it.lastModified() ].join(',') }.join(';').md5()], fastas ]
         }
-        .set { ch_mash_fa }
+        .set { ch_mash_fa_references }
 
     // Run Mash FA
     MASH_FA (
-        ch_mash_fa.fasta,
-        ch_mash_fa.fastas
+        SPADES.out.filtered_contigs,
+        ch_mash_fa_references
     )
 
     // BWA channel
@@ -148,6 +141,7 @@ workflow LEGIOCLUSTER {
             TRIMMOMATIC.out.reads
                 .join(SPADES.out.contigs)
                 .join(SPADES.out.filtered_contigs)
+                .join(SPADES.out.contigs_index)
                 .combine(
                     MASH_FA.out.fastas
                         .map {
@@ -157,16 +151,17 @@ workflow LEGIOCLUSTER {
                         .transpose(),
                     by: 0)
                 .map {
-                    meta, reads, contigs, filtered_contigs, fasta ->
-                    [ meta + [ref: fasta], reads, contigs, filtered_contigs ]
+                    meta, reads, contigs, filtered_contigs, contigs_index, fasta ->
+                    [ meta + [ref: fasta], reads, contigs, filtered_contigs, contigs_index ]
                 }
         ) { it[0].ref }
         .map { it[1] + it[0][1..-1] }
         .multiMap {
-            meta, reads, contigs, filtered_contigs, fasta, bwa, fai ->
+            meta, reads, contigs, filtered_contigs, contigs_index, fasta, bwa, fai ->
             reads:              [ meta, reads                                                                    ]
             contigs:            [ meta, contigs                                                                  ]
             filtered_contigs:   [ meta, filtered_contigs                                                         ]
+            contigs_index:      [ meta, contigs_index                                                            ]
             fasta:              [ meta, fasta                                                                    ]
             bwa:                [ meta, bwa                                                                      ]
             fai:                [ meta, fai                                                                      ]
@@ -206,22 +201,24 @@ workflow LEGIOCLUSTER {
         .set { ch_bwa_out_branch }
 
     ch_bwa_out_branch.passed_min_percent_mapped
-        .join(BWA.out.depth)
+        .join(BWA.out.coverage)
         .join(BWA.out.bam)
         .join(BWA.out.mpileup)
         .join(ch_bwa.contigs)
         .join(ch_bwa.filtered_contigs)
+        .join(ch_bwa.contigs_index)
         .join(ch_bwa.fasta)
         .join(ch_bwa.fai)
         .join(ch_bwa.mapped_threshold)
         .multiMap {
-            meta, percent_mapped, min_percent_mapped, depth, bam, mpileup, contigs, filtered_contigs, fasta, fai, mapped_threshold ->
+            meta, percent_mapped, min_percent_mapped, coverage, bam, mpileup, contigs, filtered_contigs, contigs_index, fasta, fai, mapped_threshold ->
             percent_mapped:     [ meta, percent_mapped                                                                    ]
-            depth:              [ meta, depth                                                                             ]
+            coverage:           [ meta, coverage                                                                          ]
             bam:                [ meta, bam                                                                               ]
             mpileup:            [ meta, mpileup                                                                           ]
             contigs:            [ meta, contigs                                                                           ]
             filtered_contigs:   [ meta, filtered_contigs                                                                  ]
+            contigs_index:      [ meta, contigs_index                                                                     ]
             fasta:              [ meta, fasta                                                                             ]
             fai:                [ meta, fai                                                                               ]
             mapped_threshold:   [ meta, mapped_threshold                                                                  ]
@@ -239,14 +236,15 @@ workflow LEGIOCLUSTER {
 
     // Run Kraken
     KRAKEN (
-        ch_bwa_out.contigs
+        ch_bwa_out.contigs,
+        ch_bwa_out.contigs_index
     )
 
     // Run Quast
     QUAST (
         ch_bwa_out.contigs,
         ch_bwa_out.fasta,
-        ch_bwa_out.depth,
+        ch_bwa_out.coverage,
         ch_bwa_out.percent_mapped,
         ch_bwa_out.max_no_ns,
         ch_bwa_out.max_no_gaps,
@@ -288,12 +286,14 @@ workflow LEGIOCLUSTER {
         .join(ch_bwa_out.fasta)
         .join(ch_bwa_out.mpileup)
         .join(FREEBAYES.out.vcf)
+        .join(ch_bwa_out.coverage)
         .multiMap {
-            meta, mutations, percent_mapped, snp_threshold, mapped_threshold, filtered_contigs, fasta, mpileup, freebayes ->
+            meta, mutations, percent_mapped, snp_threshold, mapped_threshold, filtered_contigs, fasta, mpileup, freebayes, coverage ->
             filtered_contigs: [ meta, filtered_contigs ]
             fasta:            [ meta, fasta            ]
             mpileup:          [ meta, mpileup          ]
             freebayes:        [ meta, freebayes        ]
+            coverage:         [ meta, coverage         ]
         }
         .set { ch_freebayes_close }
 
@@ -302,12 +302,15 @@ workflow LEGIOCLUSTER {
         ch_freebayes_close.fasta
             .join(ch_freebayes_close.mpileup)
             .join(ch_freebayes_close.freebayes)
+            .join(ch_freebayes_close.coverage)
     )
 
     // Compare SNPs channel
-    // Contains the SNP consensus for each sample
-    // combined with the list of SNP consensuses
-    // of all the samples in its cluster
+    // Contains the SNP consensuses of the new samples
+    // in each cluster combined with the list of
+    // SNP consensuses of the existing samples
+    // in the cluster, so that each cluster is
+    // compared in a single task
     CHECK_INPUT.out.snp_cons
         .mix(
             CHECK_INPUT.out.cluster_snp_cons
@@ -321,9 +324,10 @@ workflow LEGIOCLUSTER {
             MAKE_SNP_CONS.out.snp_cons
         ) { it[0].ref }
         .groupTuple()
-        .map { [ it[1], it[1].collect { it[1] } + it[0][1] ] }
-        .transpose(by: 0)
-        .map { it[0] + [ it[1] - it[0][1..-1] ] }
+        .map {
+            cluster, samples ->
+            [ cluster[0], samples.sort { it[0].id }.collect { it[1] }, cluster[1] ]
+        }
         .multiMap {
             meta, snp_cons, cluster_snp_cons ->
             snp_cons:         [ meta, snp_cons         ]
@@ -343,21 +347,23 @@ workflow LEGIOCLUSTER {
     COMPARE_SNPS.out.pairwise_diffs
         .map {
             meta, pairwise_diffs ->
-            [ [ref: meta.ref], pairwise_diffs ]
+            [ meta, [ pairwise_diffs ].flatten() ]
         }
-        .groupTuple()
         .join(CHECK_INPUT.out.mutations_matrix)
+        .join(CHECK_INPUT.out.mutations_npz)
         .multiMap {
-            meta, cluster_pairwise_diffs, mutations_matrix ->
+            meta, cluster_pairwise_diffs, mutations_matrix, mutations_npz ->
             cluster_pairwise_diffs: [ meta, cluster_pairwise_diffs ]
             mutations_matrix:       [ meta, mutations_matrix       ]
+            mutations_npz:          [ meta, mutations_npz          ]
         }
         .set { ch_make_mst }
 
     // Make MST
     MAKE_MST (
         ch_make_mst.cluster_pairwise_diffs,
-        ch_make_mst.mutations_matrix
+        ch_make_mst.mutations_matrix,
+        ch_make_mst.mutations_npz
     )
 
     // Make Parsnp channel
@@ -402,18 +408,18 @@ workflow LEGIOCLUSTER {
 
     // Freebayes distant channel
     ch_freebayes_out.distant
-        .join(ch_bwa_out.contigs)
+        .join(ch_bwa_out.contigs_index)
         .join(ch_bwa_out.filtered_contigs)
         .multiMap {
-            meta, mutations, percent_mapped, snp_threshold, mapped_threshold, contigs, filtered_contigs ->
-            contigs:          [ meta, contigs          ]
+            meta, mutations, percent_mapped, snp_threshold, mapped_threshold, contigs_index, filtered_contigs ->
+            contigs_index:    [ meta, contigs_index    ]
             filtered_contigs: [ meta, filtered_contigs ]
         }
         .set { ch_freebayes_distant }
 
     // Check reference quality
     CHECK_REF_QUAL (
-        ch_freebayes_distant.contigs,
+        ch_freebayes_distant.contigs_index,
         params.med_genome_len
     )
 
@@ -467,15 +473,23 @@ workflow LEGIOCLUSTER {
         )
         .join(
             MAKE_REFERENCE.out.mutations_matrix
+                .map {
+                    meta, mutations_matrix ->
+                    [ meta, mutations_matrix, [] ]
+                }
                 .mix(
                     MAKE_MST.out.mutations_matrix
-                        .concat(CHECK_INPUT.out.mutations_matrix)
+                        .join(MAKE_MST.out.mutations_npz)
+                        .concat(
+                            CHECK_INPUT.out.mutations_matrix
+                                .join(CHECK_INPUT.out.mutations_npz)
+                        )
                         .unique { it[0].ref }
                 )
         )
         .map {
-            meta, fasta, snp_cons, bwa, fai, mutations_matrix ->
-            [ meta.ref, meta.ref, fasta, snp_cons, bwa, fai, mutations_matrix ].join(',')
+            meta, fasta, snp_cons, bwa, fai, mutations_matrix, mutations_npz ->
+            [ meta.ref, meta.ref, fasta, snp_cons, bwa, fai, mutations_matrix, mutations_npz ?: '' ].join(',')
         }
         .set { ch_make_references_reference }
 
@@ -489,12 +503,12 @@ workflow LEGIOCLUSTER {
         )
         .map {
             meta, fasta, snp_cons ->
-            [ meta.id, meta.ref, fasta, snp_cons, '', '', '' ].join(',')
+            [ meta.id, meta.ref, fasta, snp_cons, '', '', '', '' ].join(',')
         }
         .set { ch_make_references_cluster_reference }
 
     // Make references
-    references_header = [ 'sample', 'reference', 'fasta', 'snp_cons', 'bwa', 'fai', 'mutations_matrix' ].join(',')
+    references_header = [ 'sample', 'reference', 'fasta', 'snp_cons', 'bwa', 'fai', 'mutations_matrix', 'mutations_npz' ].join(',')
     ch_make_references_reference
         .mix(ch_make_references_cluster_reference)
         .collectFile(name: "references_${params.genome}.csv", newLine: true, seed: references_header, sort: true, storeDir: params.outdir)
@@ -511,6 +525,18 @@ workflow LEGIOCLUSTER {
     ch_reports = ch_reports.concat(FREEBAYES.out.reports)
     // ch_reports = ch_reports.concat(MAKE_MST.out.reports)
 
+    // Collect report records
+    ch_report_records = ch_report_records.concat(TRIMMOMATIC.out.report_records)
+    ch_report_records = ch_report_records.concat(FASTQC.out.report_records)
+    ch_report_records = ch_report_records.concat(MASH_FQ.out.report_records)
+    ch_report_records = ch_report_records.concat(SPADES.out.report_records)
+    ch_report_records = ch_report_records.concat(MASH_FA.out.report_records)
+    ch_report_records = ch_report_records.concat(BWA.out.report_records)
+    ch_report_records = ch_report_records.concat(QUAST.out.report_records)
+    ch_report_records = ch_report_records.concat(QUALIMAP.out.report_records)
+    ch_report_records = ch_report_records.concat(FREEBAYES.out.report_records)
+    // ch_report_records = ch_report_records.concat(MAKE_MST.out.report_records)
+
     ch_reports
         .map {
             meta, report ->
@@ -525,11 +551,101 @@ workflow LEGIOCLUSTER {
         params.genome
     )
 
+    // Convert reports channel
+    // Contains the JSON records of the reports of a
+    // sample, or in batch mode of all the samples,
+    // which are converted in a single task for a
+    // single MultiQC report
+    ch_report_records
+        .map {
+            meta, report_json ->
+            [ meta - [ref: meta.ref], report_json ]
+        }
+        .groupTuple()
+        .set { ch_sample_report_records }
+
+    if (params.multiqc_batch) {
+        ch_sample_report_records
+            .flatMap {
+                meta, report_jsons ->
+                report_jsons.collect { [ it, meta.id ] }
+            }
+            .collect(flat: false)
+            .map {
+                report_samples ->
+                [ [id: 'batch'], report_samples.collect { it[0] }, report_samples.collect { it[1] } ]
+            }
+            .set { ch_convert_reports }
+    } else {
+        ch_sample_report_records
+            .map {
+                meta, report_jsons ->
+                [ meta, report_jsons, report_jsons.collect { meta.id } ]
+            }
+            .set { ch_convert_reports }
+    }
+
     // Convert reports
+    // The sections of reports that were converted
+    // before are staged from the report cache, where
+    // they are named after the md5 of the report
     CONVERT_REPORTS (
-        ch_make_report
+        ch_convert_reports
+            .map {
+                meta, report_jsons, samples ->
+                def cached = report_jsons
+                    .collect { file("${params.report_cache}/${java.security.MessageDigest.getInstance('MD5').digest(it.bytes).encodeHex()}.json") }
+                    .findAll { it.exists() }
+                    .unique()
+                [ meta, report_jsons, samples, cached ]
+            },
+        params.multiqc_batch
     )
 
+    // Make QC database
+    // Stores the QC metrics of all the samples in a
+    // run database, keyed on sample, reference, stage,
+    // and metric, which is published next to the QC
+    // database and added to the QC database of the
+    // earlier runs
+    qc_db = file(params.qc_db)
+    MAKE_QC_DB (
+        ch_report_records
+            .map {
+                meta, report_json ->
+                report_json
+            }
+            .collect(),
+        ch_report_records
+            .map {
+                meta, report_json ->
+                [ meta.id, meta.ref ?: '', report_json.name ].join('\t')
+            }
+            .collectFile(name: 'qc_reports.tsv', newLine: true, sort: true),
+        qc_db.exists() ? qc_db : [],
+        qc_db,
+        workflow.runName
+    )
+
+    // Collect plot data
+    ch_plot_data = ch_plot_data.concat(SPADES.out.plot_data)
+    ch_plot_data = ch_plot_data.concat(QUAST.out.plot_data)
+    ch_plot_data = ch_plot_data.concat(FREEBAYES.out.plot_data)
+
+    // Render plots
+    // Draws all the figures of a sample in one task
+    if (!params.skip_plots) {
+        RENDER_PLOTS (
+            ch_plot_data
+                .map {
+                    meta, plot_data ->
+                    [ meta - [ref: meta.ref], plot_data ]
+                }
+                .groupTuple()
+        )
+        ch_versions = ch_versions.mix(RENDER_PLOTS.out.versions)
+    }
+
     // Make multiqc report
     MULTIQC (
         CONVERT_REPORTS.out.yml_reports.combine(ch_multiqc_config)
@@ -550,6 +666,7 @@ workflow LEGIOCLUSTER {
     ch_versions = ch_versions.mix(QUAST.out.versions)
     ch_versions = ch_versions.mix(QUALIMAP.out.versions)
     ch_versions = ch_versions.mix(FREEBAYES.out.versions)
+    ch_versions = ch_versions.mix(MAKE_QC_DB.out.versions)
 
     // Make software versions
     MAKE_SOFTWARE_VERSIONS (
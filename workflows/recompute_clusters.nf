@@ -0,0 +1,118 @@
+/*
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    VALIDATE INPUTS
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+*/
+
+// Check input path parameters to see if they exist
+def checkPathParamList = [ params.references ]
+for (param in checkPathParamList) { if (param) { file(param, checkIfExists: true) } }
+
+// Create references channel
+ch_references = Channel.fromPath(params.references)
+
+/*
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    IMPORT LOCAL MODULES/SUBWORKFLOWS
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+*/
+
+// Modules
+include { CHECK_INPUT as CHECK_REFERENCES   } from '../modules/local/check_input'
+include { COMPARE_SNPS as RECOMPUTE_CLUSTER } from '../modules/local/compare_snps'
+
+// Subworkflows
+include { MAKE_MST } from '../subworkflows/local/make_mst'
+
+/*
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    RUN MAIN WORKFLOW
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+*/
+
+workflow RECOMPUTE_CLUSTERS {
+
+    // Check references
+    CHECK_REFERENCES (
+        ch_references,
+        true
+    )
+
+    CHECK_REFERENCES.out.csv
+        .splitCsv(header: true, sep: ',')
+        .set { ch_references_csv }
+
+    // Recompute cluster channel
+    // Contains the SNP consensuses of all the samples
+    // in each cluster, including the reference, which
+    // are all compared with each other. The comparison
+    // is split into tasks of about the same number of
+    // pairs, so that -resume reuses the finished tasks
+    // of an interrupted recompute
+    ch_references_csv
+        .map {
+            row ->
+            [ [ref: row.reference], file(row.snp_cons, checkIfExists: true) ]
+        }
+        .groupTuple()
+        .flatMap {
+            meta, snp_cons ->
+            split_comparisons(meta, snp_cons.sort { it.name }, 100000)
+        }
+        .set { ch_recompute_cluster }
+
+    // Recompute cluster
+    RECOMPUTE_CLUSTER (
+        ch_recompute_cluster
+    )
+
+    // Mutations matrix channel
+    // Contains the stored mutations matrix of each
+    // cluster, which is replaced by the new one
+    ch_references_csv
+        .filter { it.sample == it.reference }
+        .map {
+            row ->
+            [ [ref: row.reference], file(row.mutations_matrix, checkIfExists: true) ]
+        }
+        .set { ch_mutations_matrix }
+
+    // Make MST
+    // The stored mutations matrix is replaced, so
+    // its NPZ sidecar is not needed
+    MAKE_MST (
+        RECOMPUTE_CLUSTER.out.pairwise_diffs
+            .groupTuple()
+            .map {
+                meta, pairwise_diffs ->
+                [ meta, pairwise_diffs.flatten() ]
+            },
+        ch_mutations_matrix,
+        ch_mutations_matrix.map { meta, mutations_matrix -> [ meta, [] ] }
+    )
+
+}
+
+// Function to split the comparison of all the samples in a cluster
+// into a list of [ meta, snp_cons, cluster_snp_cons ], where each
+// task compares a run of samples to the samples after them
+def split_comparisons(Map meta, List snp_cons, int max_pairs) {
+    def comparisons = []
+    def start = 0
+    def pairs = 0
+    for (i in 0..<snp_cons.size()) {
+        pairs += snp_cons.size() - 1 - i
+        if (pairs >= max_pairs || i == snp_cons.size() - 1) {
+            comparisons << [ meta, snp_cons[start..i], snp_cons.drop(i + 1) ]
+            start = i + 1
+            pairs = 0
+        }
+    }
+    return comparisons
+}
+
+/*
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    THE END
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+*/